@@ -22,6 +22,9 @@ logger = get_logger(__name__)
 
 gl_pipeline_components = {}
 
+# number of runners validating the State Identifier package in parallel, see `common.src.package_validation`
+VALIDATION_SHARDS = 4
+
 
 @pipeline()
 def packaging_pipeline_state_identifier(
@@ -34,6 +37,7 @@ def packaging_pipeline_state_identifier(
     resource_group_name,
     asset_name,
     asset_version,
+    validation_shards=VALIDATION_SHARDS,
 ):
 
     create_payload = gl_pipeline_components["create_payload"](
@@ -49,10 +53,13 @@ def packaging_pipeline_state_identifier(
         resource_group_name=resource_group_name,
     )
 
+    # the windows are aligned to the window parameters in the metadata of the packaged model
     validate_package = gl_pipeline_components["validate_package"](
         model_type=model_type,
         payload_data=create_payload.outputs.payload_data,
         package_path=create_package.outputs.package_path,
+        shards=validation_shards,
+        model=create_package.outputs.output_model,
     )
 
     score_package = gl_pipeline_components["score_package"](
@@ -0,0 +1,166 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Payload files for the validation of edge packages.
+
+A payload file contains the inputs which are fed into the package by `package_validation.py`.
+Two formats are supported:
+- Arrow IPC files with the input columns as record batches, written with `write_payload`.
+  They hold the rows of a single stream, like the input rows of the State Identifier, whose windows span
+  the record batches. The stream is one input of the package. The runner starts the package anew on every
+  `run_pipeline` call and reads all rows of a call into a list of row dictionaries, so `package_validation.py`
+  feeds a stream of a windowed pipeline in window-aligned chunks of a bounded number of rows, which replay
+  the windows before them. The file is memory-mapped, and only the record batches of a chunk are read.
+- joblib files containing a list of inputs, each of which is passed to the package as it is.
+"""
+
+import itertools
+from pathlib import Path
+
+import joblib
+import pyarrow
+import pyarrow.ipc
+
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+ARROW_MAGIC = b"ARROW1"
+
+
+def write_payload(batches, schema: pyarrow.Schema, payload_file) -> int:
+    """
+    Writes record batches to an Arrow IPC payload file.
+
+    Arguments:
+    batches: iterable
+        pyarrow.RecordBatch objects with the input columns.
+    schema: pyarrow.Schema
+        Schema of the record batches.
+    payload_file: str or Path
+        Path of the payload file to create.
+
+    Returns:
+    int
+        The number of rows written.
+    """
+    rows = 0
+    with pyarrow.OSFile(str(payload_file), "wb") as sink:
+        with pyarrow.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def is_arrow_payload(payload_file) -> bool:
+    """
+    Returns True if the payload file is an Arrow IPC file.
+    """
+    with open(payload_file, "rb") as file:
+        return file.read(len(ARROW_MAGIC)) == ARROW_MAGIC
+
+
+def iter_payload_batches(payload_file):
+    """
+    Yields the inputs of a payload file lazily.
+
+    For Arrow IPC payloads, every record batch is yielded as a list of row dictionaries like
+    `{"ph1": 10000.0, "ph2": None, "ph3": 7514.3}`, with None for missing values.
+    For joblib payloads, the elements of the stored list are yielded.
+    """
+    payload_file = Path(payload_file)
+    if not is_arrow_payload(payload_file):
+        logger.info(f"Reading joblib payload {payload_file}")
+        yield from joblib.load(payload_file)
+        return
+
+    logger.info(f"Reading Arrow payload {payload_file}")
+    with pyarrow.memory_map(str(payload_file), "r") as source:
+        reader = pyarrow.ipc.open_file(source)
+        for index in range(reader.num_record_batches):
+            yield reader.get_batch(index).to_pylist()
+
+
+def iter_payload_rows(payload_file, start: int = 0, stop: int = None):
+    """
+    Yields the inputs of a payload file one by one, splitting the batches of rows into single rows.
+    Only the rows [start, stop) are yielded; the record batches of Arrow IPC payloads before `start`
+    are skipped without being read.
+    """
+    payload_file = Path(payload_file)
+    if not is_arrow_payload(payload_file):
+        rows = itertools.chain.from_iterable(
+            batch if isinstance(batch, list) else [batch]
+            for batch in iter_payload_batches(payload_file)
+        )
+        yield from itertools.islice(rows, start, stop)
+        return
+
+    with pyarrow.memory_map(str(payload_file), "r") as source:
+        reader = pyarrow.ipc.open_file(source)
+        offset = 0
+        for index in range(reader.num_record_batches):
+            if stop is not None and offset >= stop:
+                break
+            batch = reader.get_batch(index)
+            first, offset = offset, offset + batch.num_rows
+            if offset <= start:
+                continue
+            begin = max(start - first, 0)
+            end = batch.num_rows if stop is None else min(stop - first, batch.num_rows)
+            yield from batch.slice(begin, end - begin).to_pylist()
+
+
+class PayloadRows:
+    """
+    The rows [start, stop) of a payload file as an iterable which can be iterated more than once,
+    e.g. the stream of an Arrow IPC payload passed to a single `run_pipeline` call.
+    """
+
+    def __init__(self, payload_file, start: int = 0, stop: int = None):
+        self.payload_file = payload_file
+        self.start = start
+        self.stop = stop
+
+    def __iter__(self):
+        return iter_payload_rows(self.payload_file, self.start, self.stop)
+
+
+def iter_payload_inputs(payload_file):
+    """
+    Yields the inputs of a payload file as they are passed to the package, one `run_pipeline` call each:
+    the rows of an Arrow IPC payload as a single `PayloadRows` stream, or the elements of a joblib payload.
+    """
+    if is_arrow_payload(payload_file):
+        yield PayloadRows(payload_file)
+    else:
+        yield from iter_payload_batches(payload_file)
+
+
+def payload_batch_rows(payload_file) -> list:
+    """
+    Returns the number of rows `iter_payload_rows` yields for every input of `iter_payload_batches`.
+    For Arrow IPC payloads, only the metadata of the record batches is read.
+    """
+    payload_file = Path(payload_file)
+    if not is_arrow_payload(payload_file):
+        return [
+            len(batch) if isinstance(batch, list) else 1
+            for batch in iter_payload_batches(payload_file)
+        ]
+
+    with pyarrow.memory_map(str(payload_file), "r") as source:
+        reader = pyarrow.ipc.open_file(source)
+        return [
+            reader.get_batch(index).num_rows
+            for index in range(reader.num_record_batches)
+        ]
+
+
+def count_payload_rows(payload_file) -> int:
+    """
+    Returns the number of inputs `iter_payload_rows` yields for a payload file.
+    """
+    return sum(payload_batch_rows(payload_file))
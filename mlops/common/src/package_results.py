@@ -0,0 +1,230 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Validation results of edge packages.
+
+`package_validation.py` writes the outputs of the package to a Parquet file batch by batch, with one row per output
+and one typed column per output variable, and a `payload_id` column with the index of the payload input
+(joblib element or Arrow record batch, see `package_payload.py`) whose processing produced the output.
+The columns are typed by the outputs the package declares in its `pipeline_config.yml`, see `results_schema`:
+`Integer` outputs are int64, `Double` outputs and metrics are float64, and `String` outputs are strings.
+The values of the numeric columns are converted as they are written:
+- integer and float strings like `"3"` become numbers,
+- metric strings like `'{"value": 0.93}'` become the number in them.
+Outputs which do not fit their column, e.g. a float in an integer column, or which are not declared,
+raise an error instead of being truncated or dropped.
+
+The scoring steps read the columns they need with `read_results`, which also reads the CSV results
+of earlier versions.
+"""
+
+import json
+
+import pandas
+import pyarrow
+import pyarrow.parquet
+
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+PARQUET_MAGIC = b"PAR1"
+PAYLOAD_ID = "payload_id"
+
+# Arrow types of the output types of a pipeline, metrics are float64 whatever their declared type
+OUTPUT_TYPES = {
+    "Integer": pyarrow.int64(),
+    "Double": pyarrow.float64(),
+    "Boolean": pyarrow.bool_(),
+    "String": pyarrow.string(),
+}
+
+
+def results_schema(outputs: list) -> pyarrow.Schema:
+    """
+    Returns the schema of the results of a package.
+
+    Arguments:
+    outputs: list
+        The outputs of the package as listed under `pipelineOutputs` in its `pipeline_config.yml`,
+        dictionaries with the keys `name`, `type` and `metric`.
+
+    Returns:
+    pyarrow.Schema
+        The payload id followed by one column per output.
+    """
+    fields = [(PAYLOAD_ID, pyarrow.int64())]
+    for output in outputs:
+        if output.get("metric", False):
+            fields.append((output["name"], pyarrow.float64()))
+        elif output["type"] in OUTPUT_TYPES:
+            fields.append((output["name"], OUTPUT_TYPES[output["type"]]))
+        else:
+            raise ValueError(
+                f"Unsupported type {output['type']} of output {output['name']}, "
+                f"expected one of {list(OUTPUT_TYPES)}"
+            )
+    return pyarrow.schema(fields)
+
+
+def _typed_value(value):
+    """
+    Returns the number in an output value which is an integer, float or metric string, otherwise the value itself.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return value
+    if isinstance(decoded, dict) and list(decoded) == ["value"]:
+        decoded = decoded["value"]
+    if isinstance(decoded, (int, float)) and not isinstance(decoded, bool):
+        return decoded
+    return value
+
+
+class ResultsWriter:
+    """
+    Writes the outputs of a package to a Parquet file incrementally.
+    The schema is the given one, see `results_schema`, or taken from the first outputs written
+    if it is None. Later outputs are converted to it, and a ValueError is raised if they do not fit.
+
+    Usage:
+        with ResultsWriter(results_file, schema) as writer:
+            writer.write(outputs, payload_ids)
+    """
+
+    def __init__(self, results_file, schema: pyarrow.Schema = None):
+        self.results_file = results_file
+        self.schema = schema
+        self.writer = None
+        self.rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, outputs: list, payload_ids: list):
+        """
+        Writes a batch of outputs.
+
+        Arguments:
+        outputs: list
+            Output dictionaries of the package. None outputs are skipped.
+        payload_ids: list
+            Index of the payload input for every output.
+        """
+        rows = [
+            {PAYLOAD_ID: payload_id, **output}
+            for output, payload_id in zip(outputs, payload_ids)
+            if output is not None
+        ]
+        if not rows:
+            return
+        columns = {}
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+        arrays = {}
+        for name in columns:
+            values = [row.get(name) for row in rows]
+            if self.schema is None or not _is_string_column(self.schema, name):
+                values = [_typed_value(value) for value in values]
+            arrays[name] = values
+        self.write_table(pyarrow.table(arrays))
+
+    def write_table(self, table: pyarrow.Table):
+        """
+        Writes a table of typed results, e.g. read from another results file.
+        Missing columns are written as nulls.
+        """
+        if self.schema is None:
+            self.schema = table.schema
+        unknown = [name for name in table.column_names if name not in self.schema.names]
+        if unknown:
+            raise ValueError(
+                f"Outputs {unknown} are not in the results schema {self.schema.names}"
+            )
+        columns = [
+            (
+                table[field.name]
+                if field.name in table.column_names
+                else pyarrow.nulls(table.num_rows, field.type)
+            )
+            for field in self.schema
+        ]
+        try:
+            # a safe cast, which raises instead of truncating values
+            table = pyarrow.Table.from_arrays(
+                [
+                    column.cast(field.type, safe=True)
+                    for column, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError) as error:
+            raise ValueError(
+                f"Outputs do not fit the results schema: {error}"
+            ) from error
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(
+                str(self.results_file), self.schema
+            )
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self.writer is None:
+            # no outputs at all, an empty file with the schema, or the payload id only, is written
+            self.writer = pyarrow.parquet.ParquetWriter(
+                str(self.results_file),
+                self.schema or pyarrow.schema([(PAYLOAD_ID, pyarrow.int64())]),
+            )
+        self.writer.close()
+
+
+def _is_string_column(schema: pyarrow.Schema, name: str) -> bool:
+    index = schema.get_field_index(name)
+    return index >= 0 and pyarrow.types.is_string(schema.field(index).type)
+
+
+def is_parquet_results(results_file) -> bool:
+    """
+    Returns True if the results file is a Parquet file.
+    """
+    with open(results_file, "rb") as file:
+        return file.read(len(PARQUET_MAGIC)) == PARQUET_MAGIC
+
+
+def iter_results_tables(results_file, batch_rows: int = 65536):
+    """
+    Yields the results of a Parquet results file as tables of at most `batch_rows` rows.
+    """
+    results = pyarrow.parquet.ParquetFile(str(results_file))
+    for batch in results.iter_batches(batch_size=batch_rows):
+        yield pyarrow.Table.from_batches([batch])
+
+
+def read_results(results_file, columns: list = None) -> pyarrow.Table:
+    """
+    Reads the given columns of a results file, or all columns if `columns` is None.
+
+    Arguments:
+    results_file: str or Path
+        Parquet results file, or CSV results file of earlier versions.
+    columns: list
+        Names of the columns to read.
+
+    Returns:
+    pyarrow.Table
+        The typed results.
+    """
+    if is_parquet_results(results_file):
+        return pyarrow.parquet.read_table(str(results_file), columns=columns)
+
+    logger.info(f"Reading CSV results {results_file}")
+    df = pandas.read_csv(results_file, quotechar="'", usecols=columns)
+    return pyarrow.Table.from_pandas(df, preserve_index=False)
@@ -3,19 +3,382 @@
 # SPDX-License-Identifier: MIT
 
 import argparse
-import joblib
-import pandas
+import bisect
+import itertools
+import json
+import multiprocessing
 import tempfile
 import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import yaml
+
 from common.src.base_logger import get_logger
+from common.src.package_payload import (
+    PayloadRows,
+    is_arrow_payload,
+    iter_payload_inputs,
+    iter_payload_rows,
+    payload_batch_rows,
+)
+from common.src.package_results import (
+    ResultsWriter,
+    iter_results_tables,
+    results_schema,
+)
+from simaticai.testing.data_stream import DataStream
 from simaticai.testing.pipeline_runner import LocalPipelineRunner
 
 logger = get_logger(__name__)
 
 
-def main(payload_data, package_path, validation_results):
+def _effective_step(window_size: int, window_step: int) -> int:
+    if window_step <= 0:
+        return window_size
+    # a full window is always predicted, so the next one starts at most 'window_size' rows later
+    return min(window_step, window_size)
+
+
+def shard_ranges(
+    n_rows: int,
+    shards: int,
+    window_size: int = 0,
+    window_step: int = 0,
+    warmup_windows: int = 1,
+) -> list:
+    """
+    Splits the inputs of a payload into contiguous shards which can be validated independently.
+
+    Without `window_size`, every input is independent (e.g. an image) and the inputs are split evenly.
+    With `window_size`, the inputs are the rows of a stateful pipeline which emits one output per completed window
+    of `window_size` rows and moves on by `window_step` rows. The windows are split evenly, and every shard
+    starts at the first row of its first window, so it produces exactly the outputs of its windows.
+    It also replays the `warmup_windows` windows before its first one, whose outputs are dropped,
+    so state carried over from earlier rows is built up as in a sequential run.
+
+    Arguments:
+    n_rows: int
+        Number of inputs of the payload, see `count_payload_rows`.
+    shards: int
+        Maximum number of shards.
+    window_size: int
+        Window size of a stateful pipeline, 0 for independent inputs.
+    window_step: int
+        Window step of a stateful pipeline, at most `window_size`.
+    warmup_windows: int
+        Number of windows replayed before the first window of a shard.
+
+    Returns:
+    list
+        (start, stop, drop) for every shard: the inputs [start, stop) are fed and the first `drop` outputs dropped.
+    """
+    if window_size <= 0:
+        bounds = [n_rows * shard // shards for shard in range(shards + 1)]
+        return [
+            (start, stop, 0) for start, stop in zip(bounds, bounds[1:]) if stop > start
+        ]
+
+    window_step = _effective_step(window_size, window_step)
+    n_windows = 0 if n_rows < window_size else (n_rows - window_size) // window_step + 1
+    bounds = [n_windows * shard // shards for shard in range(shards + 1)]
+
+    ranges = []
+    for first, last in zip(bounds, bounds[1:]):
+        if last <= first:
+            continue
+        drop = min(first, warmup_windows)
+        start = (first - drop) * window_step
+        # the last shard also feeds the rows after the last complete window
+        stop = n_rows if last == n_windows else (last - 1) * window_step + window_size
+        ranges.append((start, stop, drop))
+    return ranges
+
+
+def model_window_parameters(model_path) -> tuple:
+    """
+    Reads the window parameters of a stateful model from the metadata saved next to it,
+    e.g. `clustering-model.json` for the State Identifier.
+
+    Arguments:
+    model_path: str or Path
+        Model file, or folder containing the model and its metadata.
+
+    Returns:
+    tuple
+        `window_size` and `window_step` of the model, or None if there is no metadata with them.
+    """
+    model_path = Path(model_path)
+    if model_path.is_dir():
+        candidates = sorted(model_path.glob("*.json"))
+    else:
+        candidates = [model_path.with_suffix(".json")]
+    for candidate in candidates:
+        if not candidate.is_file():
+            continue
+        with open(candidate) as json_file:
+            metadata = json.load(json_file)
+        if isinstance(metadata, dict) and "window_size" in metadata:
+            return metadata["window_size"], metadata.get("window_step", 0)
+    return None
+
+
+def _as_list(output) -> list:
+    if isinstance(output, list):
+        return output
+    return [output]
+
+
+class _RowStream(DataStream):
+    """
+    Feeds an iterable of rows to a single `run_pipeline` call, which reads them into its input file.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def _pipeline_input(input_data):
+    if isinstance(input_data, PayloadRows):
+        return _RowStream(input_data)
+    return input_data
+
+
+def _window_payload_ids(
+    n_outputs: int, start: int, window_size: int, window_step: int, batch_ends: list
+) -> list:
+    """
+    Returns the payload ids of the outputs of a stateful pipeline fed with the rows from `start` on:
+    the index of the payload input, e.g. the record batch, holding the row which completes each window.
+    'batch_ends' holds the cumulative row counts of the payload inputs.
+    """
+    window_step = _effective_step(window_size, window_step)
+    return [
+        bisect.bisect_right(batch_ends, start + index * window_step + window_size - 1)
+        for index in range(n_outputs)
+    ]
+
+
+def _results_schema(package_zip_file: Path):
+    """
+    Returns the schema of the validation results from the outputs declared in the `pipeline_config.yml`
+    of the package, or None if the package has no pipeline configuration, so the schema is inferred.
+    """
+    with zipfile.ZipFile(package_zip_file, "r") as package:
+        config_names = sorted(
+            (
+                name
+                for name in package.namelist()
+                if name.endswith("pipeline_config.yml")
+            ),
+            key=len,
+        )
+        if not config_names:
+            logger.warning(f"No pipeline_config.yml in {package_zip_file}")
+            return None
+        config = yaml.safe_load(package.read(config_names[0]))
+    return results_schema(config["dataFlowPipeline"]["pipelineOutputs"])
+
+
+def _run_windowed(
+    runner: LocalPipelineRunner,
+    writer: ResultsWriter,
+    payload_file: Path,
+    shard: tuple,
+    window_size: int,
+    window_step: int,
+    warmup_windows: int,
+    batch_ends: list,
+    max_rows: int,
+):
+    """
+    Feeds the rows [start, stop) of a stateful pipeline given by `shard` (see `shard_ranges`) to `runner`
+    and writes all but the first `drop` outputs, every output with the payload id of the row completing its window.
+
+    The runner starts the package anew on every `run_pipeline` call and reads all rows of a call into a list,
+    so the rows are split into window-aligned chunks of about `max_rows` rows, which are fed one call each
+    and replay the `warmup_windows` windows before them, see `shard_ranges`.
+    """
+    start, stop, drop = shard
+    n_chunks = max(1, -(-(stop - start) // max(max_rows, 1)))
+    chunks = shard_ranges(
+        stop - start, n_chunks, window_size, window_step, warmup_windows
+    )
+    for chunk_start, chunk_stop, chunk_drop in chunks:
+        rows = PayloadRows(payload_file, start + chunk_start, start + chunk_stop)
+        outputs = _as_list(runner.run_pipeline(_RowStream(rows)))
+        payload_ids = _window_payload_ids(
+            len(outputs), start + chunk_start, window_size, window_step, batch_ends
+        )
+        skipped = chunk_drop + min(drop, max(len(outputs) - chunk_drop, 0))
+        drop -= skipped - chunk_drop
+        writer.write(outputs[skipped:], payload_ids[skipped:])
+
+
+def _validate_shard(
+    package_zip_file: Path,
+    test_dir: Path,
+    payload_file: Path,
+    shard_file: Path,
+    shard: tuple,
+    window_size: int,
+    window_step: int,
+    warmup_windows: int,
+    batch_ends: list,
+    max_rows: int,
+) -> int:
+    """
+    Runs the package with its own runner on the inputs [start, stop) of the payload given by `shard`
+    (see `shard_ranges`), drops the first `drop` outputs and writes the others to `shard_file`.
+    Returns the number of outputs written.
+
+    Independent inputs are fed one by one, so every output gets the payload id of its input.
+    The rows of a stateful pipeline are fed in window-aligned chunks, see `_run_windowed`.
+    """
+    start, stop, drop = shard
+    test_dir.mkdir(parents=True, exist_ok=True)
+
+    with ResultsWriter(
+        shard_file, _results_schema(package_zip_file)
+    ) as writer, LocalPipelineRunner(package_zip_file, test_dir) as runner:
+        if window_size <= 0:
+            rows = iter_payload_rows(payload_file, start, stop)
+            for row, input_data in enumerate(rows, start):
+                outputs = _as_list(runner.run_pipeline(input_data))
+                payload_id = bisect.bisect_right(batch_ends, row)
+                writer.write(outputs, [payload_id] * len(outputs))
+        else:
+            _run_windowed(
+                runner,
+                writer,
+                payload_file,
+                shard,
+                window_size,
+                window_step,
+                warmup_windows,
+                batch_ends,
+                max_rows,
+            )
+
+    logger.info(f"shard [{start}, {stop}): {writer.rows} outputs")
+    return writer.rows
+
+
+def _validate_sequential(
+    package_zip_file,
+    test_dir,
+    payload_file,
+    validation_results,
+    window_size,
+    window_step,
+    warmup_windows,
+    max_rows,
+):
+    # every input is replayed with one 'run_pipeline' call and its outputs are appended to the results,
+    # the rows of an Arrow payload are one input, see 'iter_payload_inputs',
+    # which is fed in window-aligned chunks if the window of the pipeline is known
+    batch_ends = list(itertools.accumulate(payload_batch_rows(payload_file)))
+    arrow_payload = is_arrow_payload(payload_file)
+    with ResultsWriter(
+        validation_results, _results_schema(package_zip_file)
+    ) as writer, LocalPipelineRunner(package_zip_file, test_dir) as runner:
+        if arrow_payload and window_size > 0:
+            n_rows = batch_ends[-1] if batch_ends else 0
+            _run_windowed(
+                runner,
+                writer,
+                payload_file,
+                (0, n_rows, 0),
+                window_size,
+                window_step,
+                warmup_windows,
+                batch_ends,
+                max_rows,
+            )
+            logger.info(f"outputs len: {writer.rows}")
+            return
+
+        for input_index, input_data in enumerate(iter_payload_inputs(payload_file)):
+            out1 = runner.run_pipeline(_pipeline_input(input_data))
+            logger.debug(f"out1: {out1}")
+
+            if isinstance(out1, list):
+                logger.info("out1 is a list")
+                outputs = out1
+            else:
+                logger.info("out1 is not a list")
+                outputs = [out1]
+
+            writer.write(outputs, [input_index] * len(outputs))
+
+    logger.info(f"outputs len: {writer.rows}")
+
+
+def _validate_sharded(
+    package_zip_file,
+    test_dir,
+    payload_file,
+    validation_results,
+    shards,
+    window_size,
+    window_step,
+    warmup_windows,
+    max_rows,
+):
+    batch_ends = list(itertools.accumulate(payload_batch_rows(payload_file)))
+    n_rows = batch_ends[-1] if batch_ends else 0
+    ranges = shard_ranges(n_rows, shards, window_size, window_step, warmup_windows)
+    logger.info(f"Validating {n_rows} inputs in {len(ranges)} shards: {ranges}")
+
+    shard_files = [test_dir / f"shard_{index}.parquet" for index in range(len(ranges))]
+    # every runner extracts the package and creates its virtual environment in its own working directory
+    with ProcessPoolExecutor(
+        max(len(ranges), 1), mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [
+            executor.submit(
+                _validate_shard,
+                package_zip_file,
+                test_dir / f"shard_{index}",
+                payload_file,
+                shard_file,
+                shard,
+                window_size,
+                window_step,
+                warmup_windows,
+                batch_ends,
+                max_rows,
+            )
+            for index, (shard_file, shard) in enumerate(zip(shard_files, ranges))
+        ]
+        for future in futures:
+            future.result()
+
+    # the results of the shards are concatenated in order
+    with ResultsWriter(validation_results, _results_schema(package_zip_file)) as writer:
+        for shard_file in shard_files:
+            for table in iter_results_tables(shard_file):
+                if table.num_rows > 0:
+                    writer.write_table(table)
+
+    logger.info(f"outputs len: {writer.rows}")
+
+
+def main(
+    payload_data,
+    package_path,
+    validation_results,
+    shards: int = 1,
+    window_size: int = 0,
+    window_step: int = 0,
+    warmup_windows: int = 1,
+    max_rows: int = 1000000,
+    model_path=None,
+):
     """Validates the created package through the next steps:
      - extracts the given package
      - creates a virtual python environment
@@ -23,8 +386,24 @@ def main(payload_data, package_path, validation_results):
      - reads the given example payloads
      - executes the defined pipeline against the given example payloads
     If successful, the package can be registered
+
+    With `shards` > 1, the payloads are split into shards (see `shard_ranges`) which are validated
+    by separate runners in a process pool, and the outputs are merged in the original order.
+    Stateful pipelines like the State Identifier need `window_size` and `window_step` for window-aligned shards,
+    and for the payload id of every output, see `package_results`. Their rows are fed in window-aligned chunks
+    of about `max_rows` rows, as the runner reads all rows of a `run_pipeline` call into memory.
+    Without `window_size`, they are read from the metadata of the model at `model_path`, if given,
+    see `model_window_parameters`.
     """
 
+    if window_size <= 0 and model_path is not None:
+        window_parameters = model_window_parameters(model_path)
+        if window_parameters is None:
+            logger.warning(f"No window parameters found for the model {model_path}")
+        else:
+            window_size, window_step = window_parameters
+            logger.info(f"Window parameters of the model: {window_size}, {window_step}")
+
     validation_results = Path(validation_results)
     package_path = Path(package_path)
     package_path = (
@@ -56,29 +435,29 @@ def main(payload_data, package_path, validation_results):
         payload_file,
     )
 
-    input_list = joblib.load(payload_file)
-    logger.info(f"input_list len: {len(input_list)}")
-    logger.debug(f"input_list[0]: {input_list[0]}")
-
-    outputs = []
-    with LocalPipelineRunner(package_zip_file, test_dir) as runner:
-        for input_data in input_list:
-            out1 = runner.run_pipeline(input_data)
-            logger.info(f"out1: {out1}")
-
-            if isinstance(out1, list):
-                logger.info("out1 is a list")
-                for row in out1:
-                    outputs.append(row)
-            else:
-                logger.info("out1 is not a list")
-                outputs.append(out1)
-
-    logger.info(f"outputs len: {len(outputs)}")
-    logger.debug(f"outputs: {outputs}")
-
-    df_outputs = pandas.DataFrame(outputs)
-    df_outputs.to_csv(validation_results, quotechar="'", index=False)
+    if shards > 1:
+        _validate_sharded(
+            package_zip_file,
+            test_dir,
+            payload_file,
+            validation_results,
+            shards,
+            window_size,
+            window_step,
+            warmup_windows,
+            max_rows,
+        )
+    else:
+        _validate_sequential(
+            package_zip_file,
+            test_dir,
+            payload_file,
+            validation_results,
+            window_size,
+            window_step,
+            warmup_windows,
+            max_rows,
+        )
 
 
 if __name__ == "__main__":
@@ -87,7 +466,7 @@ if __name__ == "__main__":
         "--payload_data",
         type=str,
         default="../data/payload_data",
-        help="Path to created payload data file in joblib",
+        help="Path to created payload data file in Arrow IPC or joblib format",
     )
     parser.add_argument(
         "--package_path",
@@ -97,7 +476,43 @@ if __name__ == "__main__":
     parser.add_argument(
         "--validation_results",
         type=str,
-        help="Validation result file for outputs",
+        help="Validation result file for outputs, written in Parquet format",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Number of shards validated in parallel by separate runners, 1 to validate sequentially",
+    )
+    parser.add_argument(
+        "--window_size",
+        type=int,
+        default=0,
+        help="Window size of a stateful pipeline for window-aligned shards, 0 for independent inputs",
+    )
+    parser.add_argument(
+        "--window_step",
+        type=int,
+        default=0,
+        help="Window step of a stateful pipeline, defaults to the window size",
+    )
+    parser.add_argument(
+        "--warmup_windows",
+        type=int,
+        default=1,
+        help="Number of windows replayed before every shard, whose outputs are dropped",
+    )
+    parser.add_argument(
+        "--max_rows",
+        type=int,
+        default=1000000,
+        help="Number of rows of a stateful pipeline fed to the package at once",
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default=None,
+        help="Model with its metadata, which the window parameters are read from if not given",
     )
 
     args = parser.parse_args()
@@ -106,4 +521,10 @@ if __name__ == "__main__":
         payload_data=args.payload_data,
         package_path=args.package_path,
         validation_results=args.validation_results,
+        shards=args.shards,
+        window_size=args.window_size,
+        window_step=args.window_step,
+        warmup_windows=args.warmup_windows,
+        max_rows=args.max_rows,
+        model_path=args.model,
     )
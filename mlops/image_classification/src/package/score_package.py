@@ -7,10 +7,10 @@ import json
 import os
 from pathlib import Path
 
-import pandas as pd
 from azure.ai.ml import MLClient
 from azure.identity import ManagedIdentityCredential
 from common.src.base_logger import get_logger
+from common.src.package_results import read_results
 from sklearn.metrics import classification_report
 
 logger = get_logger(__name__)
@@ -49,14 +49,11 @@ def main(
         int(labels_dict[class_name]) for class_name in raw_data_classes
     ]
 
-    df = pd.read_csv(validation_results, quotechar="'")
-    logger.info(f"DataFrame columns: {df.columns}")  # Log the columns of the DataFrame
-    results = df.to_dict(orient="records")
+    # only the prediction column is read, as a NumPy array
+    results = read_results(validation_results, columns=["prediction"])
+    logger.info(f"results len: {results.num_rows}")
 
-    logger.info(f"results len: {len(results)}")
-    logger.debug(f"results: {results}")
-
-    validation_results_classes_int = [int(item["prediction"]) for item in results]
+    validation_results_classes_int = results["prediction"].to_numpy().astype(int)
 
     clf_report = classification_report(
         y_true=raw_data_classes_int,
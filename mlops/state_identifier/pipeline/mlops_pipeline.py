@@ -29,6 +29,7 @@ def state_identifier_data_regression(pipeline_job_input, model_name, build_refer
         raw_data=pipeline_job_input,
         prep_data=prepare_data.outputs.prep_data,
         model=train_with_data.outputs.model_output,
+        feature_cache=train_with_data.outputs.feature_cache,
     )
     register_model_with_data = gl_pipeline_components[3](  # noqa: F841
         model_metadata=train_with_data.outputs.model_metadata,
@@ -0,0 +1,309 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Benchmark suite for the hot paths of the State Identifier.
+
+It generates synthetic three-phase data, trains the pipeline of `train.py` on it and measures:
+- the throughput in rows/s of `FillMissingValues`, `SumColumnsTransformer`, `WindowTransformer` and
+  `FeatureTransformer` on the training data, one by one and as a whole,
+- the latency percentiles of `inference.process_data` per sample and per completed window,
+  for several `step_size` settings between 1 and `window_size`, with and without incremental features,
+  on a stream of data without missing values,
+- the peak memory of the featurization, as traced by `tracemalloc`, and the peak resident memory of the process.
+
+The results are written to a JSON file with sorted keys, so the results of two commits can be diffed:
+
+    python -m state_identifier.src.benchmark.benchmark --rows 1000000 --output benchmark.json
+
+`inference.py` is loaded from a copy in a temporary folder, next to the benchmark model, as in an edge package.
+As the AI Inference Server module `log_module` is not available outside of the server, a stand-in
+writing to the standard `logging` module is put in that folder if needed.
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import sklearn
+from sklearn.cluster import KMeans
+
+from state_identifier.src.si.model_artifact import save_model_artifact
+from state_identifier.src.si.pipeline import create_pipeline
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+INPUT_COLUMNS = ["ph1", "ph2", "ph3"]
+
+LOG_MODULE_STAND_IN = """import logging
+
+
+class LogModule:
+    def __getattr__(self, name):
+        return getattr(logging.getLogger("inference"), name)
+"""
+
+
+def generate_data(
+    rows: int, missing_ratio: float = 0.001, random_state: int = 0
+) -> np.array:
+    """
+    Generates synthetic energy consumption data of three phases, indexed by timestamp x phase.
+    The machine switches between three states with different consumption levels after random durations.
+    The phases are modulated with a 120 degree offset and noise is added. A ratio of `missing_ratio`
+    values is NaN.
+    """
+    rng = np.random.default_rng(random_state)
+    durations = rng.integers(500, 5000, rows // 500 + 1)
+    states = np.repeat(rng.integers(0, 3, len(durations)), durations)[:rows]
+    levels = np.array([2000.0, 6000.0, 10000.0])[states]
+
+    timestamps = np.arange(rows).reshape((-1, 1))
+    phases = np.arange(3).reshape((1, -1)) * 2 * np.pi / 3
+    modulation = 1 + 0.05 * np.sin(2 * np.pi * timestamps / 1000 + phases)
+    data = levels.reshape((-1, 1)) * modulation + rng.normal(0, 100, (rows, 3))
+    data[rng.random((rows, 3)) < missing_ratio] = np.nan
+    return data
+
+
+def percentiles(values) -> dict:
+    """
+    Returns the count, mean and 50th, 90th, 99th percentile and maximum of latencies in microseconds.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return {"count": 0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "count": len(values),
+        "mean_us": float(values.mean()),
+        "p50_us": float(p50),
+        "p90_us": float(p90),
+        "p99_us": float(p99),
+        "max_us": float(values.max()),
+    }
+
+
+def benchmark_featurization(pipe, x: np.array, repeat: int) -> dict:
+    """
+    Measures the throughput of the preprocessing steps up to the featurization on the training data.
+    Every step is timed separately on the output of the previous step, the best of `repeat` runs is reported.
+    """
+    results = {}
+    total_seconds = 0.0
+    data = x
+    for name, step in pipe["preprocessing"].steps:
+        if name == "scaling":
+            break
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = step.transform(data)
+            seconds.append(time.perf_counter() - start)
+        data = output
+        total_seconds += min(seconds)
+        results[name] = {
+            "seconds": min(seconds),
+            "rows_per_second": len(x) / min(seconds),
+        }
+
+    results["total"] = {
+        "seconds": total_seconds,
+        "rows_per_second": len(x) / total_seconds,
+    }
+    return results
+
+
+def measure_featurization_memory(pipe, x: np.array) -> int:
+    """
+    Returns the peak of the memory allocated while featurizing `x`, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        data = x
+        for name, step in pipe["preprocessing"].steps:
+            if name == "scaling":
+                break
+            data = step.transform(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def load_inference(pipe, folder: Path):
+    """
+    Saves the pipeline as in an edge package and loads a copy of `inference.py` which uses it.
+    """
+    si_folder = folder / "state_identifier" / "src" / "si"
+    si_folder.mkdir(parents=True)
+    inference_file = si_folder / "inference.py"
+    shutil.copy(Path(__file__).parent.parent / "si" / "inference.py", inference_file)
+
+    models_folder = folder / "models"
+    models_folder.mkdir()
+    save_model_artifact(pipe, models_folder / "clustering-model.joblib", INPUT_COLUMNS)
+
+    if importlib.util.find_spec("log_module") is None:
+        (folder / "log_module.py").write_text(LOG_MODULE_STAND_IN)
+        sys.path.append(str(folder))
+
+    spec = importlib.util.spec_from_file_location("benchmark_inference", inference_file)
+    inference = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(inference)
+    return inference
+
+
+def benchmark_process_data(
+    inference, x: np.array, step_sizes: list, incremental: bool
+) -> dict:
+    """
+    Streams the rows of `x` through `inference.process_data` for every step size and
+    returns the latency percentiles per sample and per completed window.
+    """
+    samples = [
+        {
+            column: None if np.isnan(value) else float(value)
+            for column, value in zip(INPUT_COLUMNS, row)
+        }
+        for row in x
+    ]
+
+    results = {}
+    for step_size in step_sizes:
+        inference.update_parameters(
+            {"step_size": step_size, "incremental_features": incremental}
+        )
+        inference.aggregated_data.clear()
+        if inference.window_features is not None:
+            inference.window_features.clear()
+
+        sample_latencies = []
+        window_latencies = []
+        for sample in samples:
+            start = time.perf_counter_ns()
+            output = inference.process_data(sample)
+            latency = (time.perf_counter_ns() - start) / 1000
+            sample_latencies.append(latency)
+            if output is not None:
+                window_latencies.append(latency)
+
+        results[f"step_size_{step_size}"] = {
+            "per_sample": percentiles(sample_latencies),
+            "per_window": percentiles(window_latencies),
+        }
+        logger.info(f"step_size={step_size}, incremental={incremental}: done")
+
+    return results
+
+
+def main(
+    rows: int,
+    samples: int,
+    step_sizes: list,
+    repeat: int,
+    output: str,
+    random_state: int = 0,
+):
+    x = generate_data(rows, random_state=random_state)
+    logger.info(f"data shape: {x.shape}")
+
+    pipe = create_pipeline(KMeans(n_clusters=3, random_state=0))
+    pipe.fit(x)
+    window_size = pipe["preprocessing"]["windowing"].window_size
+    if step_sizes is None:
+        step_sizes = sorted({1, 10, window_size // 10, window_size // 2, window_size})
+
+    results = {
+        "config": {
+            "rows": rows,
+            "samples": samples,
+            "step_sizes": step_sizes,
+            "repeat": repeat,
+            "random_state": random_state,
+            "window_size": window_size,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scikit-learn": sklearn.__version__,
+            "machine": platform.machine(),
+        },
+    }
+
+    logger.info("Benchmarking featurization")
+    results["featurization"] = benchmark_featurization(pipe, x, repeat)
+
+    logger.info("Benchmarking process_data")
+    with tempfile.TemporaryDirectory() as folder:
+        inference = load_inference(pipe, Path(folder))
+        # without missing values, as a window starting with a missing value cannot be predicted
+        stream = generate_data(samples, missing_ratio=0.0, random_state=random_state)
+        results["process_data"] = {
+            "full": benchmark_process_data(inference, stream, step_sizes, False),
+            "incremental": benchmark_process_data(inference, stream, step_sizes, True),
+        }
+
+    results["memory"] = {
+        "featurization_peak_bytes": measure_featurization_memory(pipe, x),
+        # kilobytes on Linux
+        "process_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+    logger.info(f"Writing results to {output}")
+    with open(output, "w") as json_file:
+        json.dump(results, json_file, indent=4, sort_keys=True)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser("benchmark")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        default=1000000,
+        help="Number of rows of the synthetic training data",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=5000,
+        help="Number of rows streamed through process_data per step size",
+    )
+    parser.add_argument(
+        "--step_sizes",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Step sizes of process_data, defaults to values between 1 and window_size",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs of every featurization step, the fastest is reported",
+    )
+    parser.add_argument(
+        "--output", type=str, default="benchmark.json", help="Path of the JSON results"
+    )
+
+    args = parser.parse_args()
+
+    main(
+        rows=args.rows,
+        samples=args.samples,
+        step_sizes=args.step_sizes,
+        repeat=args.repeat,
+        output=args.output,
+    )
@@ -12,6 +12,9 @@ logger.info("entrypoint imported")
 
 def process_input(data: dict):
 
+    if isinstance(data, list):
+        return inference.process_batch(data)
+
     return inference.process_data(data)
 
 
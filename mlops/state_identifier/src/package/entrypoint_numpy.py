@@ -0,0 +1,23 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+from log_module import LogModule
+
+logger = LogModule()
+
+from state_identifier.src.si import numpy_inference
+
+logger.info("entrypoint imported")
+
+
+def process_input(data: dict):
+
+    if isinstance(data, list):
+        return numpy_inference.process_batch(data)
+
+    return numpy_inference.process_data(data)
+
+
+def update_parameters(params: dict):
+
+    numpy_inference.update_parameters(params)
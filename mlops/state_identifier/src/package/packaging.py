@@ -12,12 +12,22 @@ from pathlib import Path
 import shutil
 import uuid
 import json
-import joblib
 import pickle
 from azure.ai.ml import MLClient
 from azure.core.exceptions import ResourceNotFoundError
 from azure.identity import ManagedIdentityCredential
 from simaticai import deployment
+from state_identifier.src.si.model_artifact import (
+    load_model_artifact,
+    load_model_metadata,
+    metadata_path,
+    save_model_artifact,
+)
+from state_identifier.src.si.numpy_export import (
+    export_numpy_model,
+    parity_data,
+    verify_numpy_model,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -127,11 +137,39 @@ def download_model(ml_client: MLClient, model_name: str, model_version: str):
     target_model_path = target_folder / "clustering-model.joblib"
     logger.info("target_model_path: %s", target_model_path)
 
-    joblib.dump(model_instance, target_model_path)
+    # uncompressed, memory-mappable model with its metadata for a fast startup on the edge
+    metadata = save_model_artifact(model_instance, target_model_path, ["ph1", "ph2", "ph3"])
+    logger.info("model metadata: %s", metadata)
 
     return target_model_path, python_version
 
 
+def export_numpy_runtime(model_path: Path, strict: bool = False):
+    """Compiles the model into the NumPy-only model of `state_identifier.src.si.numpy_runtime`
+    next to it, and checks that it predicts the same as the pipeline on synthetic data.
+    Returns the path of the compiled model, or None if the model cannot be compiled
+    or the predictions differ, unless `strict` is True, in which case an error is raised."""
+
+    numpy_model_path = model_path.with_suffix(".npz")
+    logger.info(" ===> Exporting NumPy model to %s", numpy_model_path)
+    pipe = load_model_artifact(model_path, mmap_mode=None)
+
+    try:
+        model = export_numpy_model(pipe, numpy_model_path, ["ph1", "ph2", "ph3"])
+        parity = verify_numpy_model(pipe, model, parity_data(model))
+        logger.info("NumPy model parity: %s", parity)
+        if parity["label_mismatches"] > 0:
+            raise ValueError(f"The NumPy model predicts differently: {parity}")
+    except ValueError as error:
+        if strict:
+            raise
+        logger.warning("Packaging the scikit-learn pipeline instead: %s", error)
+        numpy_model_path.unlink(missing_ok=True)
+        return None
+
+    return numpy_model_path
+
+
 def get_package_id(ml_client: MLClient, package_name: str):
     logger.info(" ===> Getting package_id for %s from Model Registry", package_name)
     """Finds the package_id of an edge package given package in Model registry,
@@ -160,6 +198,7 @@ def create_package(
     package_id: str,
     python_version: str,
     model_name: str,
+    numpy_model_path: Path = None,
 ):
     logger.info(
         " ===> Creating package for %s version %s with package_id %s",
@@ -168,7 +207,9 @@ def create_package(
         package_id,
     )
 
-    """Create a PythonComponent to use the saved model."""
+    """Create a PythonComponent to use the saved model.
+    If `numpy_model_path` is given, the component runs the compiled NumPy-only model
+    with `entrypoint_numpy.py` and only requires NumPy."""
 
     current_dir = Path(os.path.dirname(__file__))
     logger.info(f"current_dir: {current_dir}")
@@ -185,6 +226,7 @@ def create_package(
     # e.g.: model_folder = model_path.parent.parent = "/somepath/image_classification"
     model_folder = Path(model_path).parent.parent.resolve()
     model_file = "models/" + model_path.name
+    metadata_file = "models/" + metadata_path(model_path).name
 
     logger.info(f"model_folder: {model_folder}")
     logger.info(f"model_file: {model_file}")
@@ -197,12 +239,29 @@ def create_package(
         python_version=python_version,
     )
 
+    if numpy_model_path is not None:
+        entrypoint = "entrypoint_numpy.py"
+        model_files = ["models/" + numpy_model_path.name]
+        requirements_file = "requirements_numpy.txt"
+        si_resources = [
+            "state_identifier/src/si/__init__.py",
+            "state_identifier/src/si/numpy_inference.py",
+            "state_identifier/src/si/numpy_runtime.py",
+            "state_identifier/src/si/ring_buffer.py",
+        ]
+    else:
+        entrypoint = "entrypoint.py"
+        model_files = [model_file, metadata_file]
+        requirements_file = "requirements.txt"
+        si_resources = ["state_identifier/src/si"]
+    logger.info(f"entrypoint: {entrypoint}")
+
     component.add_resources(
         current_dir,  # copy files from ../related folder
-        ["entrypoint.py"],
+        [entrypoint],
     )
-    component.add_resources(model_folder, model_file)
-    component.set_entrypoint("entrypoint.py")
+    component.add_resources(model_folder, model_files)
+    component.set_entrypoint(entrypoint)
 
     component.add_input("ph1", "Double", "Measured energy consumption on phase 1")
     component.add_input("ph2", "Double", "Measured energy consumption on phase 2")
@@ -219,19 +278,23 @@ def create_package(
 
     component.add_resources(
         mlops_folder,
-        [
-            "state_identifier/src/si",
-        ],
+        si_resources,
     )
 
     pipeline = deployment.Pipeline.from_components(
         [component], name=model_name, desc=PIPELINE_DESCRIPTION
     )
 
-    pipeline.add_parameter("step_size", 300, "Integer")
+    # the windows advance by the window step of the model, which package validation aligns its shards to
+    metadata = load_model_metadata(model_path)
+    step_size = 300 if metadata is None else int(metadata["window_step"])
+    pipeline.add_parameter("step_size", step_size, "Integer")
+    if numpy_model_path is None:
+        pipeline.add_parameter("incremental_features", False, "Boolean")
+        pipeline.add_parameter("fused_predictor", False, "Boolean")
     pipeline.set_timeshifting_periodicity(250)
 
-    requirements_path = current_dir / "requirements.txt"
+    requirements_path = current_dir / requirements_file
     logger.info(
         f"requirements_path: {requirements_path}",
     )
@@ -255,9 +318,13 @@ def main(
     workspace_name: str,
     subscription_id: str,
     output_model: str,
+    runtime: str = "sklearn",
 ):
     """
     Downloads the model from Model registry.
+    Compiles it into a NumPy-only model, depending on `runtime`: 'sklearn', the default, skips it and
+    the package runs the scikit-learn pipeline as before, 'numpy' requires it,
+    'auto' falls back to the scikit-learn pipeline if it fails.
     Creates Edge Package from model.
     Registers the created Edge Package.
     """
@@ -270,12 +337,20 @@ def main(
     logger.info(f"package_name: {package_name}")
 
     model_path, python_version = download_model(ml_client, model_name, model_version)
+    numpy_model_path = None
+    if runtime != "sklearn":
+        numpy_model_path = export_numpy_runtime(model_path, strict=runtime == "numpy")
     package_id = get_package_id(ml_client, package_name)
 
     package_version = model_version
 
     config_package_path = create_package(
-        model_path, package_version, package_id, python_version, model_name
+        model_path,
+        package_version,
+        package_id,
+        python_version,
+        model_name,
+        numpy_model_path,
     )
     package_path = Path(package_path)
     package_path = (
@@ -303,6 +378,9 @@ def main(
         logger.info(f"output_model_path: {output_model_path}")
 
         shutil.copy(model_path, output_model_path)
+        shutil.copy(metadata_path(model_path), metadata_path(output_model_path))
+        if numpy_model_path is not None:
+            shutil.copy(numpy_model_path, output_model_path.with_suffix(".npz"))
 
 
 if __name__ == "__main__":
@@ -323,6 +401,13 @@ if __name__ == "__main__":
     parser.add_argument("--subscription_id", type=str, default="Azure subscription id")
     parser.add_argument("--package_path", type=str, default="UriFile saved package")
     parser.add_argument("--output_model", type=str, help="model download to output")
+    parser.add_argument(
+        "--runtime",
+        type=str,
+        default="sklearn",
+        choices=["sklearn", "numpy", "auto"],
+        help="Runtime of the package: the scikit-learn pipeline, the NumPy-only model, or NumPy if possible",
+    )
 
     args = parser.parse_args()
     logger.info(
@@ -340,4 +425,5 @@ if __name__ == "__main__":
         workspace_name=args.workspace_name,
         subscription_id=args.subscription_id,
         output_model=args.output_model,
+        runtime=args.runtime,
     )
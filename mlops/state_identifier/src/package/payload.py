@@ -3,31 +3,38 @@
 # SPDX-License-Identifier: MIT
 
 import argparse
-import joblib
 import logging
-import pandas as pd
+import pyarrow
+import pyarrow.dataset
+
+from common.src.package_payload import write_payload
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
-def main(raw_data: str, payload_data: str) -> None:
+def main(raw_data: str, payload_data: str, batch_rows: int = 100000) -> None:
 
     lines = [
         f"Raw data path: {raw_data}",
         f"Data output path: {payload_data}",
+        f"Rows per batch: {batch_rows}",
     ]
     logger.info("\n".join(lines))
 
-    raw_data_frame = pd.read_parquet(raw_data)
-
-    # creating a list of dictionaries as the `process_input(..)` method receives them
-    input_list = raw_data_frame[["ph1", "ph2", "ph3"]].to_dict(orient="records")
-
-    array_of_input_lists = []
-    array_of_input_lists.append(input_list)
+    input_columns = ["ph1", "ph2", "ph3"]
 
-    joblib.dump(array_of_input_lists, payload_data, compress=9)
+    # the input columns are copied batch by batch into an Arrow IPC file, whose rows are replayed
+    # as a single stream of dictionaries as the `process_input(..)` method receives them,
+    # so the windows spanning the record batches are kept
+    dataset = pyarrow.dataset.dataset(raw_data, format="parquet")
+    schema = pyarrow.schema([dataset.schema.field(column) for column in input_columns])
+    rows = write_payload(
+        dataset.to_batches(columns=input_columns, batch_size=batch_rows),
+        schema,
+        payload_data,
+    )
+    logger.info(f"Rows written: {rows}")
 
     logger.info("Finish")
 
@@ -45,9 +52,15 @@ if __name__ == "__main__":
         type=str,
         help="Path to payload data to be created",
     )
+    parser.add_argument(
+        "--batch_rows",
+        type=int,
+        default=100000,
+        help="Maximum number of rows per record batch of the payload",
+    )
 
     args = parser.parse_args()
     raw_data = args.raw_data
     payload_data = args.payload_data
 
-    main(raw_data=raw_data, payload_data=payload_data)
+    main(raw_data=raw_data, payload_data=payload_data, batch_rows=args.batch_rows)
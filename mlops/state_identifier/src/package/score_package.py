@@ -6,15 +6,15 @@ import argparse
 import json
 from pathlib import Path
 import pandas
-import numpy as np
 import joblib
-from sklearn.metrics import silhouette_score
-from state_identifier.src.score.scoring_utils import dunn_index
+from state_identifier.src.score.scoring_utils import dunn_index, silhouette
+from state_identifier.src.prep.feature_cache import cached_features, transform_features
 from state_identifier.src.si.preprocessing import (
     SumColumnsTransformer,
 )
 
 from common.src.base_logger import get_logger
+from common.src.package_results import read_results
 
 logger = get_logger(__name__)
 
@@ -29,6 +29,9 @@ def main(
     raw_data: str,
     model: str,
     metrics_results: str,
+    silhouette_mode: str = "sampled",
+    silhouette_sample_size: int = 10000,
+    feature_cache: str = None,
 ):
 
     logger.info(f"subscription_id: {subscription_id}")
@@ -38,7 +41,7 @@ def main(
     logger.info(f"asset_version: {asset_version}")
 
     """Compute clustering metrics for packaged model:
-    - reads prediction labels, inertia from validation_results
+    - reads prediction labels from the prediction column of validation_results
     - loads prep_data
     - computes the following metrics: silhouette, dunn_index
     - metrics are written to an output file
@@ -62,14 +65,10 @@ def main(
         validation_file,
     )
 
-    df = pandas.read_csv(validation_file, quotechar="'")
-    logger.info(f"DataFrame columns: {df.columns}")  # Log the columns of the DataFrame
-
-    results = df.to_dict(orient="records")
-    predictions = [int(item["prediction"]) for item in results]
-
-    # Convert predictions to a NumPy array
-    validation_labels = np.array(predictions)
+    # only the prediction column is read, as a NumPy array
+    results = read_results(validation_file, columns=["prediction"])
+    validation_labels = results["prediction"].to_numpy().astype(int)
+    logger.info(f"validation_labels len: {len(validation_labels)}")
 
     # Load the model
     models_file_path = Path(model) / "clustering-model.joblib"
@@ -89,9 +88,10 @@ def main(
     data_preparation_pipeline = model_instance.named_steps["preprocessing"]
 
     raw_data_numpy_filtered = raw_data_frame[input_columns].values
-    data_preparation_pipeline.fit(raw_data_numpy_filtered)
-
-    transformed_data = data_preparation_pipeline.transform(raw_data_numpy_filtered)
+    features = cached_features(
+        raw_data_numpy_filtered, data_preparation_pipeline, feature_cache
+    )
+    transformed_data = transform_features(features, data_preparation_pipeline, fit=True)
     prep_data = pandas.DataFrame(transformed_data)
 
     if len(validation_labels) != len(prep_data):
@@ -103,14 +103,19 @@ def main(
             "Inconsistent number of samples between prep_data and validation_labels."
         )
 
-    silhouette_score_value = silhouette_score(prep_data, validation_labels)
-    logger.info(f"silhouette: {silhouette_score_value}")
+    silhouette_result = silhouette(
+        prep_data,
+        validation_labels,
+        mode=silhouette_mode,
+        sample_size=silhouette_sample_size,
+    )
+    logger.info(f"silhouette: {silhouette_result}")
 
-    dunn_index_value = dunn_index(prep_data, validation_labels)
+    dunn_index_value = dunn_index(prep_data, validation_labels, use_kdtree=True)
     logger.info(f"dunn_index: {dunn_index_value}")
 
     metrics_dict = {
-        "silhouette": silhouette_score_value,
+        **silhouette_result,
         "dunn_index": dunn_index_value,
     }
 
@@ -138,6 +143,25 @@ if __name__ == "__main__":
     parser.add_argument("--prep_data", type=str, help="Path to prep data")
     parser.add_argument("--model", type=str, help="Path to model")
     parser.add_argument("--metrics_results", type=str, help="Path to output file")
+    parser.add_argument(
+        "--silhouette_mode",
+        type=str,
+        default="sampled",
+        choices=["exact", "sampled", "simplified"],
+        help="How the silhouette is computed",
+    )
+    parser.add_argument(
+        "--silhouette_sample_size",
+        type=int,
+        default=10000,
+        help="Number of observations per sample if silhouette_mode is sampled",
+    )
+    parser.add_argument(
+        "--feature_cache",
+        type=str,
+        default=None,
+        help="Directory of cached features, no caching if omitted",
+    )
 
     args = parser.parse_args()
 
@@ -151,4 +175,7 @@ if __name__ == "__main__":
         raw_data=args.raw_data,
         model=args.model,
         metrics_results=args.metrics_results,
+        silhouette_mode=args.silhouette_mode,
+        silhouette_sample_size=args.silhouette_sample_size,
+        feature_cache=args.feature_cache,
     )
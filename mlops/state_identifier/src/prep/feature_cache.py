@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Content-addressed cache for the features of the State Identifier preprocessing pipeline.
+
+Training, scoring and package scoring feed the same raw data through the same steps
+`FillMissingValues → SumColumnsTransformer → WindowTransformer → FeatureTransformer`.
+These steps are stateless, so their output only depends on the input data and the parameters of the steps,
+apart from `RUNTIME_PARAMS` which only affect how it is computed.
+The cache stores the feature matrix as an uncompressed `.npy` file named after a hash of both,
+and later steps load it memory-mapped instead of recomputing it.
+The steps after the featurization (e.g. `MinMaxScaler`) are fitted and applied as usual.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from sklearn.base import BaseEstimator
+
+from state_identifier.src.si.pipeline import _function_key, _transform_steps
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+# increase when the features computed for the same data and parameters change
+CACHE_VERSION = 1
+
+# parameters which do not change the features, e.g. the number of parallel jobs, and are left out of the key
+RUNTIME_PARAMS = ("n_jobs", "copy")
+
+
+def _canonical(value):
+    """
+    Returns a JSON-serializable representation of a parameter value, which is stable across processes.
+    Estimators are represented by their class and parameters without `RUNTIME_PARAMS`,
+    functions by their module and qualified name.
+    """
+    if isinstance(value, BaseEstimator):
+        name = f"{type(value).__module__}.{type(value).__qualname__}"
+        params = value.get_params(deep=False)
+        for param in RUNTIME_PARAMS:
+            params.pop(param, None)
+        return [name, _canonical(params)]
+    if isinstance(value, dict):
+        return {str(key): _canonical(value[key]) for key in sorted(value, key=str)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return [str(value.dtype), value.tolist()]
+    if callable(value):
+        return _function_key(value)
+    return repr(value)
+
+
+def feature_cache_key(x: np.ndarray, steps: list) -> str:
+    """
+    Returns the hash of the input data and the parameters of the given pipeline steps.
+
+    Params:
+        x (numpy.array): Input data indexed by timestamp x variable
+        steps (list): (name, transformer) pairs of the steps computing the features
+    Returns:
+        str: Hexadecimal SHA-256 digest
+    """
+    x = np.ascontiguousarray(x)
+    digest = hashlib.sha256()
+    header = {
+        "version": CACHE_VERSION,
+        "dtype": str(x.dtype),
+        "shape": list(x.shape),
+        "steps": _canonical(list(steps)),
+    }
+    digest.update(json.dumps(header, sort_keys=True).encode("utf-8"))
+    digest.update(memoryview(x.reshape(-1)).cast("B"))
+    return digest.hexdigest()
+
+
+def _split_steps(preprocessing, feature_step: str):
+    """
+    Splits the flattened steps of `preprocessing` into the steps up to and including `feature_step`
+    and the steps after it.
+    """
+    steps = list(_transform_steps(preprocessing.steps))
+    names = [name for name, _ in steps]
+    if feature_step not in names:
+        raise ValueError(
+            f"The preprocessing pipeline has no step named '{feature_step}'"
+        )
+    split = names.index(feature_step) + 1
+    return steps[:split], steps[split:]
+
+
+def cached_features(
+    x: np.ndarray,
+    preprocessing,
+    cache_dir=None,
+    feature_step: str = "featurization",
+) -> np.ndarray:
+    """
+    Returns the output of the preprocessing steps up to and including `feature_step` for `x`.
+
+    If `cache_dir` is given, the features are looked up there by `feature_cache_key` and loaded memory-mapped,
+    or computed and stored there if they are missing. If they cannot be stored, e.g. because `cache_dir`
+    is on a read-only mount, the computed features are returned uncached.
+    Without `cache_dir` the features are always computed.
+
+    Params:
+        x (numpy.array): Input data indexed by timestamp x variable
+        preprocessing (sklearn.pipeline.Pipeline): Preprocessing pipeline, e.g. `pipe["preprocessing"]`
+        cache_dir (str or Path): Directory of the cache files, or None to disable caching
+        feature_step (str): Name of the step whose output is cached
+    Returns:
+        numpy.array: Features indexed by window x feature
+    """
+    steps, _ = _split_steps(preprocessing, feature_step)
+
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = Path(cache_dir) / f"{feature_cache_key(x, steps)}.npy"
+        if cache_file.exists():
+            logger.info(f"Loading cached features from {cache_file}")
+            return np.load(cache_file, mmap_mode="r")
+
+    features = x
+    for _, step in steps:
+        features = step.fit_transform(features)
+
+    if cache_file is not None:
+        _store_features(features, cache_file)
+
+    return features
+
+
+def _store_features(features: np.ndarray, cache_file: Path) -> None:
+    logger.info(f"Storing features in {cache_file}")
+    # write to a temporary file first, so concurrent readers never see a partial file
+    temporary_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(temporary_file, "wb") as file:
+            np.save(file, features)
+        os.replace(temporary_file, cache_file)
+    except OSError as error:
+        logger.warning(f"Features are not cached, storing them failed: {error}")
+        temporary_file.unlink(missing_ok=True)
+
+
+def transform_features(
+    features: np.ndarray,
+    preprocessing,
+    fit: bool = False,
+    feature_step: str = "featurization",
+) -> np.ndarray:
+    """
+    Applies the preprocessing steps after `feature_step` to features returned by `cached_features`.
+    Together they are equivalent to `preprocessing.transform(x)`, or to `preprocessing.fit_transform(x)`
+    if `fit` is True.
+
+    Params:
+        features (numpy.array): Features indexed by window x feature
+        preprocessing (sklearn.pipeline.Pipeline): Preprocessing pipeline, e.g. `pipe["preprocessing"]`
+        fit (bool): If True, the steps are fitted to the features before they are applied
+        feature_step (str): Name of the step whose output the features are
+    Returns:
+        numpy.array: Preprocessed features indexed by window x feature
+    """
+    _, steps = _split_steps(preprocessing, feature_step)
+    for _, step in steps:
+        features = step.fit_transform(features) if fit else step.transform(features)
+    return features
@@ -48,6 +48,15 @@ def main(
                 "inertia": score_data["inertia"],
                 "build_id": build_reference,
             }
+            # scores written before the silhouette could be sampled have no mode
+            for key in [
+                "silhouette_mode",
+                "silhouette_sample_size",
+                "silhouette_ci_low",
+                "silhouette_ci_high",
+            ]:
+                if key in score_data:
+                    tags[key] = score_data[key]
 
         run_file = open(model_metadata)
         model_metadata = json.load(run_file)
@@ -9,9 +9,9 @@ import joblib
 import mlflow
 import numpy as np
 import pandas
-from sklearn.metrics import silhouette_score
-from state_identifier.src.score.scoring_utils import dunn_index
+from state_identifier.src.score.scoring_utils import dunn_index, silhouette
 from sklearn.pipeline import Pipeline
+from state_identifier.src.prep.feature_cache import cached_features, transform_features
 from state_identifier.src.si.preprocessing import (
     SumColumnsTransformer,
 )
@@ -22,7 +22,15 @@ from common.src.base_logger import get_logger
 logger = get_logger(__name__)
 
 
-def main(raw_data: str, prep_data: str, model: str, score_report: str):
+def main(
+    raw_data: str,
+    prep_data: str,
+    model: str,
+    score_report: str,
+    silhouette_mode: str = "sampled",
+    silhouette_sample_size: int = 10000,
+    feature_cache: str = None,
+):
 
     run = Run.get_context()
     mlflow.set_tracking_uri(run.experiment.workspace.get_mlflow_tracking_uri())
@@ -35,6 +43,9 @@ def main(raw_data: str, prep_data: str, model: str, score_report: str):
             f"prep_data path: {prep_data}",
             f"model path: {model}",
             f"Scoring output path: {score_report}",
+            f"silhouette mode: {silhouette_mode}",
+            f"silhouette sample size: {silhouette_sample_size}",
+            f"feature_cache: {feature_cache}",
         ]
 
         for line in lines:
@@ -59,15 +70,33 @@ def main(raw_data: str, prep_data: str, model: str, score_report: str):
         data_preparation_pipeline = model_instance.named_steps["preprocessing"]
 
         raw_data_numpy_filtered = raw_data_frame[input_columns].values
-        data_preparation_pipeline.fit(raw_data_numpy_filtered)
 
-        transformed_data = data_preparation_pipeline.transform(raw_data_numpy_filtered)
+        # the features of the same raw data are reused if the training step cached them in `feature_cache`,
+        # on a miss they are computed and only cached if the folder is writable
+        features = cached_features(
+            raw_data_numpy_filtered, data_preparation_pipeline, feature_cache
+        )
+        transformed_data = transform_features(
+            features, data_preparation_pipeline, fit=True
+        )
         transformed_data_frame = pandas.DataFrame(transformed_data)
 
-        write_results(model_instance, transformed_data_frame, score_report)
+        write_results(
+            model_instance,
+            transformed_data_frame,
+            score_report,
+            silhouette_mode=silhouette_mode,
+            silhouette_sample_size=silhouette_sample_size,
+        )
 
 
-def write_results(model: Pipeline, prep_data: np.array, score_report: str) -> None:
+def write_results(
+    model: Pipeline,
+    prep_data: np.array,
+    score_report: str,
+    silhouette_mode: str = "sampled",
+    silhouette_sample_size: int = 10000,
+) -> None:
     """
     Log clustering metrics for a trained model and write them to a file.
 
@@ -79,6 +108,11 @@ def write_results(model: Pipeline, prep_data: np.array, score_report: str) -> No
     score_report: str
         The directory where the score report should be written. The scores will be written
         to a file named 'score.txt' in this directory.
+    silhouette_mode: str
+        How the silhouette is computed, one of `exact`, `sampled` or `simplified`.
+        See `scoring_utils.silhouette`.
+    silhouette_sample_size: int
+        Number of observations per sample if `silhouette_mode` is `sampled`.
 
     Returns:
     None
@@ -93,11 +127,21 @@ def write_results(model: Pipeline, prep_data: np.array, score_report: str) -> No
     labels = kmeans_clustering.labels_
     logger.info(f"labels: {labels}")
 
-    silhouette_score_value = silhouette_score(prep_data, labels)
+    silhouette_result = silhouette(
+        prep_data, labels, mode=silhouette_mode, sample_size=silhouette_sample_size
+    )
+    silhouette_score_value = silhouette_result["silhouette"]
     mlflow.log_metric("silhouette", silhouette_score_value)
-    logger.info(f"silhouette: {silhouette_score_value}")
+    mlflow.log_param("silhouette_mode", silhouette_result["silhouette_mode"])
+    mlflow.log_param(
+        "silhouette_sample_size", silhouette_result["silhouette_sample_size"]
+    )
+    for bound in ["silhouette_ci_low", "silhouette_ci_high"]:
+        if bound in silhouette_result:
+            mlflow.log_metric(bound, silhouette_result[bound])
+    logger.info(f"silhouette: {silhouette_result}")
 
-    dunn_index_value = dunn_index(prep_data, labels)
+    dunn_index_value = dunn_index(prep_data, labels, use_kdtree=True)
     mlflow.log_metric("dunn_index", dunn_index_value)
     logger.info(f"dunn_index: {dunn_index_value}")
 
@@ -107,7 +151,7 @@ def write_results(model: Pipeline, prep_data: np.array, score_report: str) -> No
 
     # Print score report to a text file
     model_score = {
-        "silhouette": silhouette_score_value,
+        **silhouette_result,
         "dunn_index": dunn_index_value,
         "inertia": inertia,
     }
@@ -128,6 +172,25 @@ if __name__ == "__main__":
         default="../data/raw_data",
         help="Path to raw data",
     )
+    parser.add_argument(
+        "--silhouette_mode",
+        type=str,
+        default="sampled",
+        choices=["exact", "sampled", "simplified"],
+        help="How the silhouette is computed",
+    )
+    parser.add_argument(
+        "--silhouette_sample_size",
+        type=int,
+        default=10000,
+        help="Number of observations per sample if silhouette_mode is sampled",
+    )
+    parser.add_argument(
+        "--feature_cache",
+        type=str,
+        default=None,
+        help="Directory of the features cached by the training step, no caching without it",
+    )
 
     args = parser.parse_args()
 
@@ -136,4 +199,7 @@ if __name__ == "__main__":
         prep_data=args.prep_data,
         model=args.model,
         score_report=args.score_report,
+        silhouette_mode=args.silhouette_mode,
+        silhouette_sample_size=args.silhouette_sample_size,
+        feature_cache=args.feature_cache,
     )
@@ -3,10 +3,16 @@
 # SPDX-License-Identifier: MIT
 
 import numpy as np
+from scipy.spatial import cKDTree
 from sklearn.metrics.pairwise import euclidean_distances
 
 
-def dunn_index(np_array: np.array, labels: np.array) -> float:  # noqa: N803
+def dunn_index(
+    np_array: np.array,
+    labels: np.array,
+    chunk_size: int = 1024,
+    use_kdtree: bool = False,
+) -> float:  # noqa: N803
     """
     Compute the Dunn index for a dataset with given labels.
 
@@ -14,33 +20,363 @@ def dunn_index(np_array: np.array, labels: np.array) -> float:  # noqa: N803
     as the ratio between the smallest distance between observations not in the same
     cluster to the largest intra-cluster distance.
 
+    The distance matrix is never materialized as a whole. It is computed in tiles of
+    `chunk_size` x `chunk_size` observations, while the largest distance within every cluster and the smallest
+    distance between every pair of clusters are kept, so the memory usage is O(chunk_size^2), independent of n.
+
     Arguments:
     np_array: np.array
         The test data to be evaluated.
     labels: np.array
         The labels from the validation results.
+    chunk_size: int
+        Number of observations per side of a tile of the distance matrix which is computed at once.
+    use_kdtree: bool
+        If True, the smallest distances between clusters are found with nearest neighbour queries
+        on a KD-tree of every cluster, and the largest distance within a cluster is searched
+        with a farthest-point search, comparing only the observations far enough from the cluster centre.
 
     Returns:
     float
         The Dunn index for the given data and labels.
     """
-    distances = euclidean_distances(np_array)
-    unique_labels = np.unique(labels)
-
-    inter_cluster_distances = []
-    intra_cluster_distances = []
+    data = np.asarray(np_array, dtype=float)
+    labels = np.asarray(labels)
 
-    for label in unique_labels:
-        intra_cluster_distance = distances[labels == label][:, labels == label].max()
-        intra_cluster_distances.append(intra_cluster_distance)
+    # sort the observations by label, so every cluster is a contiguous range of rows
+    order = np.argsort(labels, kind="stable")
+    data = data[order]
+    unique_labels, cluster_starts = np.unique(labels[order], return_index=True)
+    cluster_bounds = np.append(cluster_starts, len(data))
+    clusters = [
+        (cluster_bounds[i], cluster_bounds[i + 1]) for i in range(len(unique_labels))
+    ]
 
-        for other_label in unique_labels:
-            if label != other_label:
-                inter_cluster_distance = distances[labels == label][
-                    :, labels == other_label
-                ].min()
-                inter_cluster_distances.append(inter_cluster_distance)
+    if use_kdtree:
+        intra_cluster_distances = [
+            _diameter(data[start:end], chunk_size) for start, end in clusters
+        ]
+        inter_cluster_distances = _min_distances_kdtree(data, clusters)
+    else:
+        intra_cluster_distances, inter_cluster_distances = _cluster_distances(
+            data, clusters, chunk_size
+        )
 
     dunn_index_value = min(inter_cluster_distances) / max(intra_cluster_distances)
 
     return dunn_index_value
+
+
+def _tiles(start: int, end: int, chunk_size: int):
+    """
+    Yields the (start, end) bounds of consecutive ranges of at most `chunk_size` rows between `start` and `end`.
+    """
+    for tile_start in range(start, end, chunk_size):
+        yield tile_start, min(tile_start + chunk_size, end)
+
+
+def _squared_norms(data: np.array) -> np.array:
+    return np.einsum("ij,ij->i", data, data)
+
+
+def _tile_distances(
+    data: np.array,
+    other: np.array,
+    squared_norms: np.array,
+    other_squared_norms: np.array,
+    rows: tuple,
+    columns: tuple,
+) -> np.array:
+    """
+    Returns the tile `rows` x `columns` of the distance matrix of `data` and `other`, calculated as
+    `euclidean_distances` does, but with the squared norms computed once for all tiles and without
+    its input validation, which would take longer than a small tile.
+    """
+    distances = -2.0 * (data[rows[0] : rows[1]] @ other[columns[0] : columns[1]].T)
+    distances += squared_norms[rows[0] : rows[1]].reshape((-1, 1))
+    distances += other_squared_norms[columns[0] : columns[1]].reshape((1, -1))
+    np.maximum(distances, 0.0, out=distances)
+    return np.sqrt(distances, out=distances)
+
+
+def _cluster_distances(data: np.array, clusters: list, chunk_size: int):
+    """
+    Streams the distance matrix of `data` in tiles of `chunk_size` x `chunk_size` observations and returns
+    the largest distance within every cluster and the smallest distances between every pair of different clusters.
+    """
+    n_clusters = len(clusters)
+    max_distances = np.zeros(n_clusters)
+    min_distances = np.full((n_clusters, n_clusters), np.inf)
+    squared_norms = _squared_norms(data)
+
+    for label_index, (start, end) in enumerate(clusters):
+        for rows in _tiles(start, end, chunk_size):
+            for other_index, (other_start, other_end) in enumerate(clusters):
+                for columns in _tiles(other_start, other_end, chunk_size):
+                    distances = _tile_distances(
+                        data, data, squared_norms, squared_norms, rows, columns
+                    )
+                    if other_index == label_index:
+                        max_distances[label_index] = max(
+                            max_distances[label_index], distances.max()
+                        )
+                    else:
+                        min_distances[label_index, other_index] = min(
+                            min_distances[label_index, other_index], distances.min()
+                        )
+
+    return max_distances, min_distances[~np.eye(n_clusters, dtype=bool)]
+
+
+def _max_distance(data: np.array, other: np.array, chunk_size: int) -> float:
+    """
+    Returns the largest distance between the rows of `data` and `other`,
+    computed in tiles of `chunk_size` x `chunk_size` rows.
+    """
+    squared_norms = _squared_norms(data)
+    other_squared_norms = _squared_norms(other)
+    return max(
+        (
+            _tile_distances(
+                data, other, squared_norms, other_squared_norms, rows, columns
+            ).max()
+            for rows in _tiles(0, len(data), chunk_size)
+            for columns in _tiles(0, len(other), chunk_size)
+        ),
+        default=0.0,
+    )
+
+
+def _diameter(points: np.array, chunk_size: int) -> float:
+    """
+    Returns the largest distance between the rows of `points`.
+
+    A farthest-point search gives a lower bound of the diameter. As the distance of two points is
+    at most the sum of their distances to the centre, only the points whose distance to the centre
+    plus the largest distance to the centre exceeds that bound can be farther apart, and only their
+    distances are computed.
+    """
+    if len(points) < 2:
+        return 0.0
+    radii = np.linalg.norm(points - points.mean(axis=0), axis=1)
+    distances = np.linalg.norm(points - points[radii.argmax()], axis=1)
+    farthest = distances.argmax()
+    lower_bound = max(
+        distances[farthest],
+        np.linalg.norm(points - points[farthest], axis=1).max(),
+    )
+    candidates = points[radii + radii.max() >= lower_bound]
+    return max(lower_bound, _max_distance(candidates, candidates, chunk_size))
+
+
+def _min_distances_kdtree(data: np.array, clusters: list) -> list:
+    """
+    Returns the smallest distance between every pair of different clusters using nearest neighbour queries.
+    """
+    trees = [cKDTree(data[start:end]) for start, end in clusters]
+    min_distances = []
+    for label_index, (start, end) in enumerate(clusters):
+        for other_index, tree in enumerate(trees):
+            if other_index > label_index:
+                distances, _ = tree.query(data[start:end], k=1)
+                min_distances.append(distances.min())
+    return min_distances
+
+
+SILHOUETTE_MODES = ("exact", "sampled", "simplified")
+
+
+def silhouette(
+    np_array: np.array,
+    labels: np.array,
+    mode: str = "sampled",
+    sample_size: int = 10000,
+    n_seeds: int = 5,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    chunk_size: int = 1024,
+    random_state: int = 0,
+) -> dict:
+    """
+    Compute the mean silhouette coefficient for a dataset with given labels.
+
+    The computation never materializes the full distance matrix. Depending on `mode`:
+    - `exact` computes the silhouette of every observation, streaming the distance matrix
+      in tiles of `chunk_size` x `chunk_size` observations.
+    - `sampled` draws a sample of `sample_size` observations, stratified by cluster, for each of
+      `n_seeds` seeds, and computes the exact silhouette within every sample. The result is the mean over all
+      samples, with a bootstrap confidence interval. If the dataset is not larger than `sample_size`,
+      the exact silhouette is computed instead.
+    - `simplified` uses the distances to the cluster centroids instead of the mean distances to
+      the observations of the clusters, which takes O(n * k) time.
+
+    Arguments:
+    np_array: np.array
+        The test data to be evaluated.
+    labels: np.array
+        The labels from the validation results.
+    mode: str
+        One of `exact`, `sampled` or `simplified`.
+    sample_size: int
+        Number of observations per sample in `sampled` mode.
+    n_seeds: int
+        Number of samples in `sampled` mode.
+    n_bootstrap: int
+        Number of bootstrap resamples for the confidence interval in `sampled` mode.
+    confidence: float
+        Confidence level of the interval in `sampled` mode.
+    chunk_size: int
+        Number of observations per side of a tile of the distance matrix which is computed at once.
+    random_state: int
+        Seed of the first sample; the following samples use the subsequent seeds.
+
+    Returns:
+    dict
+        The silhouette value as `silhouette`, the mode and the number of observations used per sample
+        as `silhouette_mode` and `silhouette_sample_size`, and in `sampled` mode the bounds of the
+        confidence interval as `silhouette_ci_low` and `silhouette_ci_high`.
+    """
+    if mode not in SILHOUETTE_MODES:
+        raise ValueError(f"mode must be one of {SILHOUETTE_MODES}")
+
+    data = np.asarray(np_array, dtype=float)
+    _, codes = np.unique(np.asarray(labels), return_inverse=True)
+    codes = codes.reshape(-1)
+
+    if mode == "simplified":
+        values = _simplified_silhouette_samples(data, codes, chunk_size)
+        return {
+            "silhouette": float(values.mean()),
+            "silhouette_mode": mode,
+            "silhouette_sample_size": len(data),
+        }
+
+    if mode == "exact" or len(data) <= sample_size:
+        values = _silhouette_samples(data, codes, chunk_size)
+        return {
+            "silhouette": float(values.mean()),
+            "silhouette_mode": "exact",
+            "silhouette_sample_size": len(data),
+        }
+
+    sample_values = []
+    for seed in range(random_state, random_state + n_seeds):
+        sample = _stratified_sample(codes, sample_size, np.random.default_rng(seed))
+        sample_values.append(
+            _silhouette_samples(data[sample], codes[sample], chunk_size)
+        )
+    pooled_values = np.concatenate(sample_values)
+
+    rng = np.random.default_rng(random_state)
+    bootstrap_means = np.array(
+        [
+            rng.choice(pooled_values, size=len(pooled_values)).mean()
+            for _ in range(n_bootstrap)
+        ]
+    )
+    alpha = (1 - confidence) / 2
+    ci_low, ci_high = np.quantile(bootstrap_means, [alpha, 1 - alpha])
+
+    return {
+        "silhouette": float(np.mean([values.mean() for values in sample_values])),
+        "silhouette_mode": mode,
+        "silhouette_sample_size": len(sample_values[0]),
+        "silhouette_ci_low": float(ci_low),
+        "silhouette_ci_high": float(ci_high),
+    }
+
+
+def _silhouette_samples(data: np.array, codes: np.array, chunk_size: int) -> np.array:
+    """
+    Returns the silhouette of every observation, given the cluster index of every observation in `codes`.
+    The distance matrix is computed in tiles of `chunk_size` x `chunk_size` observations, so the memory usage
+    does not grow with the number of observations, and the distances to the observations of every cluster
+    are summed up with a product with the one-hot encoded cluster indices.
+    """
+    n_clusters = codes.max() + 1 if len(codes) > 0 else 0
+    cluster_sizes = np.bincount(codes, minlength=n_clusters)
+    one_hot = np.zeros((len(codes), n_clusters))
+    one_hot[np.arange(len(codes)), codes] = 1.0
+
+    values = np.zeros(len(data))
+    if n_clusters < 2:
+        return values
+    squared_norms = _squared_norms(data)
+    for start, end in _tiles(0, len(data), chunk_size):
+        block_codes = codes[start:end]
+        rows = np.arange(len(block_codes))
+        distance_sums = np.zeros((len(block_codes), n_clusters))
+        for columns in _tiles(0, len(data), chunk_size):
+            distance_sums += _tile_distances(
+                data, data, squared_norms, squared_norms, (start, end), columns
+            ).dot(one_hot[columns[0] : columns[1]])
+        own_sizes = cluster_sizes[block_codes]
+        intra = distance_sums[rows, block_codes] / np.maximum(own_sizes - 1, 1)
+        mean_distances = distance_sums / cluster_sizes
+        mean_distances[rows, block_codes] = np.inf
+        inter = mean_distances.min(axis=1)
+        values[start:end] = _silhouette_values(intra, inter)
+        # the silhouette of an observation in a single-element cluster is 0
+        values[start:end][own_sizes == 1] = 0.0
+
+    return values
+
+
+def _simplified_silhouette_samples(
+    data: np.array, codes: np.array, chunk_size: int
+) -> np.array:
+    """
+    Returns the simplified silhouette of every observation, using the distances to the cluster centroids.
+    """
+    n_clusters = codes.max() + 1 if len(codes) > 0 else 0
+    if n_clusters < 2:
+        return np.zeros(len(data))
+    centroids = np.vstack(
+        [data[codes == code].mean(axis=0) for code in range(n_clusters)]
+    )
+
+    values = np.empty(len(data))
+    for start in range(0, len(data), chunk_size):
+        block_codes = codes[start : start + chunk_size]
+        rows = np.arange(len(block_codes))
+        distances = euclidean_distances(data[start : start + chunk_size], centroids)
+        intra = distances[rows, block_codes].copy()
+        distances[rows, block_codes] = np.inf
+        values[start : start + chunk_size] = _silhouette_values(
+            intra, distances.min(axis=1)
+        )
+
+    return values
+
+
+def _silhouette_values(intra: np.array, inter: np.array) -> np.array:
+    """
+    Returns (b - a) / max(a, b) for the mean intra-cluster distances a and nearest-cluster distances b.
+    """
+    denominator = np.maximum(intra, inter)
+    return np.divide(
+        inter - intra,
+        denominator,
+        out=np.zeros_like(denominator),
+        where=denominator > 0,
+    )
+
+
+def _stratified_sample(
+    codes: np.array, sample_size: int, rng: np.random.Generator
+) -> np.array:
+    """
+    Returns the indices of a sample of about `sample_size` observations, where every cluster is represented
+    proportionally to its size, but with at least 2 observations if possible.
+    """
+    cluster_sizes = np.bincount(codes)
+    allocations = np.round(sample_size * cluster_sizes / len(codes)).astype(int)
+    allocations = np.minimum(np.maximum(allocations, 2), cluster_sizes)
+    return np.sort(
+        np.concatenate(
+            [
+                rng.choice(np.flatnonzero(codes == code), size=size, replace=False)
+                for code, size in enumerate(allocations)
+            ]
+        )
+    )
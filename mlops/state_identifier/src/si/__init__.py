@@ -13,9 +13,31 @@ def get_combinations(item_list, min_items=1):
     )
 
 
-def windowing(x, window_size, step_size):
+def windowing(x, window_size, step_size, copy=True):
+    """
+    Creates windows of `window_size` consecutive rows of `x`, each window offset by `step_size` rows.
+    Window `i` is the flattened block of rows `i * step_size` to `i * step_size + window_size - 1`.
+
+    Args:
+        x (numpy.array): Data with at least 2 dimensions, indexed by timestamp x variable
+        window_size: Number of rows in a window.
+        step_size: Number of rows by which the subsequent window is offset.
+        copy (bool): If False, a read-only strided view of `x` (or of a contiguous copy of it, if `x` is not
+            C-contiguous) is returned, so rows shared by overlapping windows are not duplicated in memory.
+
+    Returns:
+        numpy.array: 2D array indexed by window x (timestamp * variable)
+    """
     # https://stackoverflow.com/a/15722507
+    x = np.ascontiguousarray(x)
     n = x.shape[0]  # needs at least 2 dimensions
-    return np.hstack(
-        x[i : 1 + n + i - window_size : step_size] for i in range(0, window_size)
+    row_size = int(np.prod(x.shape[1:]))
+    n_windows = max(0, (n - window_size) // step_size + 1)
+    flat = x.reshape(-1)
+    windows = np.lib.stride_tricks.as_strided(
+        flat,
+        shape=(n_windows, window_size * row_size),
+        strides=(step_size * row_size * flat.itemsize, flat.itemsize),
+        writeable=False,
     )
+    return windows.copy() if copy else windows
@@ -0,0 +1,136 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Fused scaling and nearest-centroid prediction for the AI Inference Server.
+
+The pipeline of `train.py` ends with a `MinMaxScaler` and a `KMeans` model. Predicting a single window calls both
+through scikit-learn, with input validation and intermediate arrays for one row of features.
+As the scaling `z = x * scale + offset` is affine, the squared distance of the scaled features to a center `c` is
+
+    ||z - c||^2 = ||z||^2 + ||c||^2 - 2 * offset . c - x . (2 * scale * c)
+
+`||z||^2` is the same for every center, so the nearest center is found with one matrix product of the
+unscaled features with the folded centers `2 * scale * c` and a bias per center, followed by an argmin.
+The squared distance to the nearest center, i.e. the contribution of the window to the inertia,
+is obtained by adding `||z||^2` back.
+
+The labels are the same as the ones of the pipeline, except for windows at the same distance to two centers
+within rounding errors.
+"""
+
+import numpy
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from state_identifier.src.si.numpy_runtime import AffineNearestCentroid
+from state_identifier.src.si.pipeline import _transform_steps
+
+
+def _affine_parameters(step):
+    """
+    Returns `scale` and `offset` such that `step.transform(x) == x * scale + offset`,
+    or None if the step is not an affine scaling.
+    """
+    if isinstance(step, MinMaxScaler) and not step.clip:
+        return step.scale_, step.min_
+    if isinstance(step, StandardScaler):
+        scale = 1.0 / step.scale_ if step.with_std else numpy.ones(step.n_features_in_)
+        mean = step.mean_ if step.with_mean else numpy.zeros(step.n_features_in_)
+        return scale, -mean * scale
+    return None
+
+
+class FusedCentroidPredictor(AffineNearestCentroid):
+    """
+    Predicts the nearest cluster center of features with the scaling folded into the centers.
+
+    Args:
+        scale (numpy.array): Scale of the features per feature
+        offset (numpy.array): Offset of the scaled features per feature
+        centers (numpy.array): Cluster centers in the scaled feature space, indexed by cluster x feature
+        feature_steps (list): (name, transformer) pairs of the preprocessing steps up to and including
+            the featurization
+        dtype: Floating point type of the calculations, see `AffineNearestCentroid`
+    """
+
+    def __init__(
+        self,
+        scale: numpy.array,
+        offset: numpy.array,
+        centers: numpy.array,
+        feature_steps: list = None,
+        dtype=float,
+    ):
+        super().__init__(scale, offset, centers, dtype)
+        self.feature_steps = list(feature_steps or [])
+
+    @classmethod
+    def from_pipeline(cls, pipe, feature_step: str = "featurization"):
+        """
+        Derives the predictor from a trained State Identifier pipeline.
+
+        The steps of the preprocessing after `feature_step` must be affine scalings (`MinMaxScaler` without
+        clipping or `StandardScaler`), and the clustering a `KMeans` or `MiniBatchKMeans` model.
+
+        Args:
+            pipe (sklearn.pipeline.Pipeline): Trained pipeline with the steps `preprocessing` and `clustering`
+            feature_step (str): Name of the step whose output is the input of the predictor
+
+        Returns:
+            FusedCentroidPredictor: The predictor, or None if the pipeline has a different structure
+        """
+        clustering = pipe.steps[-1][1]
+        if not isinstance(clustering, (KMeans, MiniBatchKMeans)):
+            return None
+
+        steps = list(_transform_steps(pipe.steps[:-1]))
+        names = [name for name, _ in steps]
+        if feature_step not in names:
+            return None
+        split = names.index(feature_step) + 1
+
+        n_features = clustering.cluster_centers_.shape[1]
+        scale, offset = numpy.ones(n_features), numpy.zeros(n_features)
+        for _, step in steps[split:]:
+            parameters = _affine_parameters(step)
+            if parameters is None:
+                return None
+            # applying x * s + o after x * scale + offset
+            scale, offset = (
+                scale * parameters[0],
+                offset * parameters[0] + parameters[1],
+            )
+
+        # a pipeline trained in float32 is predicted in float32, with the type of its centers
+        return cls(
+            scale,
+            offset,
+            clustering.cluster_centers_,
+            steps[:split],
+            clustering.cluster_centers_.dtype,
+        )
+
+    def as_pipeline(self) -> Pipeline:
+        """
+        Returns a pipeline of the preprocessing steps up to the featurization with this predictor as the final step,
+        which can be passed to `predict_with_features` and `predict_sliding_windows`.
+        The input of the final step returned by these functions are the unscaled features.
+        """
+        return Pipeline(self.feature_steps + [("clustering", self)])
+
+    def predict_windows(self, x: numpy.array):
+        """
+        Applies the preprocessing steps up to the featurization to the input rows of one or more windows,
+        as `WindowTransformer` cuts them, and predicts the nearest center of every window.
+
+        Args:
+            x (numpy.array): Input data indexed by timestamp x variable
+
+        Returns:
+            The outputs of `predict_with_distances`
+        """
+        for _, step in self.feature_steps:
+            x = step.transform(x)
+        return self.predict_with_distances(x)
@@ -0,0 +1,253 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Incremental feature calculation for overlapping windows on the AI Inference Server.
+
+When `step_size` is smaller than `window_size`, most of the rows in a window have already been seen
+in the previous window. Instead of recomputing every feature from scratch, `SlidingWindowFeatures` keeps
+running statistics which are updated when a row enters or leaves the window:
+
+- running sums and sums of squares for `sum`, `mean`, `variance` and `standard_deviation`,
+- running sums of the absolute, positive and negative changes between consecutive rows,
+- monotonic deques for `maximum` and `minimum`.
+
+Features without an incremental counterpart (e.g. `count_above_mean`) are recomputed over the whole window.
+The running sums are recomputed exactly every `window_size` rows, so rounding errors cannot accumulate,
+but the incremental values may differ from the full recomputation in the last few digits.
+"""
+
+from collections import deque
+
+import numpy
+
+from state_identifier.src.si.pipeline import (
+    FeatureTransformer,
+    FillMissingValues,
+    WindowTransformer,
+    get_feature_kernel,
+    _maximum,
+    _minimum,
+    _mean,
+    _variance,
+    _standard_deviation,
+    _sum_values,
+    _absolute_sum_of_changes,
+    _positive_sum_of_changes,
+    _negative_sum_of_changes,
+)
+from state_identifier.src.si.preprocessing import SumColumnsTransformer
+from state_identifier.src.si.ring_buffer import RingBuffer
+
+
+class SlidingWindowFeatures:
+    """
+    Maintains the features of a sliding window over a series of values.
+
+    Args:
+        window_size (int): Maximum number of values in the window
+        function_list (list): Flat list of feature functions, as in `FeatureTransformer.function_list`
+    """
+
+    def __init__(self, window_size: int, function_list: list):
+        self.window_size = window_size
+        self.function_list = list(function_list)
+        self._incremental = {
+            _maximum: self._window_maximum,
+            _minimum: self._window_minimum,
+            _mean: self._window_mean,
+            _variance: self._window_variance,
+            _standard_deviation: self._window_standard_deviation,
+            _sum_values: self._window_sum,
+            _absolute_sum_of_changes: lambda: self._abs_changes,
+            _positive_sum_of_changes: lambda: self._pos_changes,
+            _negative_sum_of_changes: lambda: self._neg_changes,
+        }
+        self._getters = [
+            self._incremental.get(get_feature_kernel(func)) for func in function_list
+        ]
+        self._values = RingBuffer(window_size, 1)
+        self.clear()
+
+    def clear(self):
+        """
+        Removes all values from the window.
+        """
+        self._values.clear()
+        self._seq = 0  # sequence number of the next value
+        self._max = deque()  # (seq, value) pairs with decreasing values
+        self._min = deque()  # (seq, value) pairs with increasing values
+        self._nan_count = 0
+        self._since_resync = 0
+        self._shift = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._abs_changes = 0.0
+        self._pos_changes = 0.0
+        self._neg_changes = 0.0
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def has_missing_values(self):
+        """
+        True if the window contains NaN values; features of such windows must be recomputed by the pipeline.
+        """
+        return self._nan_count > 0
+
+    def append(self, value: float):
+        """
+        Adds a value to the window. If the window is full, its oldest value is removed first.
+        """
+        if len(self._values) == self.window_size:
+            self.discard(1)
+        if len(self._values) > 0:
+            self._update_changes(value - self._values.view()[-1, 0], 1)
+        if value != value:  # NaN
+            self._nan_count += 1
+        self._values.append(value)
+
+        while self._max and not self._max[-1][1] > value:
+            self._max.pop()
+        self._max.append((self._seq, value))
+        while self._min and not self._min[-1][1] < value:
+            self._min.pop()
+        self._min.append((self._seq, value))
+        self._seq += 1
+
+        shifted = value - self._shift
+        self._sum += shifted
+        self._sum_sq += shifted * shifted
+        self._since_resync += 1
+        if self._since_resync >= self.window_size:
+            self._resync()
+
+    def discard(self, count: int):
+        """
+        Removes the oldest `count` values from the window.
+        """
+        count = min(max(count, 0), len(self._values))
+        if count == len(self._values):
+            self.clear()
+            return
+        window = self._values.view()[:, 0]
+        had_missing_values = self.has_missing_values
+        for i in range(count):
+            value = window[i]
+            self._update_changes(window[i + 1] - value, -1)
+            if value != value:
+                self._nan_count -= 1
+            shifted = value - self._shift
+            self._sum -= shifted
+            self._sum_sq -= shifted * shifted
+        self._values.discard(count)
+
+        first_seq = self._seq - len(self._values)
+        while self._max[0][0] < first_seq:
+            self._max.popleft()
+        while self._min[0][0] < first_seq:
+            self._min.popleft()
+
+        if had_missing_values and not self.has_missing_values:
+            # the running sums are NaN as long as a NaN value was in the window
+            self._resync()
+
+    def features(self):
+        """
+        Returns the features of the current window in the order of `function_list`.
+        """
+        window = self._values.view()[:, 0]
+        return numpy.array(
+            [
+                (
+                    getter()
+                    if getter is not None
+                    else FeatureTransformer._apply(func, window.reshape((1, -1)))[0]
+                )
+                for func, getter in zip(self.function_list, self._getters)
+            ],
+            dtype=float,
+        )
+
+    def _update_changes(self, change, sign):
+        """
+        Adds (`sign=1`) or removes (`sign=-1`) the change between two consecutive values to the running sums.
+        """
+        if change != change:
+            return
+        self._abs_changes += sign * abs(change)
+        if change > 0:
+            self._pos_changes += sign * change
+        else:
+            self._neg_changes += sign * change
+
+    def _resync(self):
+        """
+        Recomputes the running sums from the values in the window to get rid of accumulated rounding errors.
+        """
+        window = self._values.view()[:, 0]
+        self._since_resync = 0
+        if self._nan_count > 0:
+            return
+        self._shift = _mean(window.reshape((1, -1)))[0]
+        shifted = window - self._shift
+        self._sum = shifted.sum()
+        self._sum_sq = (shifted * shifted).sum()
+        grid = window.reshape((1, -1))
+        self._abs_changes = _absolute_sum_of_changes(grid)[0]
+        self._pos_changes = _positive_sum_of_changes(grid)[0]
+        self._neg_changes = _negative_sum_of_changes(grid)[0]
+
+    def _window_maximum(self):
+        return self._max[0][1]
+
+    def _window_minimum(self):
+        return self._min[0][1]
+
+    def _window_sum(self):
+        return self._shift * len(self._values) + self._sum
+
+    def _window_mean(self):
+        return self._shift + self._sum / len(self._values)
+
+    def _window_variance(self):
+        n = len(self._values)
+        mean = self._sum / n
+        return max(self._sum_sq / n - mean * mean, 0.0)
+
+    def _window_standard_deviation(self):
+        return numpy.sqrt(self._window_variance())
+
+
+def incremental_features_for(pipe):
+    """
+    Creates a `SlidingWindowFeatures` for a trained State Identifier pipeline.
+
+    The preprocessing of the pipeline must start with `FillMissingValues`, `SumColumnsTransformer`,
+    `WindowTransformer` and `FeatureTransformer`, as in `train.py`.
+    Filling missing values is a no-operation for windows without NaN values, and windows with NaN values
+    are recomputed by the pipeline, so the incremental features can be fed with the summed input rows.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): Trained pipeline with the steps `preprocessing` and `clustering`
+
+    Returns:
+        tuple: The `SlidingWindowFeatures` and the list of preprocessing steps to apply to its features,
+               or None if the pipeline has a different structure.
+    """
+    steps = [step for _, step in pipe["preprocessing"].steps]
+    expected_types = [
+        FillMissingValues,
+        SumColumnsTransformer,
+        WindowTransformer,
+        FeatureTransformer,
+    ]
+    if len(steps) < len(expected_types) or not all(
+        isinstance(step, expected_type)
+        for step, expected_type in zip(steps, expected_types)
+    ):
+        return None
+
+    window_size = steps[2].window_size
+    return SlidingWindowFeatures(window_size, steps[3].function_list), steps[4:]
@@ -10,6 +10,8 @@ When the module is loaded, it reads the pickle file and gets some information fr
     - window_step
     - input_columns
     - output_name
+If the model was saved with `model_artifact.save_model_artifact`, this information is read from the metadata file
+next to the model, and the NumPy arrays of the pipeline are memory-mapped instead of being read.
 
 The AI Inference Server will call the 'run(..)' method with the values for one datapoint in JSON format.
 The 'run' method collects these data until the window_size is reached.
@@ -21,10 +23,24 @@ This method will produce a prediction which will be forwarded to the Runtime as
 from pathlib import Path
 import json
 import numpy
-import joblib
 import os
+import time
 
 from log_module import LogModule
+from state_identifier.src.si.fused_predictor import FusedCentroidPredictor
+from state_identifier.src.si.incremental import incremental_features_for
+from state_identifier.src.si.pipeline import (
+    pipeline_dtype,
+    predict_sliding_windows,
+    predict_with_features,
+)
+from state_identifier.src.si.model_artifact import (
+    load_model_artifact,
+    load_model_metadata,
+)
+from state_identifier.src.si.ring_buffer import RingBuffer
+
+startup_time = time.perf_counter()
 
 logger = LogModule()
 
@@ -64,8 +80,10 @@ try:
     model_path = models_dir / "clustering-model.joblib"
     logger.info(f"Loading model {model_path}")
 
-    with open(model_path, "rb") as rpl:
-        pipe = joblib.load(rpl)
+    model_metadata = load_model_metadata(model_path)
+    logger.info(f"Model metadata: {model_metadata}")
+
+    pipe = load_model_artifact(model_path)
 
 except Exception as e:
     logger.error(f"Failed to load model: {e}")
@@ -77,14 +95,40 @@ except Exception as e:
 
 logger.info("Model loaded")
 
-window_size = pipe.get_params().get("preprocessing__windowing__window_size")
-step_size = pipe.get_params().get("preprocessing__windowing__window_step")
-
-input_columns = ["ph1", "ph2", "ph3"]
+if model_metadata is not None:
+    window_size = model_metadata["window_size"]
+    step_size = model_metadata["window_step"]
+    input_columns = model_metadata["input_columns"]
+else:
+    # models packaged without metadata
+    window_size = pipe.get_params().get("preprocessing__windowing__window_size")
+    step_size = pipe.get_params().get("preprocessing__windowing__window_step")
+    input_columns = ["ph1", "ph2", "ph3"]
 
 output_name = "prediction"
 
-aggregated_data = numpy.empty((0, len(input_columns)), int)
+# the input rows are kept in the floating point type of the pipeline, e.g. float32, so no step converts them
+dtype = pipeline_dtype(pipe)
+
+# preallocated buffer holding the rows of the current window
+aggregated_data = RingBuffer(window_size, len(input_columns), dtype)
+
+# Incremental feature calculation for overlapping windows, enabled by the 'incremental_features' parameter.
+# It is None if the structure of the pipeline does not allow updating the features incrementally.
+incremental = incremental_features_for(pipe)
+if incremental is not None:
+    window_features, feature_steps = incremental
+else:
+    window_features, feature_steps = None, []
+use_incremental_features = False
+
+# Prediction with the scaling folded into the cluster centers, enabled by the 'fused_predictor' parameter.
+# It is None if the pipeline does not end with an affine scaling and a KMeans model.
+fused_predictor = FusedCentroidPredictor.from_pipeline(pipe)
+fused_pipe = None if fused_predictor is None else fused_predictor.as_pipeline()
+use_fused_predictor = False
+
+logger.info(f"Startup time: {time.perf_counter() - startup_time:.3f} s")
 
 
 def update_parameters(params: dict):
@@ -95,10 +139,23 @@ def update_parameters(params: dict):
     Args:
         params (dict): Names and values of parameters to update given in this format:
         {"parameter_name": parameter_value}
+        Supported parameters are 'step_size', 'incremental_features' and 'fused_predictor'.
+        'incremental_features' enables the incremental calculation of the features for overlapping windows,
+        see `state_identifier.src.si.incremental`. 'fused_predictor' enables the prediction with the scaling
+        folded into the cluster centers, which also outputs the inertia of every window,
+        see `state_identifier.src.si.fused_predictor`.
     """
-    global step_size
+    global step_size, use_incremental_features, use_fused_predictor
 
     step_size = params.get("step_size", step_size)
+    was_incremental = use_incremental_features
+    use_incremental_features = bool(
+        params.get("incremental_features", use_incremental_features)
+    )
+    if use_incremental_features and not was_incremental:
+        # the window features are not updated while the mode is off
+        resync_window_features()
+    use_fused_predictor = bool(params.get("fused_predictor", use_fused_predictor))
 
 
 def process_data(input_dict: dict):
@@ -116,31 +173,99 @@ def process_data(input_dict: dict):
         [int]: The index of the predicted class if the input completes a window and an inference was made.
                None if the input was accumulated but the windows size was not reached.
     """
-    global aggregated_data, logger
     values = [
-        [
-            numpy.nan if input_dict[variable] is None else input_dict[variable]
-            for variable in input_columns
-        ]
+        numpy.nan if input_dict[variable] is None else input_dict[variable]
+        for variable in input_columns
     ]
-    aggregated_data = numpy.append(aggregated_data, values, axis=0)
+    aggregated_data.append(values)
+    incremental_window = use_incremental_features and window_features is not None
+    if incremental_window:
+        window_features.append(values[0] + values[1] + values[2])
 
     if len(aggregated_data) >= window_size:
-        output = {output_name: predict(pipe, aggregated_data)}
-        features = pipe["preprocessing"].transform(aggregated_data)[0]
-        output["model_input_max"] = metric_output(features[0].item())
-        output["model_input_min"] = metric_output(features[1].item())
-        output["model_input_mean"] = metric_output(features[2].item())
-        aggregated_data = aggregated_data[step_size:]
-        return output
+        if incremental_window and not window_features.has_missing_values:
+            prediction, features, inertia = predict_incremental(pipe)
+        else:
+            prediction, features, inertia = predict(pipe, aggregated_data.view())
+        aggregated_data.discard(step_size)
+        if incremental_window:
+            window_features.discard(step_size)
+        return create_output(prediction, features, inertia)
 
     return None
 
 
+def process_batch(input_data):
+    """
+    Processes several data rows at once, e.g. the rows buffered by the connector during an outage.
+    The rows are appended to the collected data in bulk and all windows completed by them are predicted
+    with a single run of the pipeline. The outputs are the same as calling 'process_data(..)' row by row.
+
+    Args:
+        input_data: Either a list of dictionaries like the input of 'process_data(..)',
+            a dictionary with a list of values for each input column like:
+            {"ph1": [10000.0, 10010.0], "ph2": [9879.2, 9870.4], "ph3": [7514.3, None]}
+            or a 2D array indexed by row x input column.
+
+    Returns:
+        [dict]: The outputs for the completed windows, in order. Empty if no window was completed.
+    """
+    if isinstance(input_data, dict):
+        rows = numpy.column_stack(
+            [
+                numpy.asarray(input_data[variable], dtype=dtype)
+                for variable in input_columns
+            ]
+        )
+    elif isinstance(input_data, numpy.ndarray):
+        rows = input_data.astype(dtype).reshape((-1, len(input_columns)))
+    else:
+        rows = numpy.array(
+            [[row[variable] for variable in input_columns] for row in input_data],
+            dtype=dtype,
+        ).reshape((-1, len(input_columns)))
+
+    data = numpy.concatenate([aggregated_data.view(), rows])
+    # once a window is full, the next one starts at most 'window_size' rows later, see 'process_data(..)'
+    window_step = min(max(step_size, 1), window_size)
+    if use_fused_predictor and fused_predictor is not None:
+        # the labels and distances are computed in a single pass, the scaled features are the model inputs
+        predictions, _, features, inertias = predict_sliding_windows(
+            fused_pipe, data, window_step, return_distances=True
+        )
+        features = fused_predictor.scale_features(features)
+    else:
+        predictions, _, features = predict_sliding_windows(pipe, data, window_step)
+        inertias = [None] * len(predictions)
+
+    aggregated_data.clear()
+    aggregated_data.extend(data[len(predictions) * window_step :])
+    if use_incremental_features:
+        resync_window_features()
+
+    return [
+        create_output(prediction, model_input, inertia)
+        for prediction, model_input, inertia in zip(predictions, features, inertias)
+    ]
+
+
+def resync_window_features():
+    """
+    Refills 'window_features' with the rows collected in 'aggregated_data', e.g. when the incremental features
+    are switched on, as the window features are only updated while they are enabled.
+    """
+    if window_features is None:
+        return
+    window_features.clear()
+    for values in aggregated_data.view():
+        window_features.append(values[0] + values[1] + values[2])
+
+
 def predict(pipe: dict, model_input: numpy.array):
     """
     Called by 'process_data(..)'. This method gets the scikit-learn Pipeline and the aggregated data for the window,
-    then predicts the class.
+    then predicts the class. The pipeline is traversed only once, and the preprocessed features
+    which are fed into the model are returned along with the prediction.
 
     Args:
         pipe (sklearn.pipeline.Pipeline): The trained scikit-learn Pipeline
@@ -148,11 +273,56 @@ def predict(pipe: dict, model_input: numpy.array):
 
     Returns:
         [int]: The index of the predicted class
+        numpy.array: The preprocessed features of the window
+        float: The squared distance of the window to its cluster center with the fused predictor, otherwise None
+    """
+    if use_fused_predictor and fused_predictor is not None:
+        prediction, inertia, features = fused_predictor.predict_windows(model_input)
+        return prediction[0], features[0], inertia[0]
+
+    prediction, _, features = predict_with_features(pipe, model_input)
+
+    return prediction[0], features[0], None
+
+
+def predict_incremental(pipe: dict):
+    """
+    Called by 'process_data(..)' when incremental features are enabled. This method takes the features of the
+    current window from 'window_features', applies the remaining preprocessing steps and predicts the class.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): The trained scikit-learn Pipeline
+
+    Returns:
+        [int]: The index of the predicted class
+        numpy.array: The preprocessed features of the window
+        float: The squared distance of the window to its cluster center with the fused predictor, otherwise None
     """
+    features = window_features.features().astype(dtype, copy=False).reshape((1, -1))
+    if use_fused_predictor and fused_predictor is not None:
+        prediction, inertia, features = fused_predictor.predict_with_distances(features)
+        return prediction[0], features[0], inertia[0]
+
+    for step in feature_steps:
+        features = step.transform(features)
 
-    prediction = pipe.predict(model_input)
+    prediction = pipe["clustering"].predict(features)
 
-    return prediction[0]
+    return prediction[0], features[0], None
+
+
+def create_output(prediction: int, features: numpy.array, inertia: float = None):
+    """
+    Creates the output dictionary of the pipeline from the predicted class and the preprocessed features,
+    and the inertia of the window if it is known.
+    """
+    output = {output_name: prediction}
+    if inertia is not None:
+        output["inertia"] = inertia.item()
+    output["model_input_max"] = metric_output(features[0].item())
+    output["model_input_min"] = metric_output(features[1].item())
+    output["model_input_mean"] = metric_output(features[2].item())
+    return output
 
 
 def metric_output(v: int or float):
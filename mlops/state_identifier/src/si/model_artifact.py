@@ -0,0 +1,126 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Model artifact of the State Identifier for fast loading on the AI Inference Server.
+
+The pipeline is stored with `joblib.dump` without compression, so the NumPy arrays in the pipeline are stored
+as raw data which `joblib.load(..., mmap_mode="r")` maps into memory instead of decompressing and copying.
+A small JSON file next to it, e.g. `clustering-model.json` for `clustering-model.joblib`, holds the metadata
+the inference needs before or without unpickling the pipeline:
+
+```json
+{
+    "format_version": 1,
+    "window_size": 300,
+    "window_step": 300,
+    "input_columns": ["ph1", "ph2", "ph3"],
+    "feature_names": ["maximum", "maximum", "minimum", ...],
+    "dtype": "float64",
+    "model_sha256": "..."
+}
+```
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import joblib
+
+FORMAT_VERSION = 1
+
+
+def metadata_path(model_path) -> Path:
+    """
+    Returns the path of the metadata file belonging to the model file `model_path`.
+    """
+    return Path(model_path).with_suffix(".json")
+
+
+def file_sha256(path) -> str:
+    """
+    Returns the hexadecimal SHA-256 digest of a file, read in blocks of 1 MiB.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_metadata(pipe, input_columns: list) -> dict:
+    """
+    Returns the metadata of a State Identifier pipeline, without the model hash.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): Pipeline with the steps `preprocessing` and `clustering`
+        input_columns (list): Names of the input variables of the pipeline
+    """
+    params = pipe.get_params()
+    function_list = params.get("preprocessing__featurization__function_list") or []
+    return {
+        "format_version": FORMAT_VERSION,
+        "window_size": params.get("preprocessing__windowing__window_size"),
+        "window_step": params.get("preprocessing__windowing__window_step"),
+        "input_columns": list(input_columns),
+        # names of the features calculated for every variable of a window
+        "feature_names": [
+            getattr(func, "__name__", repr(func)) for func in function_list
+        ],
+        # floating point type of the features, the inputs are converted to it by the inference
+        "dtype": params.get("preprocessing__featurization__dtype") or "float64",
+    }
+
+
+def save_model_artifact(pipe, model_path, input_columns: list) -> dict:
+    """
+    Saves the pipeline uncompressed to `model_path` and its metadata next to it.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): Pipeline with the steps `preprocessing` and `clustering`
+        model_path (str or Path): Path of the model file, e.g. `models/clustering-model.joblib`
+        input_columns (list): Names of the input variables of the pipeline
+
+    Returns:
+        dict: The metadata written
+    """
+    model_path = Path(model_path)
+    joblib.dump(pipe, model_path)
+
+    metadata = model_metadata(pipe, input_columns)
+    metadata["model_sha256"] = file_sha256(model_path)
+    with open(metadata_path(model_path), "w") as json_file:
+        json.dump(metadata, json_file, indent=4)
+
+    return metadata
+
+
+def load_model_metadata(model_path):
+    """
+    Returns the metadata saved next to the model file `model_path`,
+    or None for models saved without metadata.
+    """
+    path = metadata_path(model_path)
+    if not path.is_file():
+        return None
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def load_model_artifact(model_path, mmap_mode="r", verify: bool = False):
+    """
+    Loads the pipeline from `model_path`. The NumPy arrays of uncompressed model files are memory-mapped
+    with `mmap_mode`, while compressed model files are loaded as usual.
+
+    Args:
+        model_path (str or Path): Path of the model file
+        mmap_mode (str): Memory-mapping mode passed to `joblib.load`, None to read the arrays into memory
+        verify (bool): If True, the file is compared with the hash in the metadata before loading.
+            This reads the whole file and is off by default.
+    """
+    if verify:
+        metadata = load_model_metadata(model_path)
+        if metadata is not None and metadata["model_sha256"] != file_sha256(model_path):
+            raise ValueError(f"{model_path} does not match the hash in its metadata")
+    return joblib.load(model_path, mmap_mode=mmap_mode)
@@ -0,0 +1,179 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Compiles a trained State Identifier pipeline into the NumPy-only model of `numpy_runtime`.
+
+The pipeline must have the structure of `train.py`:
+`FillMissingValues → SumColumnsTransformer → WindowTransformer → FeatureTransformer` in the preprocessing,
+followed by affine scalings and a `KMeans` model, see `fused_predictor.FusedCentroidPredictor`.
+Every feature function must have a vectorized kernel, see `pipeline.FEATURE_KERNELS`.
+"""
+
+import json
+
+import numpy
+
+from state_identifier.src.si.fused_predictor import FusedCentroidPredictor
+from state_identifier.src.si.numpy_runtime import FORMAT_VERSION, KERNELS, NumpyModel
+from state_identifier.src.si.pipeline import (
+    FeatureTransformer,
+    FillMissingValues,
+    WindowTransformer,
+    get_feature_kernel,
+    predict_sliding_windows,
+)
+from state_identifier.src.si.preprocessing import SumColumnsTransformer
+
+KERNEL_NAMES = {kernel: name for name, kernel in KERNELS.items()}
+
+
+def _kernel_name(func) -> str:
+    name = KERNEL_NAMES.get(get_feature_kernel(func))
+    if name is None:
+        raise ValueError(f"The feature function {func} has no NumPy kernel")
+    return name
+
+
+def compile_numpy_model(pipe, input_columns: list) -> NumpyModel:
+    """
+    Compiles a trained pipeline into a `NumpyModel`.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): Trained pipeline with the steps `preprocessing` and `clustering`
+        input_columns (list): Names of the input variables of the pipeline
+
+    Returns:
+        NumpyModel: The compiled model
+
+    Raises:
+        ValueError: If the pipeline cannot be compiled
+    """
+    steps = [step for _, step in pipe["preprocessing"].steps]
+    expected_types = [
+        FillMissingValues,
+        SumColumnsTransformer,
+        WindowTransformer,
+        FeatureTransformer,
+    ]
+    if len(steps) < len(expected_types) or not all(
+        isinstance(step, expected_type)
+        for step, expected_type in zip(steps, expected_types)
+    ):
+        raise ValueError(
+            f"The preprocessing must start with {[t.__name__ for t in expected_types]}"
+        )
+    fill, _, windowing, featurization = steps[: len(expected_types)]
+
+    predictor = FusedCentroidPredictor.from_pipeline(pipe)
+    if predictor is None:
+        raise ValueError(
+            "The preprocessing must end with affine scalings and the clustering must be a KMeans model"
+        )
+
+    if featurization._unique_funcs is None:
+        featurization._compile_funcs()
+    spec = {
+        "format_version": FORMAT_VERSION,
+        "input_columns": list(input_columns),
+        "fill_value": fill.value,
+        # the columns added up by SumColumnsTransformer
+        "sum_columns": [0, 1, 2],
+        "window_size": int(windowing.window_size),
+        "window_step": int(windowing.window_step),
+        "kernels": [_kernel_name(func) for func in featurization._unique_funcs],
+        "feature_columns": featurization._func_columns.tolist(),
+        "dtype": predictor.scale.dtype.name,
+    }
+    return NumpyModel(spec, predictor.scale, predictor.offset, predictor.centers)
+
+
+def save_numpy_model(model: NumpyModel, model_path):
+    """
+    Saves a compiled model as an uncompressed `.npz` file which `NumpyModel.load` reads without pickle.
+    """
+    with open(model_path, "wb") as file:
+        numpy.savez(
+            file,
+            spec=numpy.array(json.dumps(model.spec)),
+            scale=model.scale,
+            offset=model.offset,
+            centers=model.centers,
+        )
+
+
+def export_numpy_model(pipe, model_path, input_columns: list) -> NumpyModel:
+    """
+    Compiles a trained pipeline and saves it to `model_path`, see `compile_numpy_model`.
+    """
+    model = compile_numpy_model(pipe, input_columns)
+    save_numpy_model(model, model_path)
+    return model
+
+
+def parity_data(
+    model: NumpyModel, rows: int = 30000, random_state: int = 0
+) -> numpy.array:
+    """
+    Generates input rows for `verify_numpy_model` from the constants of a compiled model.
+
+    The sum of the inputs switches between random levels in the range of the values the scaling was fitted to,
+    as far as it can be told from the `maximum`, `minimum` and `mean` features, with some noise.
+    Missing values are added where the pipeline can fill them within every window of `window_step`.
+    """
+    rng = numpy.random.default_rng(random_state)
+    low, high = 0.0, 1.0
+    level_columns = [
+        column
+        for column, kernel in enumerate(model.spec["feature_columns"])
+        if model.spec["kernels"][kernel] in ("maximum", "minimum", "mean")
+    ]
+    if level_columns:
+        # the features which are scaled to 0 and 1
+        bounds = numpy.stack(
+            [
+                (0.0 - model.offset[level_columns]) / model.scale[level_columns],
+                (1.0 - model.offset[level_columns]) / model.scale[level_columns],
+            ]
+        )
+        low, high = float(bounds.min()), float(bounds.max())
+
+    durations = rng.integers(model.window_size // 2 + 1, 3 * model.window_size, rows)
+    levels = numpy.repeat(rng.uniform(low, high, len(durations)), durations)[:rows]
+    summed = levels + rng.normal(0.0, (high - low) / 50 + 1e-12, rows)
+    n_inputs = len(model.input_columns)
+    x = numpy.repeat(summed.reshape((-1, 1)) / n_inputs, n_inputs, axis=1)
+
+    # the first row of a window cannot be filled forward, the last one not backward
+    window_step = model.window_step
+    offsets = numpy.arange(rows) % window_step
+    fillable = (offsets != 0) & (offsets != (model.window_size - 1) % window_step)
+    missing = fillable & (rng.random(rows) < 0.001)
+    x[missing, rng.integers(0, n_inputs, missing.sum())] = numpy.nan
+    return x
+
+
+def verify_numpy_model(pipe, model: NumpyModel, x: numpy.array) -> dict:
+    """
+    Compares the predictions of a compiled model with the ones of the pipeline for all windows of `x`.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): The trained pipeline
+        model (NumpyModel): The model compiled from the pipeline
+        x (numpy.array): Input rows indexed by timestamp x input column, which are converted to the type
+            of the model, as the inference does
+
+    Returns:
+        dict: The number of windows, the number of windows with a different label,
+              and the largest difference of the scaled features
+    """
+    x = numpy.asarray(x, dtype=model.dtype)
+    labels, _, scaled = predict_sliding_windows(pipe, x, model.window_step)
+    numpy_labels, numpy_scaled, _ = model.predict_sliding_windows(x, model.window_step)
+    return {
+        "windows": len(labels),
+        "label_mismatches": int(numpy.count_nonzero(labels != numpy_labels)),
+        "max_feature_difference": (
+            float(numpy.abs(scaled - numpy_scaled).max()) if len(labels) else 0.0
+        ),
+    }
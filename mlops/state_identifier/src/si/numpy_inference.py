@@ -0,0 +1,151 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Inference on the AI Inference Server with the NumPy-only model compiled by `numpy_export.export_numpy_model`.
+
+It has the same interface and outputs as `inference.py`, but imports nothing but NumPy, so the edge package
+needs neither scikit-learn, pandas nor tsfresh. The model is read from `models/clustering-model.npz`.
+As the compiled model always predicts with the scaling folded into the cluster centers, the 'inertia' output
+is always set, and the 'incremental_features' and 'fused_predictor' parameters have no effect.
+"""
+
+from pathlib import Path
+import json
+import numpy
+import time
+
+from log_module import LogModule
+from state_identifier.src.si.numpy_runtime import NumpyModel
+from state_identifier.src.si.ring_buffer import RingBuffer
+
+startup_time = time.perf_counter()
+
+logger = LogModule()
+
+models_dir = Path(__file__).parent.absolute() / "../../../models"
+models_dir = models_dir.resolve()
+logger.info(f"models_dir: {models_dir}")
+
+try:
+    model_path = models_dir / "clustering-model.npz"
+    logger.info(f"Loading model {model_path}")
+    model = NumpyModel.load(model_path)
+
+except Exception as e:
+    logger.error(f"Failed to load model: {e}")
+    logger.error("Failed to load model", exc_info=True)
+
+    raise
+
+logger.info(f"Model loaded: {model.spec}")
+
+window_size = model.window_size
+step_size = model.window_step
+input_columns = model.input_columns
+
+output_name = "prediction"
+
+# preallocated buffer holding the rows of the current window
+aggregated_data = RingBuffer(window_size, len(input_columns), model.dtype)
+
+logger.info(f"Startup time: {time.perf_counter() - startup_time:.3f} s")
+
+
+def update_parameters(params: dict):
+    """
+    This method is triggered by the AI Inference Server on the Edge ecosystem.
+    The method updates the value of a given parameter.
+
+    Args:
+        params (dict): Names and values of parameters to update given in this format:
+        {"parameter_name": parameter_value}
+        The supported parameter is 'step_size'.
+    """
+    global step_size
+
+    step_size = params.get("step_size", step_size)
+
+
+def process_data(input_dict: dict):
+    """
+    This method is triggered by AI Inference Server, see `inference.process_data(..)`.
+
+    Args:
+        input_dict (dict): Input data collected in a dictionary like:
+        {"ph1": 10000.0, "ph2": 9879.2, "ph3": 7514.3}  # in this case 'input_columns' = ['ph1','ph2','ph3']
+
+    Returns:
+        [dict]: The output if the input completes a window and an inference was made.
+               None if the input was accumulated but the windows size was not reached.
+    """
+    values = [
+        numpy.nan if input_dict[variable] is None else input_dict[variable]
+        for variable in input_columns
+    ]
+    aggregated_data.append(values)
+
+    if len(aggregated_data) >= window_size:
+        prediction, features, inertia = model.predict_window(aggregated_data.view())
+        aggregated_data.discard(step_size)
+        return create_output(prediction, features, inertia)
+
+    return None
+
+
+def process_batch(input_data):
+    """
+    Processes several data rows at once, see `inference.process_batch(..)`.
+
+    Args:
+        input_data: Either a list of dictionaries like the input of 'process_data(..)',
+            a dictionary with a list of values for each input column, or a 2D array indexed by row x input column.
+
+    Returns:
+        [dict]: The outputs for the completed windows, in order. Empty if no window was completed.
+    """
+    if isinstance(input_data, dict):
+        rows = numpy.column_stack(
+            [
+                numpy.asarray(input_data[variable], dtype=model.dtype)
+                for variable in input_columns
+            ]
+        )
+    elif isinstance(input_data, numpy.ndarray):
+        rows = input_data.astype(model.dtype).reshape((-1, len(input_columns)))
+    else:
+        rows = numpy.array(
+            [[row[variable] for variable in input_columns] for row in input_data],
+            dtype=model.dtype,
+        ).reshape((-1, len(input_columns)))
+
+    data = numpy.concatenate([aggregated_data.view(), rows])
+    # once a window is full, the next one starts at most 'window_size' rows later, see 'process_data(..)'
+    window_step = min(max(step_size, 1), window_size)
+    predictions, features, inertias = model.predict_sliding_windows(data, window_step)
+
+    aggregated_data.clear()
+    aggregated_data.extend(data[len(predictions) * window_step :])
+
+    return [
+        create_output(prediction, model_input, inertia)
+        for prediction, model_input, inertia in zip(predictions, features, inertias)
+    ]
+
+
+def create_output(prediction: int, features: numpy.array, inertia: float):
+    """
+    Creates the output dictionary of the pipeline from the predicted class, the scaled features
+    and the inertia of the window.
+    """
+    return {
+        output_name: prediction,
+        "inertia": inertia.item(),
+        "model_input_max": metric_output(features[0].item()),
+        "model_input_min": metric_output(features[1].item()),
+        "model_input_mean": metric_output(features[2].item()),
+    }
+
+
+def metric_output(v: int or float):
+    return json.dumps({"value": v})
@@ -0,0 +1,324 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+NumPy-only runtime of a compiled State Identifier pipeline.
+
+`numpy_export.export_numpy_model` compiles a trained pipeline
+`FillMissingValues → SumColumnsTransformer → WindowTransformer → FeatureTransformer → scaling → KMeans`
+into a `.npz` file with the constants of every step:
+
+- `spec`: JSON with the input columns, the fill value, the summed columns, the window size and step,
+  the names of the feature kernels, the kernel of every feature column and the floating point type
+  of the calculations (`float64` if missing),
+- `scale`, `offset`: the affine scaling of the features,
+- `centers`: the cluster centers in the scaled feature space.
+
+`NumpyModel` loads this file without pickle and predicts with NumPy alone, with the same results as the pipeline,
+so an edge package using it neither installs nor imports scikit-learn, pandas or tsfresh.
+The feature kernels are the vectorized kernels `FeatureTransformer` uses, which are defined here for that reason.
+"""
+
+import json
+
+import numpy
+
+FORMAT_VERSION = 1
+
+
+def _longest_strike(mask):
+    """
+    Returns the length of the longest run of `True` values in every row of a 2D boolean array.
+    """
+    if mask.shape[1] == 0:
+        return numpy.zeros(mask.shape[0], dtype=int)
+    counts = numpy.cumsum(mask, axis=1)
+    resets = numpy.maximum.accumulate(numpy.where(mask, 0, counts), axis=1)
+    return (counts - resets).max(axis=1)
+
+
+def _maximum(grid):
+    return grid.max(axis=1)
+
+
+def _minimum(grid):
+    return grid.min(axis=1)
+
+
+def _mean(grid):
+    return grid.mean(axis=1)
+
+
+def _variance(grid):
+    return grid.var(axis=1)
+
+
+def _standard_deviation(grid):
+    return grid.std(axis=1)
+
+
+def _sum_values(grid):
+    return grid.sum(axis=1)
+
+
+def _absolute_sum_of_changes(grid):
+    return numpy.abs(numpy.diff(grid, axis=1)).sum(axis=1)
+
+
+def _positive_sum_of_changes(grid):
+    return numpy.clip(numpy.diff(grid, axis=1), a_min=0, a_max=None).sum(axis=1)
+
+
+def _negative_sum_of_changes(grid):
+    return numpy.clip(numpy.diff(grid, axis=1), a_min=None, a_max=0).sum(axis=1)
+
+
+def _count_above_mean(grid):
+    return numpy.count_nonzero(grid > grid.mean(axis=1, keepdims=True), axis=1)
+
+
+def _longest_strike_above_mean(grid):
+    return _longest_strike(grid > grid.mean(axis=1, keepdims=True))
+
+
+def _longest_strike_below_mean(grid):
+    return _longest_strike(grid < grid.mean(axis=1, keepdims=True))
+
+
+# the feature kernels by the name stored in a compiled model
+KERNELS = {
+    "maximum": _maximum,
+    "minimum": _minimum,
+    "mean": _mean,
+    "variance": _variance,
+    "standard_deviation": _standard_deviation,
+    "sum_values": _sum_values,
+    "absolute_sum_of_changes": _absolute_sum_of_changes,
+    "positive_sum_of_changes": _positive_sum_of_changes,
+    "negative_sum_of_changes": _negative_sum_of_changes,
+    "count_above_mean": _count_above_mean,
+    "longest_strike_above_mean": _longest_strike_above_mean,
+    "longest_strike_below_mean": _longest_strike_below_mean,
+}
+
+
+class AffineNearestCentroid:
+    """
+    Predicts the nearest cluster center of features which are scaled by an affine transformation first,
+    with the scaling folded into the centers, see `state_identifier.src.si.fused_predictor`.
+
+    Args:
+        scale (numpy.array): Scale of the features per feature
+        offset (numpy.array): Offset of the scaled features per feature
+        centers (numpy.array): Cluster centers in the scaled feature space, indexed by cluster x feature
+        dtype: Floating point type of the calculations, e.g. float32 for a pipeline trained in float32
+    """
+
+    def __init__(
+        self, scale: numpy.array, offset: numpy.array, centers: numpy.array, dtype=float
+    ):
+        self.scale = numpy.asarray(scale, dtype=dtype)
+        self.offset = numpy.asarray(offset, dtype=dtype)
+        self.centers = numpy.asarray(centers, dtype=dtype)
+
+        # the folded centers, indexed by feature x cluster for the matrix product
+        self.weights = numpy.ascontiguousarray((2.0 * self.scale * self.centers).T)
+        self.bias = numpy.einsum("ij,ij->i", self.centers, self.centers) - 2.0 * (
+            self.centers @ self.offset
+        )
+
+    def scale_features(self, features: numpy.array) -> numpy.array:
+        """
+        Returns the scaled features, i.e. the input of the clustering in the pipeline.
+        """
+        return features * self.scale + self.offset
+
+    def predict(self, features: numpy.array) -> numpy.array:
+        """
+        Returns the index of the nearest center for every row of unscaled features.
+        """
+        return numpy.argmin(self.bias - features @ self.weights, axis=1)
+
+    def predict_with_distances(self, features: numpy.array):
+        """
+        Predicts the nearest center for every row of unscaled features.
+
+        Args:
+            features (numpy.array): Features indexed by window x feature
+
+        Returns:
+            numpy.array: Index of the nearest center per window
+            numpy.array: Squared distance to the nearest center per window, which sum up to the inertia
+            numpy.array: Scaled features per window
+        """
+        features = numpy.asarray(features, dtype=self.scale.dtype).reshape(
+            (-1, len(self.scale))
+        )
+        scores = self.bias - features @ self.weights
+        labels = numpy.argmin(scores, axis=1)
+        scaled = self.scale_features(features)
+        distances = scores[numpy.arange(len(labels)), labels] + numpy.einsum(
+            "ij,ij->i", scaled, scaled
+        )
+        # rounding errors may turn a distance of zero negative
+        return labels, numpy.maximum(distances, 0.0), scaled
+
+    def inertia(self, features: numpy.array) -> float:
+        """
+        Returns the sum of the squared distances of the windows to their nearest centers.
+        """
+        return float(self.predict_with_distances(features)[1].sum())
+
+
+def fill_missing_values(data: numpy.array, value, dtype=float) -> numpy.array:
+    """
+    Returns a copy of `data` as `dtype` with the missing values filled column-wise as `FillMissingValues(value)`
+    does: with a constant, or with the previous (`ffill`) or next (`bfill`) valid value.
+    """
+    data = numpy.array(data, dtype=dtype)
+    mask = numpy.isnan(data)
+    if not mask.any():
+        return data
+    if not isinstance(value, str):
+        data[mask] = value
+        return data
+
+    filled, filled_mask = data, mask
+    if "bfill" == value:
+        filled, filled_mask = data[::-1], mask[::-1]
+    source_rows = numpy.where(
+        filled_mask, 0, numpy.arange(len(filled)).reshape((-1, 1))
+    )
+    numpy.maximum.accumulate(source_rows, axis=0, out=source_rows)
+    filled[filled_mask] = filled[source_rows, numpy.arange(filled.shape[1])][
+        filled_mask
+    ]
+    return data
+
+
+class NumpyModel(AffineNearestCentroid):
+    """
+    A compiled State Identifier pipeline, see the module documentation.
+
+    Args:
+        spec (dict): The `spec` of the compiled model
+        scale, offset, centers (numpy.array): See `AffineNearestCentroid`
+    """
+
+    def __init__(self, spec: dict, scale, offset, centers):
+        super().__init__(scale, offset, centers, spec.get("dtype", "float64"))
+        if spec.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported format version {spec.get('format_version')}, expected {FORMAT_VERSION}"
+            )
+        self.spec = spec
+        self.input_columns = spec["input_columns"]
+        self.fill_value = spec["fill_value"]
+        self.sum_columns = spec["sum_columns"]
+        self.window_size = spec["window_size"]
+        self.window_step = spec["window_step"]
+        self.kernels = [KERNELS[name] for name in spec["kernels"]]
+        self.feature_columns = numpy.array(spec["feature_columns"], dtype=int)
+        self.dtype = self.scale.dtype
+
+    @classmethod
+    def load(cls, model_path):
+        """
+        Loads a compiled model from a `.npz` file, without unpickling anything.
+        """
+        with numpy.load(model_path, allow_pickle=False) as arrays:
+            spec = json.loads(str(arrays["spec"]))
+            return cls(spec, arrays["scale"], arrays["offset"], arrays["centers"])
+
+    def _summed(self, rows: numpy.array) -> numpy.array:
+        # summed in the order of `SumColumnsTransformer`, so the results are the same to the last bit
+        summed = rows[:, self.sum_columns[0]]
+        for column in self.sum_columns[1:]:
+            summed = summed + rows[:, column]
+        return summed
+
+    def features(self, grid: numpy.array) -> numpy.array:
+        """
+        Calculates the unscaled features of windows of the summed values, indexed by window x timestamp.
+        """
+        unique_features = numpy.hstack(
+            [
+                numpy.asarray(kernel(grid), dtype=self.dtype).reshape((-1, 1))
+                for kernel in self.kernels
+            ]
+        )
+        return unique_features[:, self.feature_columns]
+
+    def _predict_features(self, features: numpy.array):
+        if numpy.isnan(features).any():
+            raise ValueError("Input contains NaN.")
+        return self.predict_with_distances(features)
+
+    def predict_window(self, rows: numpy.array):
+        """
+        Predicts the cluster of a single window of input rows.
+
+        Args:
+            rows (numpy.array): `window_size` input rows indexed by timestamp x input column
+
+        Returns:
+            int: The index of the nearest center
+            numpy.array: The scaled features of the window
+            float: The squared distance of the window to the nearest center
+        """
+        summed = self._summed(fill_missing_values(rows, self.fill_value, self.dtype))
+        labels, distances, scaled = self._predict_features(
+            self.features(summed.reshape((1, -1)))
+        )
+        return labels[0], scaled[0], distances[0]
+
+    def predict_sliding_windows(
+        self, x: numpy.array, window_step: int, batch_size: int = 4096
+    ):
+        """
+        Predicts the clusters of all windows of `x` which start `window_step` rows apart,
+        with the same results as `predict_window` for every window.
+        Windows without missing values are calculated in batches of `batch_size` windows.
+
+        Args:
+            x (numpy.array): Input rows indexed by timestamp x input column
+            window_step (int): Number of rows by which the subsequent window is offset
+            batch_size (int): Maximum number of windows calculated at once
+
+        Returns:
+            numpy.array: The index of the nearest center per window
+            numpy.array: The scaled features per window
+            numpy.array: The squared distance to the nearest center per window
+        """
+        x = numpy.asarray(x, dtype=self.dtype)
+        n_windows = max(0, (len(x) - self.window_size) // window_step + 1)
+        labels = numpy.zeros(n_windows, dtype=int)
+        scaled = numpy.zeros((n_windows, len(self.scale)), dtype=self.dtype)
+        distances = numpy.zeros(n_windows, dtype=self.dtype)
+        if n_windows == 0:
+            return labels, scaled, distances
+        starts = numpy.arange(n_windows) * window_step
+
+        missing_counts = numpy.concatenate(
+            ([0], numpy.cumsum(numpy.isnan(x).any(axis=1)))
+        )
+        has_missing = missing_counts[starts + self.window_size] > missing_counts[starts]
+
+        windows = numpy.lib.stride_tricks.sliding_window_view(
+            self._summed(x), self.window_size
+        )[::window_step][:n_windows]
+        complete = numpy.flatnonzero(~has_missing)
+        for batch_start in range(0, len(complete), batch_size):
+            batch = complete[batch_start : batch_start + batch_size]
+            # the indexing copies the windows into a contiguous array, as the WindowTransformer does
+            labels[batch], distances[batch], scaled[batch] = self._predict_features(
+                self.features(windows[batch])
+            )
+
+        for window_index in numpy.flatnonzero(has_missing):
+            start = starts[window_index]
+            labels[window_index], scaled[window_index], distances[window_index] = (
+                self.predict_window(x[start : start + self.window_size])
+            )
+
+        return labels, scaled, distances
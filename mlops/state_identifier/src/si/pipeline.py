@@ -27,11 +27,166 @@ We also recommend studying the documentation of scikit-learn if you would like t
 how scikit-learn works or want to implement your own transformers.
 """
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy
-from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.base import BaseEstimator, TransformerMixin, clone
 from sklearn.impute._base import _BaseImputer
 from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MinMaxScaler
 import pandas as pd
+import tsfresh.feature_extraction.feature_calculators as fc
+
+from state_identifier.src.si.preprocessing import (
+    positive_sum_of_changes,
+    negative_sum_of_changes,
+    SumColumnsTransformer,
+)
+from state_identifier.src.si.numpy_runtime import (
+    _maximum,
+    _minimum,
+    _mean,
+    _variance,
+    _standard_deviation,
+    _sum_values,
+    _absolute_sum_of_changes,
+    _positive_sum_of_changes,
+    _negative_sum_of_changes,
+    _count_above_mean,
+    _longest_strike_above_mean,
+    _longest_strike_below_mean,
+)
+
+
+def _function_key(func):
+    """
+    Returns the name under which a feature function is looked up in `FEATURE_KERNELS`.
+    Functions are identified by their module and qualified name, so the lookup also works for
+    functions restored from a pickled pipeline.
+    """
+    return f"{getattr(func, '__module__', None)}.{getattr(func, '__qualname__', None)}"
+
+
+# Vectorized counterparts of the feature functions used in the State Identifier pipelines, keyed by the
+# fully qualified name of the feature function.
+# Each kernel receives a 2D array indexed by window x timestamp and returns one feature value per window,
+# so a feature is computed over all windows with a single NumPy reduction instead of one Python call per window.
+FEATURE_KERNELS = {}
+
+
+def register_feature_kernel(func_name, kernel):
+    """
+    Registers a vectorized kernel for the feature function with the given fully qualified name.
+
+    Args:
+        func_name (str): Module and qualified name of the feature function, e.g. `numpy.mean`
+        kernel (callable): Function mapping a 2D array indexed by window x timestamp to a 1D array of feature values
+    """
+    FEATURE_KERNELS[func_name] = kernel
+
+
+def get_feature_kernel(func):
+    """
+    Returns the vectorized kernel registered for `func`, or None if the function has no kernel.
+    """
+    return FEATURE_KERNELS.get(_function_key(func))
+
+
+_TSFRESH_CALCULATORS = "tsfresh.feature_extraction.feature_calculators"
+
+for _func_names, _kernel in [
+    ((_function_key(numpy.max), f"{_TSFRESH_CALCULATORS}.maximum"), _maximum),
+    ((_function_key(numpy.min), f"{_TSFRESH_CALCULATORS}.minimum"), _minimum),
+    ((_function_key(numpy.mean), f"{_TSFRESH_CALCULATORS}.mean"), _mean),
+    ((_function_key(numpy.var), f"{_TSFRESH_CALCULATORS}.variance"), _variance),
+    (
+        (_function_key(numpy.std), f"{_TSFRESH_CALCULATORS}.standard_deviation"),
+        _standard_deviation,
+    ),
+    ((_function_key(numpy.sum), f"{_TSFRESH_CALCULATORS}.sum_values"), _sum_values),
+    ((f"{_TSFRESH_CALCULATORS}.absolute_sum_of_changes",), _absolute_sum_of_changes),
+    ((_function_key(positive_sum_of_changes),), _positive_sum_of_changes),
+    ((_function_key(negative_sum_of_changes),), _negative_sum_of_changes),
+    ((f"{_TSFRESH_CALCULATORS}.count_above_mean",), _count_above_mean),
+    (
+        (f"{_TSFRESH_CALCULATORS}.longest_strike_above_mean",),
+        _longest_strike_above_mean,
+    ),
+    (
+        (f"{_TSFRESH_CALCULATORS}.longest_strike_below_mean",),
+        _longest_strike_below_mean,
+    ),
+]:
+    for _func_name in _func_names:
+        register_feature_kernel(_func_name, _kernel)
+
+
+# smallest number of windows per process in a parallel `FeatureTransformer.transform`
+MIN_WINDOWS_PER_JOB = 4096
+
+
+def _attach_shared_array(shared):
+    """
+    Returns the shared memory block described by `shared` (name, shape, dtype) and an array view of it.
+    """
+    name, shape, dtype = shared
+    block = shared_memory.SharedMemory(name=name)
+    return block, numpy.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _window_step(x):
+    """
+    Returns the step of the windows `x`, indexed by variable x window x timestamp, if they are a strided view
+    of adjacent or overlapping windows of the same rows, like the output of `WindowTransformer`,
+    or a contiguous array of adjacent windows. Returns None otherwise.
+    """
+    n_windows, window_size = x.shape[1], x.shape[2]
+    timestamp_stride, window_stride = x.strides[2], x.strides[1]
+    if n_windows < 2 or timestamp_stride <= 0 or window_stride % timestamp_stride:
+        return None
+    step = window_stride // timestamp_stride
+    return step if 0 < step <= window_size else None
+
+
+def _copy_window_rows(x, step, rows):
+    """
+    Copies the rows the windows `x` with the window step `step` were cut from into `rows`,
+    indexed by variable x timestamp: the first `step` values of every window, then the rest of the last window.
+    """
+    n_windows = x.shape[1]
+    heads = rows[:, : n_windows * step]
+    # raises instead of copying if the rows cannot be viewed window by window
+    heads.shape = (x.shape[0], n_windows, step)
+    heads[...] = x[:, :, :step]
+    rows[:, n_windows * step :] = x[:, -1, step:]
+
+
+def _transform_shared_block(
+    transformer, shared_input, window, shared_output, start, stop
+):
+    """
+    Worker of the parallel `FeatureTransformer.transform`: calculates the features of the windows `start:stop`
+    of the shared input and writes them into the same rows of the shared output.
+    If `window` is given as (window_size, step), the shared input holds the rows the windows are cut from,
+    and the windows are rebuilt as a strided view of them.
+    """
+    input_block, windows = _attach_shared_array(shared_input)
+    output_block, features = _attach_shared_array(shared_output)
+    try:
+        if window is not None:
+            window_size, step = window
+            windows = numpy.lib.stride_tricks.sliding_window_view(
+                windows, window_size, axis=1
+            )[:, ::step]
+        features[start:stop] = transformer._transform_serial(windows[:, start:stop])
+    finally:
+        # the views must be released before the blocks can be closed
+        windows = features = None
+        input_block.close()
+        output_block.close()
 
 
 class FeatureTransformer(BaseEstimator, TransformerMixin):
@@ -66,18 +221,34 @@ class FeatureTransformer(BaseEstimator, TransformerMixin):
     Args:
         function_list (list of tuples (_weight_, _functions_)): _weight_ is how many times the extracted features
         will be repeated and _functions_ is a list of functions to calculate the features from a window of data
+        n_jobs (int): Number of processes calculating the features of contiguous blocks of windows in parallel.
+        None or 1 means no parallelism, -1 means using all processors. Every process handles at least
+        `MIN_WINDOWS_PER_JOB` windows, so small inputs, like the windows on the AI Inference Server,
+        are always transformed in the calling process. The functions must be picklable for `n_jobs > 1`.
+        dtype (str): Floating point type of the features, e.g. "float32" to keep a float32 input in float32.
+        None keeps the types the functions return, which promotes integer features and float32 inputs to float64.
     """
 
     _func_list = []
+    # compiled form of `_func_list`, None for pipelines pickled before it was introduced
+    _unique_funcs = None
+    _func_columns = None
+    # defaults for pipelines pickled before `n_jobs` and `dtype` were introduced
+    n_jobs = None
+    dtype = None
 
-    def __init__(self, function_list=None):
+    def __init__(self, function_list=None, n_jobs=None, dtype=None):
         """
         Args:
             function_list (list of tuples (_weight_, _functions_)): where _weight_ is how many times
             the extracted features will be repeated and _functions_ is a list of functions to calculate
             the features from a window of data
+            n_jobs (int): Number of processes calculating the features in parallel, see the class documentation
+            dtype (str): Floating point type of the features, see the class documentation
         """
         self._set_funcs(function_list)
+        self.n_jobs = n_jobs
+        self.dtype = dtype
 
     @property
     def function_list(self):
@@ -93,6 +264,23 @@ class FeatureTransformer(BaseEstimator, TransformerMixin):
             for weight, block in func_list:
                 _func_list.extend(block * weight)
         self._func_list = _func_list
+        self._compile_funcs()
+
+    def _compile_funcs(self):
+        """
+        Compiles `_func_list` into the list of distinct functions and the index of the distinct function
+        for every feature column, so a function repeated by its weight is calculated only once per window.
+        """
+        unique_funcs = []
+        positions = {}
+        func_columns = []
+        for func in self._func_list:
+            if func not in positions:
+                positions[func] = len(unique_funcs)
+                unique_funcs.append(func)
+            func_columns.append(positions[func])
+        self._unique_funcs = unique_funcs
+        self._func_columns = numpy.array(func_columns, dtype=int)
 
     def fit(self, x, y=None):
         """
@@ -116,18 +304,122 @@ class FeatureTransformer(BaseEstimator, TransformerMixin):
         Returns:
             numpy.array: 2D array of extracted feature values window by window, indexed by window x feature*variable
         """
+        if self._func_columns is None:
+            self._compile_funcs()
+
+        n_jobs = self._effective_jobs(x)
+        if n_jobs > 1:
+            return self._transform_parallel(numpy.asarray(x), n_jobs)
+        return self._transform_serial(x)
+
+    def _effective_jobs(self, x):
+        """
+        Returns the number of processes to use for transforming `x`.
+        """
+        n_jobs = self.n_jobs or 1
+        if n_jobs < 0:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs == 1 or numpy.asarray(x).dtype.hasobject:
+            return 1
+        return min(n_jobs, numpy.shape(x)[1] // MIN_WINDOWS_PER_JOB)
+
+    def _transform_serial(self, x):
+        """
+        Calculates the features of all windows of `x` in the calling process.
+        """
         agg_data_list = []
         for feature_grid in x:
-            agg_data_list.append(
-                numpy.hstack(
-                    [
-                        numpy.apply_along_axis(func, 1, feature_grid).reshape((-1, 1))
-                        for func in self._func_list
-                    ]
-                )
+            # every column is converted on its own, so no float64 matrix is allocated for a float32 result
+            unique_features = numpy.hstack(
+                [
+                    numpy.asarray(
+                        self._apply(func, feature_grid), dtype=self.dtype
+                    ).reshape((-1, 1))
+                    for func in self._unique_funcs
+                ]
             )
+            agg_data_list.append(unique_features[:, self._func_columns])
         return numpy.hstack(agg_data_list)
 
+    def _transform_parallel(self, x, n_jobs):
+        """
+        Calculates the features of `n_jobs` contiguous blocks of windows of `x` in a process pool.
+        The rows the windows are cut from are copied into shared memory once, see `_window_rows`,
+        and every process rebuilds its windows as a strided view of them, so overlapping windows are not copied.
+        Every process writes the features of its block into the rows of a preallocated shared output matrix,
+        so neither inputs nor results are pickled.
+        As every feature only depends on its own window, the result is identical to `_transform_serial`.
+        """
+        # the first window tells the number and the type of the output columns
+        first = self._transform_serial(x[:, :1])
+        output_shape = (x.shape[1], first.shape[1])
+        window_size = x.shape[2]
+        bounds = numpy.linspace(0, x.shape[1], n_jobs + 1).astype(int)
+
+        step = _window_step(x)
+        window = None if step is None else (window_size, step)
+        input_shape = x.shape
+        if window is not None:
+            input_shape = (x.shape[0], (x.shape[1] - 1) * step + window_size)
+        input_block = shared_memory.SharedMemory(
+            create=True, size=max(int(numpy.prod(input_shape)) * x.dtype.itemsize, 1)
+        )
+        output_block = shared_memory.SharedMemory(
+            create=True,
+            size=max(output_shape[0] * output_shape[1] * first.dtype.itemsize, 1),
+        )
+        try:
+            shared = numpy.ndarray(input_shape, dtype=x.dtype, buffer=input_block.buf)
+            if window is None:
+                shared[...] = x
+            else:
+                _copy_window_rows(x, step, shared)
+            shared = None
+            shared_input = (input_block.name, input_shape, x.dtype.str)
+            shared_output = (output_block.name, output_shape, first.dtype.str)
+
+            # spawned processes do not inherit locks or patches of the calling process
+            with ProcessPoolExecutor(
+                n_jobs, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _transform_shared_block,
+                        self,
+                        shared_input,
+                        window,
+                        shared_output,
+                        start,
+                        stop,
+                    )
+                    for start, stop in zip(bounds[:-1], bounds[1:])
+                ]
+                for future in futures:
+                    future.result()
+
+            features = numpy.ndarray(
+                output_shape, dtype=first.dtype, buffer=output_block.buf
+            )
+            result = features.copy()
+            features = None
+        finally:
+            for block in [input_block, output_block]:
+                block.close()
+                block.unlink()
+
+        return result
+
+    @staticmethod
+    def _apply(func, feature_grid):
+        """
+        Calculates the feature `func` for every window of `feature_grid`.
+        Uses the vectorized kernel from `FEATURE_KERNELS` if there is one, otherwise calls `func` window by window.
+        """
+        kernel = get_feature_kernel(func)
+        if kernel is not None:
+            return kernel(numpy.asarray(feature_grid))
+        return numpy.apply_along_axis(func, 1, feature_grid)
+
 
 class WindowTransformer(BaseEstimator, TransformerMixin):
     """
@@ -184,13 +476,20 @@ class WindowTransformer(BaseEstimator, TransformerMixin):
     Args:
         window_size: Number of values in a window.
         window_step: Number of values by which the subsequent window is offset. Defaults to `window_size`.
+        copy: If False, `transform` returns a read-only strided view of the input instead of a new array.
+            The view has the same variable x window x timestamp layout, but values shared by overlapping windows
+            are not duplicated in memory.
     """
 
-    def __init__(self, window_size, window_step=None):
+    # default for pipelines pickled before `copy` was introduced
+    copy = True
+
+    def __init__(self, window_size, window_step=None, copy=True):
         """
         Args:
             window_size: Number of values in a window.
             window_step: Number of values by which the subsequent window is offset. Defaults to `window_size`.
+            copy: If False, `transform` returns a read-only strided view of the input instead of a new array.
         """
         if window_size < 1:
             raise ValueError("window_size must be > 0")
@@ -200,6 +499,7 @@ class WindowTransformer(BaseEstimator, TransformerMixin):
             raise ValueError("window_step must be > 0")
         self.window_size = window_size
         self.window_step = window_step
+        self.copy = copy
 
     def fit(self, x, y=None):
         """
@@ -211,21 +511,15 @@ class WindowTransformer(BaseEstimator, TransformerMixin):
         """
         Transforms a 2D array containing data rows indexed by timestamp x variable to a 3D array containing windows,
         indexed by variable x window x timestamp.
+        With `copy=False` the result is a read-only view of `x`.
         """
-        col_data_list = []
-        for column in x.T:
-            col_data_list.append(self._windowing(column.reshape((-1, 1))))
-        return numpy.stack(col_data_list)
-
-    def _windowing(self, x):
-        # https://stackoverflow.com/a/15722507
-        n = x.shape[0]  # needs at least 2 dimensions
-        return numpy.hstack(
-            [
-                x[i : 1 + n + i - self.window_size : self.window_step]
-                for i in range(0, self.window_size)
-            ]
-        )
+        x = numpy.asarray(x)
+        if x.shape[0] < self.window_size:
+            return numpy.empty((x.shape[1], 0, self.window_size), dtype=x.dtype)
+        windows = numpy.lib.stride_tricks.sliding_window_view(
+            x, self.window_size, axis=0
+        )[:: self.window_step].transpose(1, 0, 2)
+        return numpy.ascontiguousarray(windows) if self.copy else windows
 
 
 class FillMissingValues(_BaseImputer):
@@ -260,9 +554,18 @@ class FillMissingValues(_BaseImputer):
                 If it is a string, it must be either `bfill` or `ffill`.
                 With `bfill` the next valid value will be used for filling.
                 With `ffill` the previous valid value will be used for filling.
+        copy (bool): If False, the missing values of a floating point input array are filled in place.
+        carry_over (bool): Only used with `ffill`. If True, the last valid value of every column is kept
+                between calls of `transform`, so the leading missing values of a chunk are filled from the end
+                of the previous chunk. Use `reset()` before transforming an unrelated series.
     """
 
-    def __init__(self, value=None):
+    # defaults for pipelines pickled before these parameters were introduced
+    copy = True
+    carry_over = False
+    _last_valid = None
+
+    def __init__(self, value=None, copy=True, carry_over=False):
         """
         Args:
             value (string or number): If this argument is a number,
@@ -270,11 +573,16 @@ class FillMissingValues(_BaseImputer):
                 If it is a string, it must be either `bfill` or `ffill`.
                 With `bfill` the next valid value will be used for filling.
                 With `ffill` the previous valid value will be used for filling.
+            copy (bool): If False, the missing values of a floating point input array are filled in place.
+            carry_over (bool): Only used with `ffill`. If True, the leading missing values of a chunk are filled
+                with the last valid values of the previous chunk.
         """
         if isinstance(value, (int, float)) or value == "ffill" or value == "bfill":
             self.value = value
         else:
             raise ValueError('self.value must be a number or "bfill" or "ffill"')
+        self.copy = copy
+        self.carry_over = carry_over
 
     def fit(self, x):
         """
@@ -282,19 +590,182 @@ class FillMissingValues(_BaseImputer):
         """
         return self
 
+    def reset(self):
+        """
+        Forgets the last valid values carried over from the previous chunk.
+        """
+        self._last_valid = None
+        return self
+
     def transform(self, x):
         """
         Transforms the given array by filling missing values.
         """
-        df = pd.DataFrame(x)
+        data = numpy.asarray(x)
+        if data.ndim == 1:
+            data = data.reshape((-1, 1))
+        if data.dtype.kind in "biu":
+            # integer arrays cannot contain missing values
+            return data.copy() if self.copy else data
+        if data.dtype.kind != "f":
+            data = data.astype(float)
+        elif self.copy or not data.flags.writeable:
+            data = data.copy()
+
         if ("bfill" == self.value) or ("ffill" == self.value):
-            df = df.fillna(value=None, method=self.value)
+            self._fill_from_neighbours(data)
         elif isinstance(self.value, (int, float)):
-            df = df.fillna(value=self.value, method=None)
+            data[numpy.isnan(data)] = self.value
         else:
             raise ValueError('self.value must be a number or "bfill" or "ffill"')
 
-        return df.to_numpy()
+        return data
+
+    def _fill_from_neighbours(self, data):
+        """
+        Fills the missing values of `data` in place column-wise with the previous or the next valid value.
+        """
+        mask = numpy.isnan(data)
+        if "bfill" == self.value:
+            data, mask = data[::-1], mask[::-1]
+
+        if self.carry_over and "ffill" == self.value:
+            if self._last_valid is not None and len(data) > 0:
+                data[0] = numpy.where(mask[0], self._last_valid, data[0])
+                mask[0] = numpy.isnan(data[0])
+
+        if mask.any():
+            # index of the last valid row so far, or 0 if there is none, for every cell
+            source_rows = numpy.where(mask, 0, numpy.arange(len(data)).reshape((-1, 1)))
+            numpy.maximum.accumulate(source_rows, axis=0, out=source_rows)
+            data[mask] = data[source_rows, numpy.arange(data.shape[1])][mask]
+
+        if self.carry_over and "ffill" == self.value and len(data) > 0:
+            self._last_valid = data[-1].copy()
+
+
+def create_pipeline(
+    clustering,
+    window_size: int = 300,
+    window_step: int = 300,
+    feature_jobs: int = None,
+    dtype: str = None,
+) -> Pipeline:
+    """
+    Creates the State Identifier pipeline with the given clustering estimator and window configuration.
+    `feature_jobs` is the number of processes calculating the features, see `FeatureTransformer`.
+    `dtype` is the type of the features, e.g. "float32", None for the types of the feature functions.
+    """
+
+    weighted_feature_list = [
+        (2, [fc.maximum, fc.minimum, fc.mean]),
+        (1, [fc.variance, fc.standard_deviation]),
+        (1, [fc.sum_values]),
+        (1, [fc.absolute_sum_of_changes]),
+        (1, [positive_sum_of_changes, negative_sum_of_changes]),
+        (
+            1,
+            [
+                fc.count_above_mean,
+                fc.longest_strike_above_mean,
+                fc.longest_strike_below_mean,
+            ],
+        ),
+    ]
+
+    return Pipeline(
+        [
+            (
+                "preprocessing",
+                Pipeline(
+                    [
+                        ("fillmissing", FillMissingValues("ffill")),
+                        (
+                            "summarization",
+                            SumColumnsTransformer(),
+                        ),  # summarizes the variables into one variable
+                        (
+                            "windowing",
+                            WindowTransformer(
+                                window_size=window_size,
+                                window_step=window_step,
+                                copy=False,
+                            ),
+                        ),
+                        (
+                            "featurization",
+                            FeatureTransformer(
+                                function_list=weighted_feature_list,
+                                n_jobs=feature_jobs,
+                                dtype=dtype,
+                            ),
+                        ),
+                        ("scaling", MinMaxScaler(feature_range=(0, 1))),
+                    ]
+                ),
+            ),
+            ("clustering", clustering),
+        ]
+    )
+
+
+def label_intervals(
+    n_rows: int, pipeline: Pipeline, x_classes, result: str = "class"
+) -> pd.DataFrame:
+    """
+    Maps the labels defined per window to intervals of data points, run-length encoded.
+    The mapping of windows to data points is the same as in `back_propagate_labels`,
+    but instead of one label per data point, every run of data points with the same label is
+    described by a single row with its first and last position. Data points without a label get -1.
+
+    Params:
+        n_rows (int): Number of data points
+        pipeline (sklearn.pipeline.Pipeline): Pipeline containing a step named `windowing`
+        with parameters `window_step` and `window_size`
+        x_classes (list): Labels per window
+        result (str): Column name for labels
+    Returns:
+        pandas.DataFrame: Intervals with the columns `start`, `end` (both inclusive positions) and `result`
+    """
+    window_step = pipeline["windowing"].window_step
+    window_size = pipeline["windowing"].window_size
+
+    classes = numpy.asarray(x_classes)
+    classes = classes.astype(numpy.result_type(classes.dtype, numpy.int64))
+
+    # window i labels the data points from (i + 1) * window_step to (i + 1) * window_step + window_size,
+    # where the labels of a subsequent window overwrite the ones of the previous window
+    starts = (numpy.arange(len(classes)) + 1) * window_step
+    ends = starts + window_size
+    ends[:-1] = numpy.minimum(ends[:-1], starts[1:] - 1)
+    ends = numpy.minimum(ends, n_rows - 1)
+    labelled = starts <= ends
+    starts, ends, classes = starts[labelled], ends[labelled], classes[labelled]
+
+    # unlabelled gaps before, between and after the labelled intervals
+    gap_starts = numpy.concatenate(([0], ends + 1))
+    gap_ends = numpy.concatenate((starts - 1, [n_rows - 1]))
+    starts = numpy.column_stack((gap_starts[:-1], starts)).ravel()
+    ends = numpy.column_stack((gap_ends[:-1], ends)).ravel()
+    classes = numpy.column_stack((numpy.full_like(classes, -1), classes)).ravel()
+    starts = numpy.append(starts, gap_starts[-1])
+    ends = numpy.append(ends, gap_ends[-1])
+    classes = numpy.append(classes, -1).astype(classes.dtype)
+    non_empty = starts <= ends
+    starts, ends, classes = starts[non_empty], ends[non_empty], classes[non_empty]
+
+    # merge subsequent intervals with the same label
+    run_starts = numpy.flatnonzero(
+        numpy.concatenate(([True], classes[1:] != classes[:-1]))[: len(classes)]
+    )
+    run_ends = numpy.append(run_starts[1:] - 1, len(classes) - 1)[: len(run_starts)]
+    return pd.DataFrame(
+        {
+            "start": starts[run_starts],
+            "end": ends[run_ends],
+            result: classes[run_starts],
+        }
+    )
 
 
 def back_propagate_labels(
@@ -305,6 +776,7 @@ def back_propagate_labels(
     Maps a label for each window in `x_classes` to the corresponding data points
     in `data_frame` according to the window
     definition in `pipeline`. The results are stored in a column named according to the `result` parameter.
+    The data points are addressed by position, see `label_intervals` for a compact representation of the labels.
 
     Params:
         data_frame (pandas.DataFrame): Data frame to be labelled
@@ -316,15 +788,264 @@ def back_propagate_labels(
         pandas.DataFrame: input parameter `data_frame`
     """
 
-    window_step = pipeline["windowing"].window_step
-    window_size = pipeline["windowing"].window_size
+    intervals = label_intervals(len(data_frame), pipeline, x_classes, result)
+    data_frame[result] = numpy.repeat(
+        intervals[result].to_numpy(),
+        (intervals["end"] - intervals["start"] + 1).to_numpy(),
+    )
 
-    result_iterator = enumerate(x_classes)
-    data_frame[result] = -1  # adding a new column with default value -1
+    return data_frame
 
-    for i, value in result_iterator:
-        start = (i + 1) * window_step
-        end = (i + 1) * window_step + window_size
-        data_frame.loc[start:end, "class"] = value
 
-    return data_frame
+def _transform_steps(steps):
+    """
+    Yields the names and transformers of a list of pipeline steps.
+    Nested pipelines are flattened and skipped steps (None or "passthrough") are left out.
+    """
+    for name, step in steps:
+        if step is None or step == "passthrough":
+            continue
+        if isinstance(step, Pipeline):
+            yield from _transform_steps(step.steps)
+        else:
+            yield name, step
+
+
+def pipeline_dtype(pipeline: Pipeline) -> numpy.dtype:
+    """
+    Returns the floating point type a pipeline computes in, i.e. the `dtype` of its `FeatureTransformer`,
+    or float64 if it has none. Inputs converted to this type are not promoted by any step of the pipeline.
+    """
+    for _, step in _transform_steps(pipeline.steps):
+        if isinstance(step, FeatureTransformer) and step.dtype is not None:
+            return numpy.dtype(step.dtype)
+    return numpy.dtype(float)
+
+
+def _predict_final(estimator, x, return_distances: bool):
+    """
+    Returns the labels of the final estimator for `x` and, if `return_distances` is set, the squared distances
+    from its `predict_with_distances` in the same pass, or None if it has no such method.
+    """
+    if return_distances and hasattr(estimator, "predict_with_distances"):
+        labels, distances, _ = estimator.predict_with_distances(x)
+        return labels, distances
+    return estimator.predict(x), None
+
+
+def predict_with_features(
+    pipeline: Pipeline,
+    x,
+    feature_step: str = "featurization",
+    return_distances: bool = False,
+):
+    """
+    Predicts the labels for `x` and returns the intermediate features calculated on the way.
+    The data is fed through the steps of the pipeline only once, so this is equivalent to calling
+    `pipeline.predict(x)` and `pipeline["preprocessing"].transform(x)` but takes half the time.
+
+    Params:
+        pipeline (sklearn.pipeline.Pipeline): Trained pipeline, e.g. with the steps `preprocessing` and `clustering`
+        x (numpy.array): Input data indexed by timestamp x variable
+        feature_step (str): Name of the step whose output is returned as the extracted features
+        return_distances (bool): If True, the squared distances of the windows to their cluster centers are
+            returned as well, computed with the labels if the final estimator has `predict_with_distances`,
+            like `FusedCentroidPredictor`
+    Returns:
+        numpy.array: Labels per window
+        numpy.array: Output of the step named `feature_step`, or None if there is no such step
+        numpy.array: Input of the final estimator, i.e. the features after all preprocessing steps
+        numpy.array: Only with `return_distances`: squared distance per window, or None if the final estimator
+            has no `predict_with_distances`
+    """
+    features = None
+    for name, step in _transform_steps(pipeline.steps[:-1]):
+        x = step.transform(x)
+        if name == feature_step:
+            features = x
+
+    labels, distances = _predict_final(pipeline.steps[-1][1], x, return_distances)
+    if return_distances:
+        return labels, features, x, distances
+    return labels, features, x
+
+
+def predict_sliding_windows(
+    pipeline: Pipeline,
+    x,
+    window_step: int,
+    feature_step: str = "featurization",
+    batch_size: int = 4096,
+    return_distances: bool = False,
+):
+    """
+    Predicts the labels for all windows of `x` which start `window_step` rows apart, with the same result as
+    calling `predict_with_features` separately on every window of `window_size` rows.
+
+    The steps before the `WindowTransformer` of the pipeline are applied to `x` at once, and the windows
+    are fed through the remaining steps in batches of `batch_size` windows.
+    This requires the steps before the windowing to work row by row, like `FillMissingValues` and
+    `SumColumnsTransformer`. As filling missing values depends on the window boundaries, windows containing
+    missing values are predicted one by one.
+
+    Params:
+        pipeline (sklearn.pipeline.Pipeline): Trained pipeline containing a `WindowTransformer`
+        x (numpy.array): Input data indexed by timestamp x variable
+        window_step (int): Number of rows by which the subsequent window is offset
+        feature_step (str): Name of the step whose output is returned as the extracted features
+        batch_size (int): Maximum number of windows fed through the pipeline at once
+        return_distances (bool): See `predict_with_features`
+    Returns:
+        numpy.array: Labels per window
+        numpy.array: Output of the step named `feature_step` per window, or None if there is no such step
+        numpy.array: Input of the final estimator per window
+        numpy.array: Only with `return_distances`: squared distance per window, or None if the final estimator
+            has no `predict_with_distances`
+    """
+    steps = list(_transform_steps(pipeline.steps[:-1]))
+    windowing_index = next(
+        (i for i, (_, step) in enumerate(steps) if isinstance(step, WindowTransformer)),
+        None,
+    )
+    if windowing_index is None:
+        raise ValueError("pipeline must contain a WindowTransformer")
+    window_size = steps[windowing_index][1].window_size
+
+    x = numpy.asarray(x)
+    if x.dtype.kind != "f":
+        x = x.astype(float)
+    n_windows = max(0, (len(x) - window_size) // window_step + 1)
+    if n_windows == 0:
+        empty = numpy.empty(0, dtype=int), None, numpy.empty((0, 0))
+        return empty + (numpy.empty(0),) if return_distances else empty
+    starts = numpy.arange(n_windows) * window_step
+
+    missing_counts = numpy.concatenate(([0], numpy.cumsum(numpy.isnan(x).any(axis=1))))
+    has_missing = missing_counts[starts + window_size] > missing_counts[starts]
+
+    rows = x
+    for _, step in steps[:windowing_index]:
+        rows = step.transform(rows)
+    windows = numpy.lib.stride_tricks.sliding_window_view(rows, window_size, axis=0)[
+        ::window_step
+    ][:n_windows]
+
+    results = [None] * n_windows
+    complete = numpy.flatnonzero(~has_missing)
+    for batch_start in range(0, len(complete), batch_size):
+        batch = complete[batch_start : batch_start + batch_size]
+        data = windows[batch].transpose(1, 0, 2)
+        features = None
+        for name, step in steps[windowing_index + 1 :]:
+            data = step.transform(data)
+            if name == feature_step:
+                features = data
+        labels, distances = _predict_final(
+            pipeline.steps[-1][1], data, return_distances
+        )
+        for i, window_index in enumerate(batch):
+            results[window_index] = (
+                labels[i],
+                None if features is None else features[i],
+                data[i],
+                None if distances is None else distances[i],
+            )
+
+    for window_index in numpy.flatnonzero(has_missing):
+        start = starts[window_index]
+        outputs = predict_with_features(
+            pipeline, x[start : start + window_size], feature_step, return_distances
+        )
+        labels, features, data = outputs[:3]
+        distances = outputs[3] if return_distances else None
+        results[window_index] = (
+            labels[0],
+            None if features is None else features[0],
+            data[0],
+            None if distances is None else distances[0],
+        )
+
+    labels, features, data, distances = zip(*results)
+    predictions = (
+        numpy.array(labels),
+        None if features[0] is None else numpy.vstack(features),
+        numpy.vstack(data),
+    )
+    if return_distances:
+        return predictions + (None if distances[0] is None else numpy.array(distances),)
+    return predictions
+
+
+def iter_window_features(
+    preprocessing: Pipeline, chunks, feature_step: str = "featurization"
+):
+    """
+    Feeds consecutive chunks of input rows through the steps of `preprocessing` up to and including `feature_step`
+    and yields the features of every chunk. Concatenated, they are identical to the output of these steps for
+    the concatenation of the chunks, so a dataset can be processed without loading it into memory at once.
+
+    The steps before the `WindowTransformer` are applied to every chunk and must work row by row.
+    `FillMissingValues` with `ffill` keeps the last valid values between the chunks, while `bfill` would need
+    the following chunks and is not supported. The rows not covered by a complete window yet are carried over
+    to the next chunk, so the windows are the same as for the whole dataset.
+
+    Params:
+        preprocessing (sklearn.pipeline.Pipeline): Preprocessing pipeline containing a `WindowTransformer`
+        chunks (iterable): Arrays of input rows indexed by timestamp x variable
+        feature_step (str): Name of the last step to apply
+    Yields:
+        numpy.array: Features of the windows completed by the chunk, indexed by window x feature
+    """
+    steps = list(_transform_steps(preprocessing.steps))
+    names = [name for name, _ in steps]
+    if feature_step not in names:
+        raise ValueError(
+            f"The preprocessing pipeline has no step named '{feature_step}'"
+        )
+    steps = steps[: names.index(feature_step) + 1]
+    windowing_index = next(
+        (i for i, (_, step) in enumerate(steps) if isinstance(step, WindowTransformer)),
+        None,
+    )
+    if windowing_index is None:
+        raise ValueError(
+            "preprocessing must contain a WindowTransformer before the feature step"
+        )
+
+    row_steps = []
+    for _, step in steps[:windowing_index]:
+        if isinstance(step, FillMissingValues):
+            if step.value == "bfill":
+                raise ValueError(
+                    "FillMissingValues with 'bfill' cannot be applied chunk by chunk"
+                )
+            step = clone(step).set_params(carry_over=True)
+        row_steps.append(step)
+    windowing = steps[windowing_index][1]
+    window_size, window_step = windowing.window_size, windowing.window_step
+
+    remainder = None
+    skip = 0  # rows to skip before the next window starts, if window_step > window_size
+    for chunk in chunks:
+        rows = chunk
+        for step in row_steps:
+            rows = step.transform(rows)
+        rows = numpy.asarray(rows)
+        if remainder is not None:
+            rows = numpy.concatenate((remainder, rows))
+        skipped = min(skip, len(rows))
+        rows, skip = rows[skipped:], skip - skipped
+
+        n_windows = max(0, (len(rows) - window_size) // window_step + 1)
+        if n_windows > 0:
+            data = windowing.transform(
+                rows[: (n_windows - 1) * window_step + window_size]
+            )
+            for _, step in steps[windowing_index + 1 :]:
+                data = step.transform(data)
+            yield data
+
+        next_start = n_windows * window_step
+        skip += max(next_start - len(rows), 0)
+        # copy the remainder, so the chunk can be released
+        remainder = rows[next_start:].copy()
@@ -3,6 +3,8 @@
 import numpy as np
 from sklearn.base import BaseEstimator, TransformerMixin
 
+from state_identifier.src.si import windowing
+
 
 class SumColumnsTransformer(BaseEstimator, TransformerMixin):
     def fit(self, x, y=None):
@@ -14,9 +16,13 @@ class SumColumnsTransformer(BaseEstimator, TransformerMixin):
 
 
 class ClfWindowTransformer(BaseEstimator, TransformerMixin):
-    def __init__(self, window_size, step_size):
+    # default for pipelines pickled before `copy` was introduced
+    copy = True
+
+    def __init__(self, window_size, step_size, copy=True):
         self.window_size = window_size
         self.step_size = step_size
+        self.copy = copy
 
     def fit(self, x, y=None):
         return self
@@ -25,31 +31,153 @@ class ClfWindowTransformer(BaseEstimator, TransformerMixin):
         col_data_list = []
         for column in x.T:
             col_data_list.append(self._windowing(column.reshape((-1, 1))))
+        if len(col_data_list) == 1:
+            return col_data_list[0].copy() if self.copy else col_data_list[0]
         return np.hstack(col_data_list)
 
     def _windowing(self, x):
-        # https://stackoverflow.com/a/15722507
-        n = x.shape[0]  # needs at least 2 dimensions
-        return np.hstack(
-            x[i : 1 + n + i - self.window_size : self.step_size]
-            for i in range(0, self.window_size)
+        return windowing(x, self.window_size, self.step_size, copy=False)
+
+
+def _offset_rows(x, n_windows, stride, offset):
+    """
+    Returns the row at `offset` of each of the `n_windows` windows starting `stride` rows apart, as a strided view.
+    """
+    return x[offset : offset + (n_windows - 1) * stride + 1 : stride]
+
+
+def _window_sums(x, n_windows, window, stride):
+    """
+    Returns the sums of the windows, column by column, as differences of cumulative sums.
+    Floats are accumulated in float64, and windows containing NaN or infinite values are summed directly,
+    so they do not spoil the cumulative sums of the other windows.
+    """
+    is_float = x.dtype.kind == "f"
+    finite = np.isfinite(x) if is_float else None
+    has_non_finite = finite is not None and not finite.all()
+    values = np.where(finite, x, 0) if has_non_finite else x
+
+    sums = np.zeros(
+        (len(x) + 1, x.shape[1]),
+        dtype=np.float64 if is_float else np.result_type(x.dtype, np.int64),
+    )
+    np.cumsum(values, axis=0, dtype=sums.dtype, out=sums[1:])
+    result = _offset_rows(sums, n_windows, stride, window) - _offset_rows(
+        sums, n_windows, stride, 0
+    )
+
+    if has_non_finite:
+        counts = np.zeros((len(x) + 1, x.shape[1]), dtype=np.int64)
+        np.cumsum(~finite, axis=0, out=counts[1:])
+        rows, columns = np.nonzero(
+            _offset_rows(counts, n_windows, stride, window)
+            - _offset_rows(counts, n_windows, stride, 0)
         )
+        windows = np.lib.stride_tricks.sliding_window_view(x, window, axis=0)
+        result[rows, columns] = windows[rows * stride, columns].sum(axis=-1)
+    return result
+
+
+def _window_reduction(ufunc, x, n_windows, window, stride):
+    """
+    Reduces the windows with `ufunc`, e.g. `np.minimum`, by combining the strided views of the rows
+    at the same offset in every window, so no window is copied.
+    """
+    result = _offset_rows(x, n_windows, stride, 0).copy()
+    for offset in range(1, window):
+        ufunc(result, _offset_rows(x, n_windows, stride, offset), out=result)
+    return result
+
+
+def _window_mean(x, n_windows, window, stride):
+    mean = _window_sums(x, n_windows, window, stride) / window
+    return mean.astype(x.dtype) if x.dtype.kind == "f" else mean
+
+
+def _window_sum(x, n_windows, window, stride):
+    total = _window_sums(x, n_windows, window, stride)
+    return total.astype(x.dtype) if x.dtype.kind == "f" else total
+
+
+def _window_min(x, n_windows, window, stride):
+    return _window_reduction(np.minimum, x, n_windows, window, stride)
+
+
+def _window_max(x, n_windows, window, stride):
+    return _window_reduction(np.maximum, x, n_windows, window, stride)
+
+
+def _window_first(x, n_windows, window, stride):
+    return _offset_rows(x, n_windows, stride, 0).copy()
+
+
+def _window_last(x, n_windows, window, stride):
+    return _offset_rows(x, n_windows, stride, window - 1).copy()
+
+
+# the built-in aggregations of `DownsamplingTransformer`, by the name passed as `agg_func`
+DOWNSAMPLING_AGGREGATIONS = {
+    "mean": _window_mean,
+    "sum": _window_sum,
+    "min": _window_min,
+    "max": _window_max,
+    "first": _window_first,
+    "last": _window_last,
+}
 
 
 class DownsamplingTransformer(BaseEstimator, TransformerMixin):
-    def __init__(self, nbr_items, agg_func):
+    """
+    Aggregates every column over rolling windows of `nbr_items` rows.
+    Output row `i` is the aggregation of the rows `i * stride` to `i * stride + nbr_items - 1`,
+    so `stride=1` yields a value for every row position and `stride=nbr_items` decimates the input
+    into non-overlapping blocks.
+
+    `agg_func` is either the name of a built-in aggregation in `DOWNSAMPLING_AGGREGATIONS`, which is computed
+    for all windows and columns at once: `mean` and `sum` as differences of cumulative sums, which equal the direct
+    sums up to rounding errors, `min` and `max` by reducing the strided views of the rows at the same offset
+    in every window, and `first` and `last` by slicing. Or it is a function applied to every window,
+    like `np.mean`, which is called once per window and column.
+
+    Args:
+        nbr_items (int): Number of rows in a window
+        agg_func (str or callable): Name of a built-in aggregation or function of a window
+        stride (int): Number of rows by which the subsequent window is offset
+    """
+
+    # default for transformers pickled before `stride` was introduced
+    stride = 1
+
+    def __init__(self, nbr_items, agg_func, stride=1):
         self.nbr_items = nbr_items
         self.agg_func = agg_func
+        self.stride = stride
 
     def fit(self, x, y=None):
         return self
 
     def transform(self, x):
+        if isinstance(self.agg_func, str):
+            aggregation = DOWNSAMPLING_AGGREGATIONS.get(self.agg_func)
+            if aggregation is None:
+                raise ValueError(
+                    f"Unknown aggregation {self.agg_func}, "
+                    f"expected one of {list(DOWNSAMPLING_AGGREGATIONS)} or a function"
+                )
+            x = np.asarray(x)
+            n_windows = max(0, (len(x) - self.nbr_items) // self.stride + 1)
+            if n_windows == 0:
+                # fewer rows than a window
+                return np.empty((0,) + x.shape[1:], dtype=x.dtype)
+            return aggregation(x, n_windows, self.nbr_items, self.stride)
+
         col_data_list = []
         for column in x.T:
             col_data_list.append(
                 np.apply_along_axis(
-                    self.agg_func, 1, self._rolling_window(column, self.nbr_items)
+                    self.agg_func,
+                    1,
+                    self._rolling_window(column, self.nbr_items)[:: self.stride],
                 ).reshape((-1, 1))
             )
         return np.hstack(col_data_list)
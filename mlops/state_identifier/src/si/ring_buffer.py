@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Fixed-capacity circular buffer for collecting data rows on the AI Inference Server.
+
+Every row is written twice, at position `i` and `i + capacity` of a preallocated array of `2 * capacity` rows.
+This way appending a row is O(1) and never reallocates, while the most recent rows are always available
+as one contiguous slice of the array, which can be passed to a scikit-learn pipeline without copying.
+"""
+
+import numpy
+
+
+class RingBuffer:
+    """
+    A circular buffer holding the last `capacity` rows of `width` values.
+
+    The example code below illustrates the behavior.
+    ```python
+    buffer = RingBuffer(capacity=3, width=2)
+    for row in [[1, 10], [2, 20], [3, 30], [4, 40]]:
+        buffer.append(row)
+
+    len(buffer)    # 3, the first row has been overwritten
+    buffer.view()  # array([[2., 20.], [3., 30.], [4., 40.]])
+
+    buffer.discard(2)
+    buffer.view()  # array([[4., 40.]])
+    ```
+
+    Args:
+        capacity (int): Maximum number of rows kept in the buffer
+        width (int): Number of values in a row
+        dtype: Data type of the stored values. Defaults to float, so missing values can be stored as NaN.
+    """
+
+    def __init__(self, capacity: int, width: int, dtype=float):
+        if capacity < 1:
+            raise ValueError("capacity must be > 0")
+        self.capacity = capacity
+        self._data = numpy.full((2 * capacity, width), numpy.nan, dtype=dtype)
+        self._end = 0  # position after the most recent row, in [0, capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        """
+        Appends a row to the buffer. If the buffer is full, the oldest row is overwritten.
+        """
+        self._data[self._end] = row
+        self._data[self._end + self.capacity] = row
+        self._end = (self._end + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, rows):
+        """
+        Appends several rows to the buffer at once. If the buffer overflows, the oldest rows are overwritten.
+        """
+        rows = numpy.asarray(rows, dtype=self._data.dtype).reshape(
+            (-1, self._data.shape[1])
+        )[-self.capacity :]
+        positions = (self._end + numpy.arange(len(rows))) % self.capacity
+        self._data[positions] = rows
+        self._data[positions + self.capacity] = rows
+        self._end = (self._end + len(rows)) % self.capacity
+        self._size = min(self._size + len(rows), self.capacity)
+
+    def view(self):
+        """
+        Returns the rows in the buffer, oldest first, as a contiguous 2D array indexed by row x value.
+        The returned array is a view into the buffer and is only valid until the next `append`.
+        """
+        stop = self._end + self.capacity
+        return self._data[stop - self._size : stop]
+
+    def discard(self, count: int):
+        """
+        Removes the oldest `count` rows from the buffer.
+        """
+        self._size = max(self._size - max(count, 0), 0)
+
+    def clear(self):
+        """
+        Removes all rows from the buffer.
+        """
+        self._size = 0
@@ -0,0 +1,116 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Floating point type policy of the State Identifier training.
+
+With `--dtype float64`, the default, the pipeline computes in float64 as it always did.
+With `--dtype float32`, the raw data is converted to float32 when it is read, and every step keeps it in float32:
+`FillMissingValues`, `SumColumnsTransformer` and `WindowTransformer` preserve the type of their input,
+the `FeatureTransformer` converts its features to float32, and `MinMaxScaler` and `KMeans` are fitted on float32.
+The windowed data, the features, the scaler and the cluster centers take half the memory,
+and the inference on the edge keeps its input rows in float32 too, see `pipeline.pipeline_dtype`.
+
+The float32 pipeline is checked against the float64 path with `check_dtype_tolerance`:
+the same trained model predicts a sample of the raw data once in float32 and once in float64,
+i.e. with the raw data, the features, the scaling and the cluster centers in float64.
+The float32 path is accepted if
+
+- at least the fraction `FEATURE_AGREEMENT` of the windows has scaled features, which are the input of
+  the clustering and lie in [0, 1] for the training data, that differ by at most `FEATURE_TOLERANCE`, and
+- at least the fraction `LABEL_AGREEMENT` of the windows is assigned to the same cluster.
+
+The continuous features differ by a few float32 rounding errors. The counting features, like `count_above_mean`,
+change by one in the rare windows with a value within rounding errors of the window mean, and windows at almost
+the same distance to two centers may change their cluster.
+"""
+
+import copy
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+from state_identifier.src.si.pipeline import FeatureTransformer, predict_with_features
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+DTYPES = ("float64", "float32")
+
+# float32 has a precision of about 6e-8, the features of a window accumulate a few hundred rounding errors
+FEATURE_TOLERANCE = 1e-4
+FEATURE_AGREEMENT = 0.99
+LABEL_AGREEMENT = 0.999
+
+
+def feature_dtype(dtype: str):
+    """
+    Returns the `dtype` of the `FeatureTransformer` for a dtype policy, None for float64,
+    so pipelines trained in float64 are the same as before the policy was introduced.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype}, expected one of {DTYPES}")
+    return None if "float64" == dtype else dtype
+
+
+def float64_pipeline(pipe: Pipeline) -> Pipeline:
+    """
+    Returns a copy of a trained pipeline which computes in float64,
+    with the features, the fitted scaling and the cluster centers converted to float64.
+    """
+    reference = copy.deepcopy(pipe)
+    steps = list(reference["preprocessing"].named_steps.values())
+    for step in steps + [reference["clustering"]]:
+        if isinstance(step, FeatureTransformer):
+            step.dtype = None
+        # the fitted arrays, like `scale_` of the scaler and `cluster_centers_` of the clustering
+        for name, value in list(vars(step).items()):
+            if name.endswith("_") and isinstance(value, np.ndarray):
+                if "f" == value.dtype.kind:
+                    setattr(step, name, value.astype(np.float64))
+    return reference
+
+
+def check_dtype_tolerance(pipe: Pipeline, x: np.array, dtype: str) -> dict:
+    """
+    Compares the predictions of a pipeline trained with the dtype policy `dtype` with the float64 path,
+    see the module documentation.
+
+    Args:
+        pipe (sklearn.pipeline.Pipeline): Pipeline trained with `dtype`
+        x (numpy.array): Sample of the raw data in float64, indexed by timestamp x input column
+        dtype (str): The dtype policy, one of `DTYPES`
+
+    Returns:
+        dict: The number of windows, the fractions of windows with the same label and with the same
+              scaled features within `FEATURE_TOLERANCE`, the largest difference of the scaled features,
+              and whether the fractions are within the tolerance
+    """
+    labels, _, scaled = predict_with_features(pipe, x.astype(dtype))
+    reference_labels, _, reference_scaled = predict_with_features(
+        float64_pipeline(pipe), x.astype(np.float64)
+    )
+
+    windows = len(labels)
+    if 0 == windows:
+        return {
+            "windows": 0,
+            "label_agreement": 1.0,
+            "feature_agreement": 1.0,
+            "max_feature_difference": 0.0,
+            "within_tolerance": True,
+        }
+
+    differences = np.abs(scaled - reference_scaled).max(axis=1)
+    label_agreement = float(np.mean(labels == reference_labels))
+    feature_agreement = float(np.mean(differences <= FEATURE_TOLERANCE))
+    result = {
+        "windows": windows,
+        "label_agreement": label_agreement,
+        "feature_agreement": feature_agreement,
+        "max_feature_difference": float(differences.max()),
+        "within_tolerance": label_agreement >= LABEL_AGREEMENT
+        and feature_agreement >= FEATURE_AGREEMENT,
+    }
+    logger.info(f"{dtype} against float64: {result}")
+    return result
@@ -0,0 +1,169 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Plot of the states the State Identifier assigns to the training data.
+
+The training data has millions of rows, far more than a plot can show, so the plot is drawn from a downsampled
+series. The whole series is downsampled at once to at most `max_points` points, which bounds the size of the plot
+however often the state changes, and every selected point is coloured by the label of its row, taken from the runs
+of rows with the same class of `pipeline.label_intervals`. Two methods are available:
+
+- `minmax`: the minimum and the maximum of `max_points / 2` buckets of equal length, which keeps every peak
+  and is vectorized,
+- `lttb`: Largest-Triangle-Three-Buckets, which selects the point of every bucket spanning the largest
+  triangle with the points selected around it and follows the shape of the series more closely,
+  at the cost of one step per bucket.
+"""
+
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib import pyplot
+
+from state_identifier.src.si.numpy_runtime import fill_missing_values
+
+PLOT_METHODS = ("minmax", "lttb")
+
+# default maximum number of points of the plot
+PLOT_POINTS = 5000
+
+# colour of the rows without a label, visible on the white background
+UNLABELLED_COLOR = "grey"
+
+
+def state_palette(labels) -> dict:
+    """
+    Returns a colour for every label in `labels`: distinct colours for the states, however many clusters
+    the model has, and `UNLABELLED_COLOR` for -1.
+    """
+    states = sorted(set(labels) - {-1})
+    # the default palette has 10 colours, which would repeat for more states
+    colors = sns.color_palette("husl" if len(states) > 10 else None, len(states))
+    palette = dict(zip(states, colors))
+    palette[-1] = UNLABELLED_COLOR
+    return palette
+
+
+def min_max_indices(values: np.array, max_points: int) -> np.array:
+    """
+    Returns the sorted positions of the minimum and the maximum of every bucket of `values`,
+    at most `max_points` but at least two positions. Missing values are only selected in buckets
+    without any other value.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    bucket_length = -(-n // max(max_points // 2, 1))
+    n_buckets = -(-n // bucket_length)
+    grid = np.full(n_buckets * bucket_length, np.nan)
+    grid[:n] = values
+    grid = grid.reshape((n_buckets, bucket_length))
+    missing = np.isnan(grid)
+    offsets = np.arange(n_buckets) * bucket_length
+    lows = offsets + np.argmin(np.where(missing, np.inf, grid), axis=1)
+    highs = offsets + np.argmax(np.where(missing, -np.inf, grid), axis=1)
+    return np.unique(np.concatenate((lows, highs)))
+
+
+def lttb_indices(values: np.array, max_points: int) -> np.array:
+    """
+    Returns the sorted positions of the points of `values` selected by Largest-Triangle-Three-Buckets,
+    at most `max_points` but at least two positions. The first and the last position are always selected.
+    Missing values are filled from their neighbours for the selection.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    y = np.asarray(values, dtype=float)
+    if np.isnan(y).any():
+        y = fill_missing_values(
+            fill_missing_values(y.reshape((-1, 1)), "ffill"), "bfill"
+        ).ravel()
+
+    n_buckets = max(max_points - 2, 0)
+    # the buckets between the first and the last point
+    edges = 1 + (np.arange(n_buckets + 1) * (n - 2)) // max(n_buckets, 1)
+    selected = [0]
+    previous = 0
+    for bucket in range(n_buckets):
+        start, stop = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < n_buckets:
+            # the average point of the next bucket
+            next_x = (edges[bucket + 1] + edges[bucket + 2] - 1) / 2
+            next_y = y[edges[bucket + 1] : edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = n - 1, y[n - 1]
+        x = np.arange(start, stop)
+        areas = np.abs(
+            (previous - next_x) * (y[start:stop] - y[previous])
+            - (previous - x) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(np.nan_to_num(areas, nan=-1.0)))
+        selected.append(previous)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def downsample_intervals(
+    values: np.array,
+    intervals: pd.DataFrame,
+    max_points: int,
+    method: str = "minmax",
+    result: str = "class",
+) -> pd.DataFrame:
+    """
+    Downsamples a labelled series to at most `max_points` points and labels them by the runs containing them.
+    Points outside of every run get the label -1.
+
+    Args:
+        values (numpy.array): The series, e.g. the sum of the input variables per row
+        intervals (pandas.DataFrame): Runs of rows with the same label, sorted by position,
+            see `pipeline.label_intervals`
+        max_points (int): Maximum number of points of the whole series
+        method (str): Downsampling method, one of `PLOT_METHODS`
+        result (str): Column name of the labels in `intervals`
+
+    Returns:
+        pandas.DataFrame: The selected points with the columns `position`, `value` and `result`
+    """
+    if method not in PLOT_METHODS:
+        raise ValueError(f"Unsupported method {method}, expected one of {PLOT_METHODS}")
+    select = min_max_indices if "minmax" == method else lttb_indices
+
+    positions = select(values, max_points)
+    starts = intervals["start"].to_numpy()
+    runs = np.searchsorted(starts, positions, side="right") - 1
+    labels = np.full(len(positions), -1, dtype=np.int64)
+    inside = runs >= 0
+    inside[inside] = positions[inside] <= intervals["end"].to_numpy()[runs[inside]]
+    labels[inside] = intervals[result].to_numpy()[runs[inside]]
+    return pd.DataFrame(
+        {"position": positions, "value": values[positions], result: labels}
+    )
+
+
+def plot_states(
+    values: np.array,
+    intervals: pd.DataFrame,
+    max_points: int,
+    method: str = "minmax",
+    result: str = "class",
+):
+    """
+    Plots a labelled series downsampled with `downsample_intervals`, coloured by label, see `state_palette`.
+
+    Returns:
+        matplotlib.figure.Figure: The figure, which the caller closes
+    """
+    points = downsample_intervals(values, intervals, max_points, method, result)
+    figure, ax = pyplot.subplots(figsize=(24, 12))
+    sns.scatterplot(
+        x="position",
+        y="value",
+        data=points,
+        hue=result,
+        palette=state_palette(points[result]),
+        ax=ax,
+    )
+    return figure
@@ -0,0 +1,181 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parallel hyperparameter sweep over the window size, the window step and the number of clusters.
+
+The features of every window configuration are calculated once in the main process and placed in
+shared memory. The clusterings for the different numbers of clusters are fitted and scored in a process pool,
+where every worker attaches to the shared features instead of receiving a copy.
+Every combination is logged as a nested MLflow run of the active run.
+"""
+
+import copy
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import mlflow
+import numpy as np
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+from state_identifier.src.prep.feature_cache import cached_features, transform_features
+from state_identifier.src.score.scoring_utils import dunn_index, silhouette
+from common.src.base_logger import get_logger
+
+logger = get_logger(__name__)
+
+SWEEP_METRICS = ("silhouette", "dunn_index")
+
+
+def _fit_and_score(shared: tuple, clustering, n_clusters: int) -> dict:
+    """
+    Fits a clustering with `n_clusters` clusters to the features in the shared memory block
+    described by `shared` (name, shape, dtype) and returns its scores, or None if it cannot be fitted.
+    """
+    name, shape, dtype = shared
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        model = clone(clustering).set_params(n_clusters=n_clusters).fit(data)
+        scores = {
+            "inertia": float(model.inertia_),
+            "silhouette": silhouette(data, model.labels_)["silhouette"],
+            "dunn_index": float(dunn_index(data, model.labels_, use_kdtree=True)),
+        }
+    except ValueError as error:
+        # e.g. fewer windows than clusters, or a single cluster
+        logger.warning(f"n_clusters={n_clusters}: {error}")
+        scores = None
+    finally:
+        # the array must be released before the block can be closed
+        data = None
+        block.close()
+    return scores
+
+
+def sweep(
+    x: np.array,
+    pipe: Pipeline,
+    window_sizes: list,
+    window_steps: list,
+    cluster_counts: list,
+    max_workers: int = None,
+    metric: str = "silhouette",
+    feature_cache: str = None,
+) -> dict:
+    """
+    Evaluates the pipeline for every combination of window size, window step and number of clusters.
+
+    Arguments:
+    x: np.array
+        Training data indexed by timestamp x variable.
+    pipe: Pipeline
+        Pipeline as created in `train.py`, with the steps `preprocessing` and `clustering`,
+        and the steps `windowing` and `featurization` in the preprocessing.
+    window_sizes, window_steps, cluster_counts: list
+        Values of the grid.
+    max_workers: int
+        Number of worker processes, defaults to the number of processors.
+    metric: str
+        Score used to select the best combination, `silhouette` or `dunn_index`. Higher is better for both.
+    feature_cache: str
+        Directory of the feature cache, see `feature_cache.cached_features`.
+
+    Returns:
+    dict
+        The parameters of the best combination, which can be passed to `pipe.set_params`.
+    """
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"metric must be one of {SWEEP_METRICS}")
+
+    results = []
+    blocks = []
+    # spawned workers do not inherit the MLflow autologging patches of this process
+    with ProcessPoolExecutor(
+        max_workers, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        try:
+            futures = []
+            for window_size, window_step in itertools.product(
+                window_sizes, window_steps
+            ):
+                # FeatureTransformer cannot be cloned, as its parameter is flattened
+                candidate = copy.deepcopy(pipe).set_params(
+                    preprocessing__windowing__window_size=window_size,
+                    preprocessing__windowing__window_step=window_step,
+                )
+                preprocessing = candidate["preprocessing"]
+                data = transform_features(
+                    cached_features(x, preprocessing, feature_cache),
+                    preprocessing,
+                    fit=True,
+                )
+                logger.info(
+                    f"window_size={window_size}, window_step={window_step}: {data.shape}"
+                )
+
+                block = shared_memory.SharedMemory(
+                    create=True, size=max(data.nbytes, 1)
+                )
+                blocks.append(block)
+                shared_data = np.ndarray(data.shape, dtype=data.dtype, buffer=block.buf)
+                shared_data[...] = data
+                shared_data = None
+                shared = (block.name, data.shape, data.dtype.str)
+
+                for n_clusters in cluster_counts:
+                    params = {
+                        "window_size": window_size,
+                        "window_step": window_step,
+                        "n_clusters": n_clusters,
+                    }
+                    futures.append(
+                        (
+                            params,
+                            executor.submit(
+                                _fit_and_score,
+                                shared,
+                                candidate["clustering"],
+                                n_clusters,
+                            ),
+                        )
+                    )
+
+            for params, future in futures:
+                results.append((params, future.result()))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    best_params, best_scores = None, None
+    for params, scores in results:
+        run_name = "_".join(f"{key}{value}" for key, value in params.items())
+        with mlflow.start_run(run_name=run_name, nested=True):
+            mlflow.log_params(params)
+            if scores is not None:
+                mlflow.log_metrics(scores)
+        logger.info(f"{params}: {scores}")
+        if scores is not None and (
+            best_scores is None or scores[metric] > best_scores[metric]
+        ):
+            best_params, best_scores = params, scores
+
+    if best_params is None:
+        raise ValueError("No combination of the sweep could be fitted")
+
+    logger.info(f"best: {best_params}, {best_scores}")
+    mlflow.log_params({f"best_{key}": value for key, value in best_params.items()})
+    mlflow.log_dict(
+        [{**params, **(scores or {})} for params, scores in results],
+        "sweep_results.json",
+    )
+
+    return {
+        "preprocessing__windowing__window_size": best_params["window_size"],
+        "preprocessing__windowing__window_step": best_params["window_step"],
+        "clustering__n_clusters": best_params["n_clusters"],
+    }
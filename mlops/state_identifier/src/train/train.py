@@ -6,25 +6,26 @@ import argparse
 from pathlib import Path
 import pandas
 import numpy as np
-import joblib
 import json
-from sklearn.cluster import KMeans
+import pyarrow.dataset
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import MinMaxScaler
-import seaborn as sns
 from matplotlib import pyplot
-from state_identifier.src.si.preprocessing import (
-    positive_sum_of_changes,
-    negative_sum_of_changes,
-    SumColumnsTransformer,
-)
+from state_identifier.src.si.preprocessing import SumColumnsTransformer
 from state_identifier.src.si.pipeline import (
-    WindowTransformer,
-    FeatureTransformer,
-    FillMissingValues,
-    back_propagate_labels,
+    create_pipeline,
+    iter_window_features,
+    label_intervals,
+)
+from state_identifier.src.si.model_artifact import save_model_artifact
+from state_identifier.src.prep.feature_cache import cached_features, transform_features
+from state_identifier.src.train.sweep import SWEEP_METRICS, sweep
+from state_identifier.src.train.state_plot import PLOT_METHODS, PLOT_POINTS, plot_states
+from state_identifier.src.train.dtype_policy import (
+    DTYPES,
+    check_dtype_tolerance,
+    feature_dtype,
 )
-import tsfresh.feature_extraction.feature_calculators as fc
 import mlflow
 from azureml.core import Run
 
@@ -33,7 +34,24 @@ from common.src.base_logger import get_logger
 logger = get_logger(__name__)
 
 
-def main(raw_data: str, training_data: str, model_output: str, model_metadata: str):
+def main(
+    raw_data: str,
+    training_data: str,
+    model_output: str,
+    model_metadata: str,
+    feature_cache: str = None,
+    streaming: bool = False,
+    batch_rows: int = 1000000,
+    window_sizes: list = (300,),
+    window_steps: list = (300,),
+    cluster_counts: list = (3,),
+    sweep_workers: int = None,
+    sweep_metric: str = "silhouette",
+    feature_jobs: int = None,
+    dtype: str = "float64",
+    plot_points: int = PLOT_POINTS,
+    plot_method: str = "minmax",
+):
 
     run = Run.get_context()
     mlflow.set_tracking_uri(run.experiment.workspace.get_mlflow_tracking_uri())
@@ -51,12 +69,39 @@ def main(raw_data: str, training_data: str, model_output: str, model_metadata: s
             f"Training data path: {training_data}",
             f"Model output path: {model_output}",
             f"model_metadata: {model_metadata}",
+            f"feature_cache: {feature_cache}",
+            f"streaming: {streaming}",
+            f"batch_rows: {batch_rows}",
+            f"window_sizes: {window_sizes}",
+            f"window_steps: {window_steps}",
+            f"cluster_counts: {cluster_counts}",
+            f"feature_jobs: {feature_jobs}",
+            f"dtype: {dtype}",
+            f"plot_points: {plot_points}",
+            f"plot_method: {plot_method}",
         ]
 
         for line in lines:
             logger.info(line)
 
-        train_model(raw_data, training_data, model_output, model_metadata)
+        train_model(
+            raw_data,
+            training_data,
+            model_output,
+            model_metadata,
+            feature_cache,
+            streaming,
+            batch_rows,
+            window_sizes,
+            window_steps,
+            cluster_counts,
+            sweep_workers,
+            sweep_metric,
+            feature_jobs,
+            dtype,
+            plot_points=plot_points,
+            plot_method=plot_method,
+        )
 
         logger.info("Saving model_metadata...")
         logger.info("model_metadata:\n%s", json.dumps(model_data, indent=4))
@@ -70,6 +115,19 @@ def train_model(
     training_data: np.array,
     model_output: str,
     model_metadata: str,
+    feature_cache: str = None,
+    streaming: bool = False,
+    batch_rows: int = 1000000,
+    window_sizes: list = (300,),
+    window_steps: list = (300,),
+    cluster_counts: list = (3,),
+    sweep_workers: int = None,
+    sweep_metric: str = "silhouette",
+    feature_jobs: int = None,
+    dtype: str = "float64",
+    dtype_check_rows: int = 1000000,
+    plot_points: int = PLOT_POINTS,
+    plot_method: str = "minmax",
 ) -> None:
 
     logger.info("Starting training")
@@ -79,95 +137,210 @@ def train_model(
     logger.info(f"model_output: {model_output}")
     logger.info(f"model_metadata: {model_metadata}")
 
-    df = pandas.read_parquet(raw_data)
+    # the features are only cached on request, in a folder of their own which the scoring step can be given
+    logger.info(f"feature_cache: {feature_cache}")
+    logger.info(f"streaming: {streaming}")
+    logger.info(f"dtype: {dtype}")
 
     input_columns = ["ph1", "ph2", "ph3"]
+    # more than one combination of window size, window step and cluster count is evaluated in a sweep
+    is_sweep = len(window_sizes) * len(window_steps) * len(cluster_counts) > 1
+
+    if streaming:
+        if is_sweep:
+            raise ValueError("A sweep cannot be combined with streaming mode")
+        logger.info("creating pipeline")
+        pipe = create_pipeline(
+            MiniBatchKMeans(n_clusters=cluster_counts[0], random_state=0),
+            window_sizes[0],
+            window_steps[0],
+            feature_jobs,
+            feature_dtype(dtype),
+        )
+
+        logger.info(f"Fitting pipeline on chunks of {batch_rows} rows")
+        x_classes = fit_streaming(
+            pipe, raw_data, input_columns, batch_rows, dtype=dtype
+        )
+        logger.info(f"windows: {len(x_classes)}")
+        if "float64" != dtype:
+            check_model_dtype(
+                pipe,
+                next(iter_parquet_rows(raw_data, input_columns, dtype_check_rows)),
+                dtype,
+            )
+        # the pipeline is fitted step by step, so autologging does not record it
+        mlflow.sklearn.log_model(pipe, "model")
+        save_model(pipe, model_output, input_columns)
+        return
 
-    logger.info("creating ph_sum column")
-    df["ph_sum"] = SumColumnsTransformer().transform(df[input_columns].values).flatten()
-
-    logger.info("creating weighted_feature_list column")
-    weighted_feature_list = [
-        (2, [fc.maximum, fc.minimum, fc.mean]),
-        (1, [fc.variance, fc.standard_deviation]),
-        (1, [fc.sum_values]),
-        (1, [fc.absolute_sum_of_changes]),
-        (1, [positive_sum_of_changes, negative_sum_of_changes]),
-        (
-            1,
-            [
-                fc.count_above_mean,
-                fc.longest_strike_above_mean,
-                fc.longest_strike_below_mean,
-            ],
-        ),
-    ]
+    df = pandas.read_parquet(raw_data)
+    if "float64" != dtype:
+        # the float64 rows the float32 pipeline is checked against
+        reference_rows = df[input_columns].to_numpy(dtype=float)[:dtype_check_rows]
+        df = df.astype({column: dtype for column in input_columns})
 
     logger.info("creating pipeline")
-    pipe = Pipeline(
-        [
-            (
-                "preprocessing",
-                Pipeline(
-                    [
-                        ("fillmissing", FillMissingValues("ffill")),
-                        (
-                            "summarization",
-                            SumColumnsTransformer(),
-                        ),  # summarizes the variables into one variable
-                        (
-                            "windowing",
-                            WindowTransformer(window_size=300, window_step=300),
-                        ),
-                        (
-                            "featurization",
-                            FeatureTransformer(function_list=weighted_feature_list),
-                        ),
-                        ("scaling", MinMaxScaler(feature_range=(0, 1))),
-                    ]
-                ),
-            ),
-            ("clustering", KMeans(n_clusters=3, random_state=0)),
-        ]
+    pipe = create_pipeline(
+        KMeans(n_clusters=cluster_counts[0], random_state=0),
+        window_sizes[0],
+        window_steps[0],
+        feature_jobs,
+        feature_dtype(dtype),
     )
 
     x = df[input_columns].values  # transforming training data
     logger.info(f"x shape: {x.shape}")
 
+    if is_sweep:
+        logger.info("Running sweep")
+        best_params = sweep(
+            x,
+            pipe,
+            window_sizes,
+            window_steps,
+            cluster_counts,
+            max_workers=sweep_workers,
+            metric=sweep_metric,
+            feature_cache=feature_cache,
+        )
+        pipe.set_params(**best_params)
+
     logger.info("Fitting pipeline")
     pipe.fit(x)
+    if "float64" != dtype:
+        check_model_dtype(pipe, reference_rows, dtype)
 
     logger.info("predicting pipeline")
-    x_classes = pipe.predict(x)
+    features = cached_features(x, pipe["preprocessing"], feature_cache)
 
-    logger.info("df")
-    df = back_propagate_labels(df, pipe["preprocessing"], x_classes)
+    if plot_points > 0:
+        x_classes = pipe["clustering"].predict(
+            transform_features(features, pipe["preprocessing"])
+        )
+        log_state_plot(x, pipe, x_classes, plot_points, plot_method)
 
-    colormap = {
-        -1: "white",
-        0: "red",
-        1: "green",
-        2: "blue",
-        3: "orange",
-        4: "purple",
-        5: "yellow",
-    }
-    _, ax = pyplot.subplots(figsize=(24, 12))
-    sns.scatterplot(
-        x=df.index, y="ph_sum", data=df, hue="class", palette=colormap, ax=ax
-    )
+    save_model(pipe, model_output, input_columns)
+
+
+def log_state_plot(
+    x: np.array, pipe: Pipeline, x_classes: np.array, plot_points: int, plot_method: str
+) -> None:
+    """
+    Plots the sum of the input variables of the training data coloured by the predicted states,
+    downsampled to `plot_points` points, and logs it to MLflow.
+    """
+    logger.info(f"Plotting states with {plot_method}, {plot_points} points")
+    intervals = label_intervals(len(x), pipe["preprocessing"], x_classes)
+    ph_sum = SumColumnsTransformer().transform(x).ravel()
+    figure = plot_states(ph_sum, intervals, plot_points, plot_method)
+    mlflow.log_figure(figure, "state_plot.png")
+    pyplot.close(figure)
+
+
+def save_model(pipe: Pipeline, model_output: str, input_columns: list) -> None:
 
     logger.info("Saving model")
     models_folder = Path(model_output) / "models"
     models_folder.mkdir(parents=True, exist_ok=True)
 
     model_output = Path(models_folder) / "clustering-model.joblib"
-    with open(model_output, "wb"):
-        joblib.dump(pipe, model_output, compress=9)
+    # uncompressed, so the arrays of the pipeline can be memory-mapped when it is loaded
+    save_model_artifact(pipe, model_output, input_columns)
 
     logger.info("Finished training")
 
 
+def check_model_dtype(pipe: Pipeline, x: np.array, dtype: str) -> None:
+    """
+    Checks a pipeline trained in `dtype` against the float64 path on the float64 rows `x`,
+    logs the result to MLflow and raises a ValueError if it is out of tolerance, see `dtype_policy`.
+    """
+    logger.info(f"Checking the {dtype} pipeline against float64 on {len(x)} rows")
+    result = check_dtype_tolerance(pipe, x, dtype)
+    mlflow.log_metrics(
+        {
+            "dtype_label_agreement": result["label_agreement"],
+            "dtype_feature_agreement": result["feature_agreement"],
+            "dtype_max_feature_difference": result["max_feature_difference"],
+        }
+    )
+    if not result["within_tolerance"]:
+        raise ValueError(
+            f"The {dtype} pipeline differs from the float64 path beyond the tolerance: {result}. "
+            "Train with --dtype float64 instead."
+        )
+
+
+def iter_parquet_rows(raw_data: str, input_columns: list, batch_rows: int, dtype=float):
+    """
+    Yields the values of `input_columns` in `raw_data` as arrays of type `dtype` of at most `batch_rows` rows,
+    reading the parquet files of the dataset row group by row group.
+    """
+    dataset = pyarrow.dataset.dataset(raw_data, format="parquet")
+    for batch in dataset.to_batches(columns=input_columns, batch_size=batch_rows):
+        yield np.column_stack(
+            [
+                batch.column(column).to_numpy(zero_copy_only=False).astype(dtype)
+                for column in input_columns
+            ]
+        )
+
+
+def fit_streaming(
+    pipe: Pipeline,
+    raw_data: str,
+    input_columns: list,
+    batch_rows: int,
+    batch_windows: int = 1024,
+    epochs: int = 10,
+    dtype=float,
+) -> np.array:
+    """
+    Fits the pipeline created by `create_pipeline` without loading `raw_data` into memory at once.
+
+    The features are calculated chunk by chunk with `iter_window_features`, which yields the same windows
+    as the in-memory path. The scaler is fitted with the partial statistics of every chunk, and the clustering
+    is fitted with `partial_fit` on batches of the scaled features in a second pass.
+    Only the features are kept in memory, which take a fraction of the size of the raw data.
+    The raw data is read as `dtype`.
+
+    Returns the labels of the windows.
+    """
+    preprocessing = pipe["preprocessing"]
+    scaler = preprocessing["scaling"]
+    clustering = pipe["clustering"]
+
+    feature_chunks = []
+    for features in iter_window_features(
+        preprocessing, iter_parquet_rows(raw_data, input_columns, batch_rows, dtype)
+    ):
+        scaler.partial_fit(features)
+        feature_chunks.append(features)
+    scaled_features = scaler.transform(np.vstack(feature_chunks))
+    logger.info(f"features shape: {scaled_features.shape}")
+
+    rng = np.random.default_rng(0)
+    for _ in range(epochs):
+        order = rng.permutation(len(scaled_features))
+        for start in range(0, len(order), batch_windows):
+            batch = order[start : start + batch_windows]
+            # the centers are initialized from the first batch, which needs n_clusters windows
+            if len(batch) >= clustering.n_clusters or hasattr(
+                clustering, "cluster_centers_"
+            ):
+                clustering.partial_fit(scaled_features[batch])
+
+    return clustering.predict(scaled_features)
+
+
+def parse_flag(value: str) -> bool:
+    """
+    Parses the value of a boolean option, e.g. `True` or `false` as passed by a component input.
+    """
+    return value.lower() in ("true", "1", "yes")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser("train")
     parser.add_argument("--training_data", type=str, help="Path to training data")
@@ -179,6 +352,90 @@ if __name__ == "__main__":
     )
     parser.add_argument("--model_output", type=str, help="Path of output model")
     parser.add_argument("--model_metadata", type=str, help="Path of model metadata")
+    parser.add_argument(
+        "--feature_cache",
+        type=str,
+        default=None,
+        help="Directory to cache the features in for the scoring step, no caching without it",
+    )
+
+    parser.add_argument(
+        "--streaming",
+        type=parse_flag,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Train chunk by chunk without loading the raw data into memory, also '--streaming True' or 'False'",
+    )
+    parser.add_argument(
+        "--batch_rows",
+        type=int,
+        default=1000000,
+        help="Number of raw data rows per chunk in streaming mode",
+    )
+
+    parser.add_argument(
+        "--window_sizes",
+        type=int,
+        nargs="+",
+        default=[300],
+        help="Window sizes, a sweep is run for more than one combination",
+    )
+    parser.add_argument(
+        "--window_steps",
+        type=int,
+        nargs="+",
+        default=[300],
+        help="Window steps, a sweep is run for more than one combination",
+    )
+    parser.add_argument(
+        "--n_clusters",
+        type=int,
+        nargs="+",
+        default=[3],
+        help="Numbers of clusters, a sweep is run for more than one combination",
+    )
+    parser.add_argument(
+        "--sweep_workers",
+        type=int,
+        default=None,
+        help="Number of worker processes of the sweep, defaults to the number of processors",
+    )
+    parser.add_argument(
+        "--sweep_metric",
+        type=str,
+        default="silhouette",
+        choices=SWEEP_METRICS,
+        help="Score used to select the best combination of the sweep",
+    )
+
+    parser.add_argument(
+        "--feature_jobs",
+        type=int,
+        default=None,
+        help="Number of processes calculating the features, -1 for all processors",
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float64",
+        choices=DTYPES,
+        help="Floating point type of the data from the raw data to the clustering, "
+        "float32 is checked against float64",
+    )
+    parser.add_argument(
+        "--plot_points",
+        type=int,
+        default=PLOT_POINTS,
+        help="Maximum number of points of the state plot, 0 to skip the plot",
+    )
+    parser.add_argument(
+        "--plot_method",
+        type=str,
+        default="minmax",
+        choices=PLOT_METHODS,
+        help="Downsampling method of the state plot",
+    )
 
     args = parser.parse_args()
 
@@ -186,5 +443,23 @@ if __name__ == "__main__":
     raw_data = args.raw_data
     model_output = args.model_output
     model_metadata = args.model_metadata
-
-    main(raw_data, training_data, model_output, model_metadata)
+    feature_cache = args.feature_cache
+
+    main(
+        raw_data,
+        training_data,
+        model_output,
+        model_metadata,
+        feature_cache,
+        args.streaming,
+        args.batch_rows,
+        args.window_sizes,
+        args.window_steps,
+        args.n_clusters,
+        args.sweep_workers,
+        args.sweep_metric,
+        args.feature_jobs,
+        args.dtype,
+        args.plot_points,
+        args.plot_method,
+    )
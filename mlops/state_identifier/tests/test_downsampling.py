@@ -0,0 +1,75 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the built-in aggregations of `DownsamplingTransformer` with the aggregation functions they replace.
+"""
+
+import numpy as np
+import pytest
+
+from state_identifier.src.si.preprocessing import (
+    DOWNSAMPLING_AGGREGATIONS,
+    DownsamplingTransformer,
+)
+
+ROWS = 1000
+
+CALLABLES = {
+    "mean": np.mean,
+    "sum": np.sum,
+    "min": np.min,
+    "max": np.max,
+    "first": lambda window: window[0],
+    "last": lambda window: window[-1],
+}
+
+
+def _rows(dtype: str, random_state: int) -> np.array:
+    """
+    Returns rows of three columns with the given type; floating point rows contain NaN and infinite values.
+    """
+    rng = np.random.default_rng(random_state)
+    if np.dtype(dtype).kind in "iu":
+        return rng.integers(-1000, 1000, (ROWS, 3)).astype(dtype)
+    x = rng.normal(100.0, 10.0, (ROWS, 3)).astype(dtype)
+    x[rng.random(x.shape) < 0.005] = np.nan
+    x[[10, 500], [0, 1]] = np.inf
+    x[700, 2] = -np.inf
+    return x
+
+
+def test_every_aggregation_has_a_reference():
+    assert set(CALLABLES) == set(DOWNSAMPLING_AGGREGATIONS)
+
+
+@pytest.mark.parametrize("dtype", ["float64", "float32", "int64"])
+@pytest.mark.parametrize(
+    "nbr_items, stride", [(1, 1), (40, 1), (40, 40), (40, 7), (7, 40)]
+)
+@pytest.mark.parametrize("agg_func", list(DOWNSAMPLING_AGGREGATIONS))
+def test_aggregation_matches_callable(agg_func, nbr_items, stride, dtype):
+    x = _rows(dtype, random_state=nbr_items + stride)
+    expected = DownsamplingTransformer(
+        nbr_items, CALLABLES[agg_func], stride
+    ).transform(x)
+    downsampled = DownsamplingTransformer(nbr_items, agg_func, stride).transform(x)
+
+    assert downsampled.shape == expected.shape == ((ROWS - nbr_items) // stride + 1, 3)
+    if agg_func in ("mean", "sum"):
+        # sums of cumulative sums differ from the direct sums by rounding errors
+        rtol = 1e-5 if dtype == "float32" else 1e-9
+        np.testing.assert_allclose(downsampled, expected, rtol=rtol)
+    else:
+        np.testing.assert_array_equal(downsampled, expected)
+
+
+@pytest.mark.parametrize("agg_func", list(DOWNSAMPLING_AGGREGATIONS))
+def test_fewer_rows_than_a_window(agg_func):
+    downsampled = DownsamplingTransformer(10, agg_func).transform(np.ones((9, 3)))
+    assert downsampled.shape == (0, 3)
+
+
+def test_unknown_aggregation_is_rejected():
+    with pytest.raises(ValueError):
+        DownsamplingTransformer(10, "median").transform(np.ones((20, 3)))
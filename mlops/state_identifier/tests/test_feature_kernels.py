@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the vectorized feature kernels of `FeatureTransformer` with the feature functions they replace.
+"""
+
+import numpy as np
+import pytest
+import tsfresh.feature_extraction.feature_calculators as fc
+
+from state_identifier.src.si.pipeline import FeatureTransformer, get_feature_kernel
+from state_identifier.src.si.preprocessing import (
+    negative_sum_of_changes,
+    positive_sum_of_changes,
+)
+
+FEATURE_FUNCTIONS = [
+    fc.maximum,
+    fc.minimum,
+    fc.mean,
+    fc.variance,
+    fc.standard_deviation,
+    fc.sum_values,
+    fc.absolute_sum_of_changes,
+    fc.count_above_mean,
+    fc.longest_strike_above_mean,
+    fc.longest_strike_below_mean,
+    positive_sum_of_changes,
+    negative_sum_of_changes,
+    np.mean,
+    np.var,
+    np.std,
+    np.sum,
+]
+
+
+def _grids() -> dict:
+    """
+    Returns windows indexed by window x timestamp: continuous values, repeated values with ties to the mean,
+    constant windows, and windows with missing values.
+    """
+    rng = np.random.default_rng(0)
+    continuous = rng.normal(100.0, 10.0, (200, 60))
+    ties = rng.integers(0, 3, (200, 60)).astype(float)
+    constant = np.repeat(rng.normal(size=(20, 1)), 60, axis=1)
+    missing = rng.normal(size=(20, 60))
+    missing[rng.random(missing.shape) < 0.05] = np.nan
+    return {
+        "continuous": continuous,
+        "ties": ties,
+        "constant": constant,
+        "missing": missing,
+    }
+
+
+@pytest.mark.parametrize("grid_name", list(_grids()))
+@pytest.mark.parametrize(
+    "func", FEATURE_FUNCTIONS, ids=lambda func: f"{func.__module__}.{func.__name__}"
+)
+def test_kernel_matches_feature_function(func, grid_name):
+    grid = _grids()[grid_name]
+    kernel = get_feature_kernel(func)
+    assert kernel is not None
+
+    expected = np.apply_along_axis(func, 1, grid)
+    np.testing.assert_allclose(
+        np.asarray(kernel(grid), dtype=float),
+        np.asarray(expected, dtype=float),
+        rtol=1e-12,
+        atol=1e-9,
+    )
+
+
+def test_unregistered_function_is_applied_per_window():
+    def peak_to_peak(x):
+        return np.max(x) - np.min(x)
+
+    assert get_feature_kernel(peak_to_peak) is None
+    grid = _grids()["continuous"]
+    features = FeatureTransformer([(1, [peak_to_peak, fc.mean])]).transform(
+        grid[None, :, :]
+    )
+    np.testing.assert_allclose(features[:, 0], np.ptp(grid, axis=1))
+    np.testing.assert_allclose(features[:, 1], grid.mean(axis=1), rtol=1e-12)
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the NumPy filling of missing values with the pandas filling it replaces.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from state_identifier.src.si.numpy_runtime import fill_missing_values
+from state_identifier.src.si.pipeline import FillMissingValues
+
+ROWS = 500
+
+
+def _with_missing_values(random_state: int) -> np.array:
+    """
+    Returns rows with isolated and consecutive missing values, including leading and trailing ones
+    and a column without any valid value.
+    """
+    rng = np.random.default_rng(random_state)
+    x = rng.normal(0.0, 1.0, (ROWS, 4))
+    x[rng.random(x.shape) < 0.1] = np.nan
+    x[:5, 0] = np.nan
+    x[-5:, 1] = np.nan
+    x[100:140, 2] = np.nan
+    x[:, 3] = np.nan
+    return x
+
+
+def _pandas_fill(x: np.array, value) -> np.array:
+    frame = pd.DataFrame(x)
+    if "ffill" == value:
+        return frame.ffill().to_numpy()
+    if "bfill" == value:
+        return frame.bfill().to_numpy()
+    return frame.fillna(value).to_numpy()
+
+
+@pytest.mark.parametrize("value", ["ffill", "bfill", 0, 3.5])
+def test_fill_matches_pandas(value):
+    x = _with_missing_values(random_state=0)
+    expected = _pandas_fill(x, value)
+
+    filled = FillMissingValues(value).transform(x)
+    np.testing.assert_array_equal(filled, expected)
+    np.testing.assert_array_equal(fill_missing_values(x, value), expected)
+    # the input is not modified unless copy=False
+    assert np.isnan(x).sum() > 0 and filled is not x
+
+    in_place = x.copy()
+    assert FillMissingValues(value, copy=False).transform(in_place) is in_place
+    np.testing.assert_array_equal(in_place, expected)
+
+
+def test_one_dimensional_and_integer_inputs():
+    x = _with_missing_values(random_state=1)[:, 0]
+    np.testing.assert_array_equal(
+        FillMissingValues("ffill").transform(x), _pandas_fill(x[:, None], "ffill")
+    )
+    integers = np.arange(12).reshape((4, 3))
+    np.testing.assert_array_equal(
+        FillMissingValues("ffill").transform(integers), integers
+    )
+
+
+def test_carry_over_matches_filling_the_whole_series():
+    x = _with_missing_values(random_state=2)
+    expected = _pandas_fill(x, "ffill")
+
+    fill = FillMissingValues("ffill", carry_over=True)
+    chunks = [
+        fill.transform(chunk) for chunk in np.array_split(x, [3, 50, 51, 120, 300])
+    ]
+    np.testing.assert_array_equal(np.vstack(chunks), expected)
+
+    # without the values of the previous chunk the leading missing values of a chunk remain missing
+    fill.reset()
+    np.testing.assert_array_equal(
+        fill.transform(x[120:]), _pandas_fill(x[120:], "ffill")
+    )
@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the fused scaling and nearest-centroid prediction with the pipeline it is derived from.
+"""
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans, MiniBatchKMeans
+
+from state_identifier.src.si.fused_predictor import FusedCentroidPredictor
+from state_identifier.src.si.pipeline import (
+    create_pipeline,
+    predict_sliding_windows,
+    predict_with_features,
+)
+
+WINDOW_SIZE = 60
+ROWS = 6000
+
+
+def _levels(rows: int, random_state: int) -> np.array:
+    """
+    Returns input rows whose sum switches between four levels, with some noise.
+    """
+    rng = np.random.default_rng(random_state)
+    durations = rng.integers(WINDOW_SIZE // 2, 4 * WINDOW_SIZE, rows)
+    levels = np.repeat(
+        rng.choice([10.0, 40.0, 70.0, 100.0], len(durations)), durations
+    )[:rows]
+    return levels[:, None] / 3 + rng.normal(0.0, 2.0, (rows, 3))
+
+
+@pytest.fixture(
+    scope="module",
+    params=[
+        KMeans(n_clusters=4, random_state=0, n_init=10),
+        MiniBatchKMeans(n_clusters=4, random_state=0, n_init=3),
+    ],
+    ids=["kmeans", "minibatch"],
+)
+def pipe(request):
+    return create_pipeline(request.param, WINDOW_SIZE, WINDOW_SIZE).fit(
+        _levels(ROWS, random_state=0)
+    )
+
+
+def _window_inertia(pipe, scaled: np.array, labels: np.array) -> np.array:
+    return ((scaled - pipe["clustering"].cluster_centers_[labels]) ** 2).sum(axis=1)
+
+
+def test_predict_with_distances_matches_pipeline(pipe):
+    x = _levels(ROWS, random_state=1)
+    fused = FusedCentroidPredictor.from_pipeline(pipe)
+    assert fused is not None
+
+    features = x
+    for _, step in fused.feature_steps:
+        features = step.transform(features)
+    labels, distances, fused_scaled = fused.predict_with_distances(features)
+    scaled = pipe["preprocessing"].transform(x)
+
+    np.testing.assert_array_equal(labels, pipe.predict(x))
+    np.testing.assert_allclose(
+        distances, _window_inertia(pipe, scaled, labels), rtol=1e-9, atol=1e-9
+    )
+    np.testing.assert_allclose(distances.sum(), -pipe.score(x), rtol=1e-9)
+    np.testing.assert_allclose(fused_scaled, scaled, atol=1e-12)
+
+
+@pytest.mark.parametrize("window_step", [WINDOW_SIZE, 13])
+def test_fused_pipeline_matches_sliding_windows(pipe, window_step):
+    x = _levels(ROWS, random_state=2)
+    fused_pipe = FusedCentroidPredictor.from_pipeline(pipe).as_pipeline()
+
+    x[[100, 2500], [0, 2]] = np.nan
+
+    labels, _, scaled = predict_sliding_windows(pipe, x, window_step)
+    fused_labels, _, _, distances = predict_sliding_windows(
+        fused_pipe, x, window_step, return_distances=True
+    )
+    np.testing.assert_array_equal(fused_labels, labels)
+    np.testing.assert_allclose(
+        distances, _window_inertia(pipe, scaled, labels), rtol=1e-9, atol=1e-9
+    )
+    assert (
+        predict_sliding_windows(pipe, x, window_step, return_distances=True)[3] is None
+    )
+
+    window = x[:WINDOW_SIZE]
+    label, _, _ = predict_with_features(pipe, window)
+    fused_label, distance, _ = FusedCentroidPredictor.from_pipeline(
+        pipe
+    ).predict_windows(window)
+    assert fused_label[0] == label[0]
+    np.testing.assert_allclose(
+        distance, _window_inertia(pipe, scaled[:1], labels[:1]), rtol=1e-9
+    )
+
+
+def test_unsupported_pipeline_is_not_fused():
+    unsupported = create_pipeline(
+        KMeans(n_clusters=4, random_state=0, n_init=10), WINDOW_SIZE, WINDOW_SIZE
+    )
+    unsupported.set_params(preprocessing__scaling__clip=True)
+    unsupported.fit(_levels(ROWS, random_state=0))
+    assert FusedCentroidPredictor.from_pipeline(unsupported) is None
@@ -0,0 +1,115 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the incrementally updated window features with the full recomputation of the pipeline.
+"""
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+
+from state_identifier.src.si.incremental import (
+    SlidingWindowFeatures,
+    incremental_features_for,
+)
+from state_identifier.src.si.pipeline import FeatureTransformer, create_pipeline
+
+WINDOW_SIZE = 40
+ROWS = 2000
+
+
+def _levels(rows: int, random_state: int) -> np.array:
+    """
+    Returns input rows whose sum switches between three levels, with some noise.
+    """
+    rng = np.random.default_rng(random_state)
+    durations = rng.integers(WINDOW_SIZE // 2, 4 * WINDOW_SIZE, rows)
+    levels = np.repeat(rng.choice([10.0, 50.0, 90.0], len(durations)), durations)[:rows]
+    return levels[:, None] / 3 + rng.normal(0.0, 1.0, (rows, 3))
+
+
+@pytest.fixture(scope="module")
+def pipe():
+    return create_pipeline(
+        KMeans(n_clusters=3, random_state=0, n_init=10), WINDOW_SIZE, WINDOW_SIZE
+    ).fit(_levels(ROWS, random_state=0))
+
+
+def _recomputed(function_list: list, window: np.array) -> np.array:
+    return np.array(
+        [
+            FeatureTransformer._apply(func, window.reshape((1, -1)))[0]
+            for func in function_list
+        ],
+        dtype=float,
+    )
+
+
+def test_features_match_recomputation_with_missing_values(pipe):
+    sliding, _ = incremental_features_for(pipe)
+    values = _levels(ROWS, random_state=1).sum(axis=1)
+    values[[100, 101, 500, 1203]] = np.nan
+
+    compared = 0
+    for index, value in enumerate(values):
+        sliding.append(value)
+        window = values[max(0, index + 1 - WINDOW_SIZE) : index + 1]
+        assert len(sliding) == len(window)
+        assert sliding.has_missing_values == np.isnan(window).any()
+        if sliding.has_missing_values:
+            continue
+        np.testing.assert_allclose(
+            sliding.features(),
+            _recomputed(sliding.function_list, window),
+            rtol=1e-9,
+            atol=1e-9,
+        )
+        compared += 1
+    assert compared > ROWS - 4 * WINDOW_SIZE
+
+
+def test_discard_matches_recomputation():
+    function_list = FeatureTransformer(
+        [(1, [np.mean, np.var, np.std, np.sum, np.max, np.min])]
+    ).function_list
+    sliding = SlidingWindowFeatures(WINDOW_SIZE, function_list)
+    values = np.random.default_rng(2).normal(5.0, 2.0, 3 * WINDOW_SIZE)
+    values[WINDOW_SIZE + 3] = np.nan
+
+    for value in values[: 2 * WINDOW_SIZE]:
+        sliding.append(value)
+    assert sliding.has_missing_values
+    sliding.discard(5)
+    assert not sliding.has_missing_values
+    np.testing.assert_allclose(
+        sliding.features(),
+        _recomputed(function_list, values[WINDOW_SIZE + 5 : 2 * WINDOW_SIZE]),
+        rtol=1e-9,
+        atol=1e-9,
+    )
+
+    sliding.discard(len(sliding))
+    assert len(sliding) == 0 and not sliding.has_missing_values
+
+
+def test_pipeline_features_match_incremental_features(pipe):
+    """
+    The features of the remaining preprocessing steps and the predicted clusters are those of the pipeline.
+    """
+    sliding, remaining_steps = incremental_features_for(pipe)
+    x = _levels(ROWS, random_state=3)
+    windows = x[: (ROWS // WINDOW_SIZE) * WINDOW_SIZE].reshape(
+        (-1, WINDOW_SIZE, x.shape[1])
+    )
+    scaled = pipe["preprocessing"].transform(x)
+    labels = pipe.predict(x)
+
+    for window_index, window in enumerate(windows):
+        for value in window.sum(axis=1):
+            sliding.append(value)
+        features = sliding.features().reshape((1, -1))
+        for step in remaining_steps:
+            features = step.transform(features)
+        np.testing.assert_allclose(features[0], scaled[window_index], atol=1e-9)
+        assert pipe["clustering"].predict(features)[0] == labels[window_index]
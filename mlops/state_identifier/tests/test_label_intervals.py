@@ -0,0 +1,85 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the run-length encoded labels with the per-window labelling loop they replace.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+
+from state_identifier.src.si.pipeline import (
+    WindowTransformer,
+    back_propagate_labels,
+    label_intervals,
+)
+
+
+def _windowing(window_size: int, window_step: int) -> Pipeline:
+    return Pipeline([("windowing", WindowTransformer(window_size, window_step))])
+
+
+def _loop_labels(n_rows: int, window_size: int, window_step: int, x_classes):
+    """
+    Labels the data points one window after the other, as `back_propagate_labels` did before:
+    window i labels the data points from (i + 1) * window_step to (i + 1) * window_step + window_size,
+    both inclusive, and overwrites the labels of the previous windows.
+    """
+    data_frame = pd.DataFrame({"value": np.zeros(n_rows)})
+    data_frame["class"] = -1
+    for i, value in enumerate(x_classes):
+        start = (i + 1) * window_step
+        end = (i + 1) * window_step + window_size
+        data_frame.loc[start:end, "class"] = value
+    return data_frame["class"].to_numpy()
+
+
+@pytest.mark.parametrize(
+    "window_size, window_step",
+    [(10, 10), (10, 4), (10, 1), (4, 10), (1, 1)],
+    ids=["adjacent", "overlapping", "step_1", "gaps", "single_row"],
+)
+@pytest.mark.parametrize("n_rows", [0, 5, 97, 200])
+def test_labels_match_the_loop(window_size, window_step, n_rows):
+    rng = np.random.default_rng(n_rows + window_size)
+    n_windows = max(0, (n_rows - window_size) // window_step + 1)
+    # few classes, so that subsequent windows often have the same label
+    x_classes = rng.integers(0, 3, n_windows)
+    expected = _loop_labels(n_rows, window_size, window_step, x_classes)
+    pipeline = _windowing(window_size, window_step)
+
+    intervals = label_intervals(n_rows, pipeline, x_classes, result="state")
+    assert list(intervals.columns) == ["start", "end", "state"]
+    if n_rows > 0:
+        assert intervals["start"].iloc[0] == 0
+        assert intervals["end"].iloc[-1] == n_rows - 1
+    np.testing.assert_array_equal(
+        intervals["start"].to_numpy()[1:], intervals["end"].to_numpy()[:-1] + 1
+    )
+    # run-length encoded: subsequent intervals have different labels
+    assert (np.diff(intervals["state"].to_numpy()) != 0).all()
+    np.testing.assert_array_equal(
+        np.repeat(
+            intervals["state"].to_numpy(),
+            (intervals["end"] - intervals["start"] + 1).to_numpy(),
+        ),
+        expected,
+    )
+
+    data_frame = pd.DataFrame({"value": np.arange(n_rows, dtype=float)})
+    labelled = back_propagate_labels(data_frame, pipeline, x_classes, result="state")
+    assert labelled is data_frame
+    np.testing.assert_array_equal(labelled["state"].to_numpy(), expected)
+
+
+def test_more_labels_than_windows_are_cut_off():
+    pipeline = _windowing(10, 5)
+    x_classes = np.arange(50) % 4
+    np.testing.assert_array_equal(
+        back_propagate_labels(
+            pd.DataFrame({"value": np.zeros(60)}), pipeline, x_classes
+        )["class"].to_numpy(),
+        _loop_labels(60, 10, 5, x_classes),
+    )
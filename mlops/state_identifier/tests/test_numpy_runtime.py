@@ -0,0 +1,106 @@
+# SPDX-FileCopyrightText: 2025 Siemens AG
+#
+# SPDX-License-Identifier: MIT
+"""
+Parity of the NumPy-only runtime with the scikit-learn pipeline it is compiled from.
+"""
+
+import copy
+
+import numpy as np
+import pytest
+from sklearn.cluster import KMeans
+
+from state_identifier.src.si.numpy_export import compile_numpy_model
+from state_identifier.src.si.pipeline import create_pipeline, predict_with_features
+
+INPUT_COLUMNS = ["ph1", "ph2", "ph3"]
+WINDOW_SIZE = 60
+ROWS = 3000
+
+
+def _levels(rows: int, random_state: int) -> np.array:
+    """
+    Returns input rows whose sum switches between three levels, with some noise.
+    """
+    rng = np.random.default_rng(random_state)
+    durations = rng.integers(WINDOW_SIZE // 2, 4 * WINDOW_SIZE, rows)
+    levels = np.repeat(rng.choice([10.0, 50.0, 90.0], len(durations)), durations)[:rows]
+    return levels[:, None] / 3 + rng.normal(0.0, 1.0, (rows, 3))
+
+
+def _with_missing_values(x: np.array, window_step: int, random_state: int):
+    """
+    Returns a copy of `x` with isolated missing values, which the pipeline fills from the previous row
+    of the same window: none of them is in the first row of a window starting `window_step` rows apart.
+    """
+    rng = np.random.default_rng(random_state)
+    x = x.copy()
+    rows = np.flatnonzero(
+        (np.arange(len(x)) % window_step != 0) & (rng.random(len(x)) < 0.01)
+    )
+    rows = rows[np.diff(rows, prepend=-2) > 1]
+    x[rows, rng.integers(0, x.shape[1], len(rows))] = np.nan
+    return x
+
+
+@pytest.fixture(scope="module")
+def pipe():
+    return create_pipeline(
+        KMeans(n_clusters=3, random_state=0, n_init=10), WINDOW_SIZE, WINDOW_SIZE
+    ).fit(_levels(ROWS, random_state=0))
+
+
+@pytest.mark.parametrize("window_step", [WINDOW_SIZE, 25, 7, 2])
+def test_predict_sliding_windows_matches_pipeline(pipe, window_step):
+    x = _with_missing_values(_levels(ROWS, random_state=1), window_step, 2)
+    n_windows = (ROWS - WINDOW_SIZE) // window_step + 1
+    starts = np.arange(n_windows) * window_step
+    has_missing = np.array(
+        [np.isnan(x[start : start + WINDOW_SIZE]).any() for start in starts]
+    )
+    assert has_missing.any() and not has_missing.all()
+
+    reference = copy.deepcopy(pipe)
+    reference.set_params(preprocessing__windowing__window_step=window_step)
+    labels = reference.predict(x)
+    scaled = reference["preprocessing"].transform(x)
+
+    model = compile_numpy_model(pipe, INPUT_COLUMNS)
+    numpy_labels, numpy_scaled, distances = model.predict_sliding_windows(
+        x, window_step
+    )
+
+    assert n_windows == len(labels) == len(numpy_labels)
+    np.testing.assert_array_equal(numpy_labels, labels)
+    np.testing.assert_allclose(numpy_scaled, scaled, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(
+        distances,
+        ((scaled - pipe["clustering"].cluster_centers_[labels]) ** 2).sum(axis=1),
+        rtol=1e-9,
+        atol=1e-12,
+    )
+
+
+def test_missing_first_row_of_window_is_filled_per_window(pipe):
+    """
+    Missing values are filled within their window, as on the edge, so a missing first row cannot be filled
+    forward and the window is rejected, whereas `pipe.predict` on the whole series fills it from the row before.
+    """
+    x = _levels(ROWS, random_state=1)
+    start = 3 * WINDOW_SIZE
+    x[start, 0] = np.nan
+    model = compile_numpy_model(pipe, INPUT_COLUMNS)
+
+    window = x[start : start + WINDOW_SIZE]
+    with pytest.raises(ValueError):
+        model.predict_window(window)
+    with pytest.raises(ValueError):
+        predict_with_features(pipe, window)
+    with pytest.raises(ValueError):
+        model.predict_sliding_windows(x, WINDOW_SIZE)
+
+    # the window before is complete, and the whole series is filled across the windows
+    previous = x[start - WINDOW_SIZE : start]
+    assert model.predict_window(previous)[0] == pipe.predict(previous)[0]
+    assert len(pipe.predict(x)) == ROWS // WINDOW_SIZE